@@ -0,0 +1,201 @@
+"""
+오프라인 end-to-end 벤치마크 - OpenAI 대신 replay 백엔드(결정적 응답 + 지연 시뮬레이션)로 채팅/대시보드 API 측정
+
+실행: python benchmarks/bench_chat.py [--requests 50] [--concurrency 8] [--llm-latency-ms 800]
+                                     [--db benchmarks/data/bench.db] [--save result.json] [--compare baseline.json]
+
+- 시나리오: concept(개념 질문), confirmation(반문), analysis(/api/chat), analysis_stream(/api/chat/stream), dashboard,
+  dashboard_revalidate(이전 응답의 ETag로 조건부 요청, 304 응답)
+- 시나리오별 p50/p95 지연시간(ms)과 requests/sec 출력 (analysis_stream은 첫 요약 조각까지의 시간도 출력)
+- 기본으로 LLM 응답/SQL 결과 캐시를 끄고 측정 (--cache로 켬)
+- --compare: 기준 결과 대비 p95가 tolerance 이상 느려지거나 requests/sec가 그만큼 줄면 종료 코드 1
+- 대용량 데이터로 측정하려면 benchmarks/synthetic_data.py --db 로 만든 DB를 --db로 지정
+"""
+import argparse
+import asyncio
+import json
+import os
+import socket
+import statistics
+import sys
+import time
+from typing import Optional
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SCENARIOS = {
+    "concept": {"path": "/api/chat", "expect": "concept",
+                "messages": ["품질부적합률이 뭐야?", "클레임률의 정의는?", "책임공장이란?"]},
+    "confirmation": {"path": "/api/chat", "expect": "confirmation",
+                     "messages": ["공장별 품질부적합률 비교해줘", "2025년 공장별 부적합률 알려줘"]},
+    "analysis": {"path": "/api/chat", "expect": "analysis",
+                 "messages": ["24년과 25년 품질부적합률 비교", "품종별 품질부적합률 추이", "월별 품질부적합률 추이",
+                              "책임공장별 품질부적합률", "연도별 클레임률"]},
+    "analysis_stream": {"path": "/api/chat/stream", "expect": "analysis",
+                        "messages": ["24년과 25년 품질부적합률 비교", "품종별 품질부적합률 추이", "월별 품질부적합률 추이"]},
+    "dashboard": {"paths": ["/api/yearly_quality_data", "/api/monthly_quality_trend"]},
+    "dashboard_revalidate": {"paths": ["/api/yearly_quality_data", "/api/monthly_quality_trend"], "revalidate": True},
+}
+
+
+def configure_environment(args) -> None:
+    """main 모듈을 불러오기 전에 replay 백엔드/DB/캐시 설정"""
+    os.environ["LLM_BACKEND"] = "replay"
+    os.environ["LLM_REPLAY_LATENCY_MS"] = str(args.llm_latency_ms)
+    os.environ["LLM_REPLAY_TOKEN_MS"] = str(args.llm_token_ms)
+    os.environ["LOG_LEVEL"] = "WARNING"
+    if args.db:
+        os.environ["DB_PATH"] = os.path.abspath(args.db)
+    if not args.cache:
+        os.environ["LLM_CACHE_MAXSIZE"] = "0"
+        os.environ["DB_RESULT_CACHE_MAXSIZE"] = "0"
+    sys.path.insert(0, ROOT)
+    os.chdir(ROOT)
+
+
+def percentile(sorted_values: list, ratio: float) -> float:
+    return sorted_values[max(int(len(sorted_values) * ratio) - 1, 0)]
+
+
+async def chat_once(client, path: str, message: str, expect: str) -> dict:
+    """세션 생성 후 메시지 1건 처리 (세션 생성은 측정에서 제외)"""
+    session_id = (await client.post("/api/start_session")).json()["session_id"]
+    payload = {"session_id": session_id, "message": message}
+    started = time.perf_counter()
+    if path.endswith("/stream"):
+        first_token, response_type = None, None
+        async with client.stream("POST", path, json=payload) as response:
+            buffer = ""
+            async for text in response.aiter_text():
+                buffer += text
+                while "\n\n" in buffer:
+                    raw_event, buffer = buffer.split("\n\n", 1)
+                    event = raw_event.split("\n", 1)[0].removeprefix("event: ")
+                    if event == "summary_token" and first_token is None:
+                        first_token = time.perf_counter() - started
+                    elif event == "done":
+                        response_type = json.loads(raw_event.split("data: ", 1)[1])["type"]
+        return {"seconds": time.perf_counter() - started, "ok": response_type == expect, "first_token": first_token}
+    response = await client.post(path, json=payload)
+    elapsed = time.perf_counter() - started
+    ok = response.status_code == 200 and response.json().get("type") == expect
+    return {"seconds": elapsed, "ok": ok}
+
+
+async def get_once(client, path: str, etags: Optional[dict] = None) -> dict:
+    """etags를 넘기면 경로별 이전 응답의 ETag로 조건부 요청 (304도 성공)"""
+    headers = {"If-None-Match": etags[path]} if etags and path in etags else {}
+    started = time.perf_counter()
+    response = await client.get(path, headers=headers)
+    if etags is not None and "etag" in response.headers:
+        etags[path] = response.headers["etag"]
+    return {"seconds": time.perf_counter() - started, "ok": response.status_code in (200, 304)}
+
+
+async def run_scenario(client, name: str, n_requests: int, concurrency: int) -> dict:
+    scenario = SCENARIOS[name]
+    samples = []
+    counter = iter(range(n_requests))
+    etags = {} if scenario.get("revalidate") else None
+
+    async def user():
+        for i in counter:
+            if "paths" in scenario:
+                samples.append(await get_once(client, scenario["paths"][i % len(scenario["paths"])], etags))
+            else:
+                message = scenario["messages"][i % len(scenario["messages"])]
+                samples.append(await chat_once(client, scenario["path"], message, scenario["expect"]))
+
+    started = time.perf_counter()
+    await asyncio.gather(*[user() for _ in range(concurrency)])
+    elapsed = time.perf_counter() - started
+
+    latencies = sorted(sample["seconds"] * 1000 for sample in samples)
+    result = {
+        "requests": len(samples),
+        "errors": sum(not sample["ok"] for sample in samples),
+        "requests_per_sec": round(len(samples) / elapsed, 2),
+        "p50_ms": round(statistics.median(latencies), 1),
+        "p95_ms": round(percentile(latencies, 0.95), 1),
+    }
+    first_tokens = sorted(sample["first_token"] * 1000 for sample in samples if sample.get("first_token") is not None)
+    if first_tokens:
+        result["first_token_p50_ms"] = round(statistics.median(first_tokens), 1)
+    return result
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list:
+    """기준 대비 회귀 목록"""
+    regressions = []
+    for name, result in results.items():
+        base = baseline.get(name)
+        if not base:
+            continue
+        if result["p95_ms"] > base["p95_ms"] * (1 + tolerance):
+            regressions.append(f"{name}: p95 {base['p95_ms']}ms -> {result['p95_ms']}ms")
+        if result["requests_per_sec"] < base["requests_per_sec"] * (1 - tolerance):
+            regressions.append(f"{name}: requests/sec {base['requests_per_sec']} -> {result['requests_per_sec']}")
+        if result["errors"] > base.get("errors", 0):
+            regressions.append(f"{name}: errors {base.get('errors', 0)} -> {result['errors']}")
+    return regressions
+
+
+async def main(args) -> int:
+    import httpx
+    import uvicorn
+
+    import main as app_module
+
+    # 같은 프로세스에서 uvicorn 서버를 실제 소켓으로 띄움
+    # (httpx의 ASGI 전송은 응답 본문을 모아서 돌려주므로 스트리밍 첫 조각 시간을 잴 수 없음)
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    server = uvicorn.Server(uvicorn.Config(app_module.app, host="127.0.0.1", port=port, log_level="warning"))
+    server_task = asyncio.create_task(server.serve())
+    while not server.started:
+        if server_task.done():
+            server_task.result()
+        await asyncio.sleep(0.05)
+
+    results = {}
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    try:
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", limits=limits, timeout=120) as client:
+            for name in args.scenarios:
+                # 워밍업 1회 (연결 풀/스키마 확인 등 최초 비용 제외)
+                await run_scenario(client, name, 1, 1)
+                results[name] = await run_scenario(client, name, args.requests, args.concurrency)
+                print(f"{name:16s} {results[name]}")
+    finally:
+        server.should_exit = True
+        await server_task
+
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump({"config": vars(args), "results": results}, f, ensure_ascii=False, indent=2)
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)["results"]
+        regressions = compare(results, baseline, args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=50, help="시나리오별 요청 수")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--scenarios", nargs="+", choices=list(SCENARIOS), default=list(SCENARIOS))
+    parser.add_argument("--llm-latency-ms", type=float, default=800, help="replay 백엔드 호출당 지연")
+    parser.add_argument("--llm-token-ms", type=float, default=15, help="replay 스트리밍 조각 사이 지연")
+    parser.add_argument("--db", help="측정에 사용할 DB 파일 (기본: quality_analysis.db)")
+    parser.add_argument("--cache", action="store_true", help="LLM 응답/SQL 결과 캐시를 켠 채로 측정")
+    parser.add_argument("--save", help="결과를 JSON으로 저장")
+    parser.add_argument("--compare", help="기준 결과 JSON과 비교")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="허용 회귀 비율")
+    cli_args = parser.parse_args()
+    configure_environment(cli_args)
+    sys.exit(asyncio.run(main(cli_args)))
@@ -0,0 +1,63 @@
+"""
+대시보드 타일 집계(적재 시 월 합계 재집계) 벤치마크 - 연결 풀 사용 여부에 따른 지연시간 비교
+(타일 GET 요청 자체는 메모리의 월 합계로 응답하므로 DB를 거치지 않음, 요청 단위 측정은 bench_chat.py의 dashboard 시나리오)
+
+실행: python benchmarks/bench_dashboard.py [--requests 500]
+(SQL 결과 캐시는 끄고 측정하므로 매 요청마다 실제 쿼리가 실행됨)
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+# 프로젝트 루트를 기준으로 실행 (static/, templates/, DB 파일 경로)
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)
+os.environ.setdefault("OPENAI_API_KEY", "sk-benchmark-placeholder")
+os.environ["DB_RESULT_CACHE_MAXSIZE"] = "0"
+
+from dashboard import DashboardTiles
+from database import DatabaseService
+
+
+async def refresh_many(tiles: DashboardTiles, n_requests: int) -> list:
+    await tiles.refresh()  # 워밍업
+    latencies = []
+    for _ in range(n_requests):
+        start = time.perf_counter()
+        await tiles.refresh()
+        latencies.append((time.perf_counter() - start) * 1000)
+    return latencies
+
+
+def run(pool_size: int, n_requests: int) -> dict:
+    """pool_size 설정으로 타일 월 합계를 n_requests번 다시 집계하고 지연시간 통계 반환"""
+    service = DatabaseService()
+    service.pool.size = pool_size
+    service.init_database()
+    try:
+        latencies = asyncio.run(refresh_many(DashboardTiles(service), n_requests))
+    finally:
+        service.close()
+
+    latencies.sort()
+    return {
+        "pool_size": pool_size,
+        "p50_ms": round(statistics.median(latencies), 3),
+        "p95_ms": round(latencies[int(len(latencies) * 0.95) - 1], 3),
+        "mean_ms": round(statistics.fmean(latencies), 3),
+        **{k: v for k, v in service.pool_stats().items() if k in ("connections_created", "checkouts", "reuse_rate")},
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=500)
+    args = parser.parse_args()
+
+    for size in (0, 4):
+        label = "요청마다 새 연결" if size == 0 else f"연결 풀(size={size})"
+        print(f"{label}: {run(size, args.requests)}")
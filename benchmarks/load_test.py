@@ -0,0 +1,123 @@
+"""
+멀티 워커 부하 테스트 - uvicorn 워커 수에 따른 처리량(requests/sec) 비교
+
+실행: python benchmarks/load_test.py [--workers 1 2 4] [--concurrency 32] [--duration 10]
+
+- 워커 수마다 uvicorn 서버를 띄우고(APP_WORKERS=N, 공유 상태 사용) 세션/대시보드 API를 섞어 호출
+- 매 라운드 시작 시 만든 세션을 모든 요청에서 다시 조회하여 워커 간 세션 공유 여부(404 수)도 확인
+- LLM 호출이 없는 API만 사용하므로 OpenAI 키가 필요 없음
+"""
+import argparse
+import asyncio
+import os
+import random
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(workers: int, port: int, state_dir: str) -> subprocess.Popen:
+    env = {
+        **os.environ,
+        "APP_WORKERS": str(workers),
+        "SHARED_STATE_ENABLED": "1",
+        "SHARED_STATE_PATH": os.path.join(state_dir, f"shared_state_{workers}.db"),
+        "OPENAI_API_KEY": os.environ.get("OPENAI_API_KEY", "sk-load-test-placeholder"),
+    }
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--workers", str(workers),
+         "--log-level", "warning"],
+        cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+
+
+async def wait_ready(base_url: str, timeout: float = 60) -> None:
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient(base_url=base_url) as client:
+        while time.monotonic() < deadline:
+            try:
+                if (await client.get("/api/sessions")).status_code == 200:
+                    return
+            except httpx.TransportError:
+                pass
+            await asyncio.sleep(0.2)
+    raise RuntimeError(f"서버가 {timeout}초 안에 기동되지 않았습니다: {base_url}")
+
+
+async def run_load(base_url: str, concurrency: int, duration: float) -> dict:
+    latencies, errors, missing_sessions = [], 0, 0
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=30) as client:
+        session_id = (await client.post("/api/start_session")).json()["session_id"]
+        requests = [
+            lambda: client.get("/api/sessions"),
+            lambda: client.get(f"/api/session/{session_id}"),
+            lambda: client.get("/api/yearly_quality_data"),
+            lambda: client.get("/api/monthly_quality_trend"),
+        ]
+        stop_at = time.monotonic() + duration
+
+        async def user():
+            nonlocal errors, missing_sessions
+            while time.monotonic() < stop_at:
+                start = time.perf_counter()
+                response = await random.choice(requests)()
+                latencies.append((time.perf_counter() - start) * 1000)
+                if response.status_code == 404:
+                    missing_sessions += 1
+                elif response.status_code != 200:
+                    errors += 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*[user() for _ in range(concurrency)])
+        elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "requests_per_sec": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(statistics.median(latencies), 2),
+        "p95_ms": round(latencies[int(len(latencies) * 0.95) - 1], 2),
+        "errors": errors,
+        "missing_sessions": missing_sessions,
+    }
+
+
+async def main(args) -> None:
+    print(f"CPU 코어 수: {os.cpu_count()} (부하 생성기도 같은 머신에서 실행됨)")
+    baseline = None
+    with tempfile.TemporaryDirectory() as state_dir:
+        for workers in args.workers:
+            port = _free_port()
+            server = start_server(workers, port, state_dir)
+            try:
+                base_url = f"http://127.0.0.1:{port}"
+                await wait_ready(base_url)
+                result = await run_load(base_url, args.concurrency, args.duration)
+            finally:
+                server.terminate()
+                server.wait(timeout=30)
+            baseline = baseline or result["requests_per_sec"]
+            scale = round(result["requests_per_sec"] / baseline, 2) if baseline else 0.0
+            print(f"workers={workers}: {result} (x{scale} vs workers={args.workers[0]})")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--duration", type=float, default=10)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,58 @@
+"""
+프롬프트 크기 리포트 - 벤치마크 질문별/단계별 도메인 지식+스키마 토큰 수를 전체 포함 vs 섹션 선택으로 비교
+
+실행: python benchmarks/prompt_tokens.py [--stages classify confirm intake sql visualization summary concept] [--verbose]
+
+- 토큰 수는 tiktoken이 있으면 o200k_base 기준, 없으면 글자 수 기반 근사치 (prompt_context.estimate_tokens)
+- prefix 열은 모든 질문/단계에서 같은 앞부분의 토큰 수 (provider 프롬프트 캐시 적용 대상)
+"""
+import argparse
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from bench_chat import SCENARIOS
+from prompt_context import PromptContextBuilder, estimate_tokens
+
+STAGES = ["concept", "classify", "confirm", "intake", "sql", "visualization", "summary"]
+
+
+def questions() -> list:
+    seen = []
+    for scenario in SCENARIOS.values():
+        for message in scenario.get("messages", []):
+            if message not in seen:
+                seen.append(message)
+    return seen
+
+
+def main(args) -> None:
+    os.environ.setdefault("LLM_BACKEND", "replay")
+    from llm_service import DB_SCHEMA, DOMAIN_KNOWLEDGE
+
+    builder = PromptContextBuilder(DOMAIN_KNOWLEDGE, DB_SCHEMA, enabled=True)
+    prefix_tokens = estimate_tokens(builder.prefix)
+    print(f"full: {builder.full_tokens} tokens, stable prefix: {prefix_tokens} tokens")
+    print(f"{'stage':14s} {'full':>8s} {'sliced':>8s} {'saved':>7s}")
+    total_full = total_sliced = 0
+    for stage in args.stages:
+        full = sliced = 0
+        for question in questions():
+            context = builder.build(stage, [question])
+            full += context.full_tokens
+            sliced += context.tokens
+            if args.verbose:
+                print(f"  {stage:12s} {context.tokens:5d} {','.join(context.section_names):60s} {question}")
+        total_full += full
+        total_sliced += sliced
+        print(f"{stage:14s} {full:8d} {sliced:8d} {1 - sliced / full:7.1%}")
+    print(f"{'total':14s} {total_full:8d} {total_sliced:8d} {1 - total_sliced / total_full:7.1%}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--stages", nargs="+", choices=STAGES, default=STAGES)
+    parser.add_argument("--verbose", action="store_true", help="질문별 선택 섹션 출력")
+    main(parser.parse_args())
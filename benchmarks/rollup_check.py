@@ -0,0 +1,60 @@
+"""
+요약 테이블 재작성 검증 - 같은 SQL을 원본 테이블과 요약 테이블(재작성)로 실행해 행 수와 결과를 비교
+
+실행: python benchmarks/rollup_check.py [--db benchmarks/data/bench.db]
+- 집계 쿼리는 재작성되어야 하고 결과가 원본과 같아야 함
+- 단순 조회(목록) 쿼리는 재작성되지 않아야 함 (요약 테이블에서는 행이 합쳐져 행 수가 줄어듦)
+- 하나라도 어긋나면 종료 코드 1
+"""
+import argparse
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)
+os.environ["DB_RESULT_CACHE_MAXSIZE"] = "0"
+
+from database import DatabaseService
+
+# (SQL, 재작성 기대 여부)
+CASES = [
+    ("SELECT ITEM_TYPE_GROUP_NAME FROM TB_SUM_MQS_QMHT200 WHERE DAY_YEAR = 2025", False),
+    ("SELECT END_USER_NAME, DAY_YYYYMM FROM TB_SUM_MQS_QMHT200 LIMIT 1000", False),
+    ("SELECT END_USER_NAME, SUM(QLY_INC_HPW) FROM TB_SUM_MQS_QMHT200", False),
+    ("SELECT DAY_YEAR AS year, SUM(QLY_INC_HPW) AS defects, SUM(TR_F_PRODQUANTITY) AS production "
+     "FROM TB_SUM_MQS_QMHT200 WHERE DAY_YEAR IS NOT NULL GROUP BY DAY_YEAR ORDER BY year", True),
+    ("SELECT DAY_YEAR, DAY_MONTH, SUM(QLY_INC_HPW) FROM TB_SUM_MQS_QMHT200 GROUP BY DAY_YEAR, DAY_MONTH", True),
+    ("SELECT END_USER_NAME AS user, SUM(QLY_INC_HPW) FROM TB_SUM_MQS_QMHT200 WHERE DAY_YEAR = 2025 GROUP BY user", True),
+    ("SELECT ITEM_TYPE_GROUP_NAME FROM TB_SUM_MQS_QMHT200 GROUP BY ITEM_TYPE_GROUP_NAME", True),
+    ("SELECT ROUND(SUM(QLY_INC_HPW) * 100.0 / SUM(TR_F_PRODQUANTITY), 2) AS rate "
+     "FROM TB_SUM_MQS_QMHT200 WHERE DAY_YEAR = 2025", True),
+]
+
+
+def rows(df) -> list:
+    return sorted(tuple(str(value) for value in row) for row in df.itertuples(index=False))
+
+
+def main(db_path: str) -> int:
+    service = DatabaseService(db_path=db_path)
+    service.init_database()
+    failures = 0
+    try:
+        for sql, expect_rewrite in CASES:
+            rewritten = service.rollups.rewrite(sql)
+            raw = service._run_query(sql)
+            result = service._run_query(rewritten) if rewritten else raw
+            ok = (rewritten is not None) == expect_rewrite and rows(raw) == rows(result)
+            failures += not ok
+            print(f"{'ok  ' if ok else 'FAIL'} rewrite={'yes' if rewritten else 'no ':3} "
+                  f"rows raw={len(raw)} rollup={len(result)}  {sql[:80]}")
+    finally:
+        service.close()
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db", default=os.getenv("DB_PATH", "quality_analysis.db"))
+    sys.exit(main(parser.parse_args().db))
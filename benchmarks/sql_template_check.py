@@ -0,0 +1,77 @@
+"""
+SQL 템플릿 슬롯 추출 검증 - 질문별로 기대하는 슬롯(또는 None: 반문/LLM으로 넘김)과 extract_slots 결과,
+반문이 필요한 분석 축 표현과 ambiguous_axes 결과를 비교
+
+실행: python benchmarks/sql_template_check.py
+- 기대 값에 적은 항목만 비교 (적지 않은 항목은 확인하지 않음)
+- 하나라도 어긋나면 종료 코드 1
+"""
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from sql_templates import ambiguous_axes, extract_slots
+
+HPN, RESP = "QLY_INC_HPN_FAC_TP_NM", "QLY_INC_RESP_FAC_TP_NM"
+
+# (질문, 직전 사용자 질문, 기대 슬롯 또는 None)
+CASES = [
+    # 공장 기준이 모호하면 반문 ('부적합 발생'의 '발생', 띄어 쓴 '발생 공장'은 기준 선택이 아님)
+    ("공장별 부적합 발생 현황", "", None),
+    ("Crack 발생 공장별 부적합률", "", None),
+    ("2025년 냉연2 부적합률", "", None),
+    ("발생공장별 부적합률", "", {"group_by": [HPN], "grain": None}),
+    ("2025년 냉연2 책임공장 부적합률", "", {"years": [2025], "filters": {RESP: ["냉연2"]}, "group_by": []}),
+    # 반문에 대한 답변
+    ("발생공장", "공장별 부적합률", {"group_by": [HPN]}),
+    ("책임 기준으로", "공장별 부적합 발생 현황", {"group_by": [RESP]}),
+    ("책임공장: 품질 문제의 원인을 제공한 것으로 판단되는 공장을 기준으로 분석", "2025년 공장별 부적합률",
+     {"years": [2025], "group_by": [RESP], "filters": {}}),
+    # 기간 (해석하지 못한 숫자/날짜가 남으면 LLM)
+    ("20250115 부적합률", "", None),
+    ("2025년 3월 15일 부적합률", "", None),
+    ("3월 부적합률", "", None),
+    ("202503 부적합률", "", {"grain": "month", "month_ranges": [(202503, 202503)], "years": []}),
+    ("2025년 1~5월 월별 부적합률", "", {"grain": "month", "month_ranges": [(202501, 202505)]}),
+    ("2024~2025년 품종별 부적합률", "", {"grain": "year", "years": [2024, 2025], "group_by": ["ITEM_TYPE_GROUP_NAME"]}),
+    # 지표/필터
+    ("2025년 고객사별 클레임률", "", {"metric": "claim_rate", "years": [2025], "group_by": ["END_USER_NAME"]}),
+    ("A고객사 JS-A 부적합률", "", {"filters": {"END_USER_NAME": ["A고객사"], "SPECIFICATION_CD_N": ["JS-A"]}}),
+    ("클레임률과 부적합률 비교", "", None),
+    ("최근 3개월 부적합률", "", None),
+]
+
+# (질문, 직전 사용자 질문, 반문이 필요한 표현) - intake가 템플릿으로 바로 답하지 않아야 하는 질문
+AMBIGUITY_CASES = [
+    ("공장별 부적합 발생 현황", "", ["공장"]),
+    ("2025년 냉연2 부적합률", "", ["공장"]),
+    ("제품별 부적합률", "", ["제품"]),
+    ("발생공장별 부적합률", "", []),
+    ("책임", "공장별 부적합률", []),
+    ("2025년 품종별 부적합률", "", []),
+]
+
+
+def main() -> int:
+    failures = 0
+    for query, previous_query, expected in AMBIGUITY_CASES:
+        aliases = ambiguous_axes(query, previous_query)
+        ok = aliases == expected
+        failures += not ok
+        print(f"{'ok  ' if ok else 'FAIL'} {query[:40]!r} (직전: {previous_query[:20]!r}) -> 반문 필요: {aliases}")
+    for query, previous_query, expected in CASES:
+        slots = extract_slots(query, previous_query)
+        if expected is None:
+            ok = slots is None
+        else:
+            ok = slots is not None and all(getattr(slots, key) == value for key, value in expected.items())
+        failures += not ok
+        print(f"{'ok  ' if ok else 'FAIL'} {query[:40]!r} (직전: {previous_query[:20]!r}) -> "
+              f"{slots._asdict() if slots else None}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
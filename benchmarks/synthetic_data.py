@@ -0,0 +1,111 @@
+"""
+합성 데이터 생성기 - 세 원본 테이블을 원하는 행 수(기본 각 1,000,000행)로 확장한 CSV 생성 및 별도 DB 적재
+
+실행: python benchmarks/synthetic_data.py [--rows 1000000] [--months 24] [--out benchmarks/data] [--db benchmarks/data/bench.db]
+
+- 컬럼/값 범위(품종, 고객사, 공장, 외관불량원인, 규격, 수량 분포)는 attached_assets의 예시 CSV와 동일하게 맞춤
+- 같은 --seed면 항상 같은 데이터 생성 (벤치마크 결과 비교용)
+- --db를 지정하면 ingest 경로(청크 적재 + 요약 테이블 갱신)로 적재하므로 적재 성능도 함께 측정됨
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from schema import TABLE_COLUMNS
+
+ITEMS = ["냉연", "선재", "전기강판", "도금", "열연", "후판"]
+USERS = ["A고객사", "B고객사", "C고객사", "D고객사", "E고객사"]
+CAUSES = ["Build Up", "단중미달", "Dust", "두께불량", "겹침흠", "Crack", "폭불량", "Edge burr", "양파", "Black Line",
+          "UST불량", "딱지흠", "Edge파손", "부푼흠", "Scab", "Blow Hole"]
+SPECS = ["JS-A", "JS-B", "JS-C", "JS-D", "JS-E", "JS-F", "JS-G"]
+
+
+def _dates(rng: np.random.Generator, rows: int, start: str, months: int) -> np.ndarray:
+    """start(YYYYMM)부터 months개월 범위의 YYYYMMDD 문자열"""
+    month_index = rng.integers(0, months, rows)
+    year = int(start[:4]) + (int(start[4:]) - 1 + month_index) // 12
+    month = (int(start[4:]) - 1 + month_index) % 12 + 1
+    day = rng.integers(1, 29, rows)
+    return (year * 10000 + month * 100 + day).astype(str)
+
+
+def _factories(rng: np.random.Generator, items: np.ndarray) -> np.ndarray:
+    """'품종 + 공장번호' 형식의 공장명 (예: 냉연2)"""
+    return np.char.add(items.astype(str), rng.integers(1, 3, len(items)).astype(str))
+
+
+def generate_table(table_name: str, rows: int, start: str, months: int, seed: int) -> pd.DataFrame:
+    rng = np.random.default_rng([seed, list(TABLE_COLUMNS).index(table_name)])
+    items = rng.choice(ITEMS, rows)
+    users = rng.choice(USERS, rows)
+    if table_name == "TB_SUM_MQS_QMHT200":
+        production = np.clip(rng.normal(20000, 1500, rows), 100, None).astype("int64")
+        rate = rng.beta(2, 35, rows)  # 평균 약 5.4% (예시 데이터의 품질부적합률 수준)
+        data = {
+            "DAY_CD": _dates(rng, rows, start, months),
+            "TR_F_PRODQUANTITY": production,
+            "QLY_INC_HPW": (production * rate).astype("int64"),
+            "ITEM_TYPE_GROUP_NAME": items,
+            "EX_A_MAST_GD_CAU_NM": rng.choice(CAUSES, rows),
+            "END_USER_NAME": users,
+            "QLY_INC_HPN_FAC_TP_NM": _factories(rng, items),
+            "QLY_INC_RESP_FAC_TP_NM": _factories(rng, items),
+            "SPECIFICATION_CD_N": rng.choice(SPECS, rows),
+        }
+    elif table_name == "TB_S95_SALS_CLAM030":
+        data = {
+            "END_USER_NAME": users,
+            "RMA_QTY": rng.exponential(9_400_000, rows).astype("int64"),
+            "ITEM_TYPE_GROUP_NAME": items,
+            "EXPECTED_RESOLUTION_DATE": _dates(rng, rows, start, months),
+        }
+    else:
+        data = {
+            "END_USER_NAME": users,
+            "ITEM_TYPE_GROUP_NAME": items,
+            "SALE_QTY": rng.integers(23_000_000, 58_000_000, rows),
+            "SALES_DATE": _dates(rng, rows, start, months),
+        }
+    return pd.DataFrame(data)[list(TABLE_COLUMNS[table_name])]
+
+
+def write_csvs(rows: int, out_dir: str, start: str, months: int, seed: int) -> list:
+    """테이블별 CSV 생성 - 파일명은 테이블명 접두어를 가지므로 ingest가 대상 테이블을 추정할 수 있음"""
+    os.makedirs(out_dir, exist_ok=True)
+    files = []
+    for table_name in TABLE_COLUMNS:
+        started = time.perf_counter()
+        path = os.path.join(out_dir, f"{table_name}_synthetic_{rows}_{seed}.csv")
+        generate_table(table_name, rows, start, months, seed).to_csv(path, index=False, encoding="utf-8-sig")
+        print(f"{path}: {rows:,} rows ({time.perf_counter() - started:.1f}s)")
+        files.append({"path": path, "table_name": table_name})
+    return files
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1_000_000, help="테이블별 행 수")
+    parser.add_argument("--start", default="202401", help="시작 년월 (YYYYMM)")
+    parser.add_argument("--months", type=int, default=24)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--out", default=os.path.join(ROOT, "benchmarks", "data"))
+    parser.add_argument("--db", help="지정하면 생성한 CSV를 이 DB에 교체 적재")
+    args = parser.parse_args()
+
+    csv_files = write_csvs(args.rows, args.out, args.start, args.months, args.seed)
+    if args.db:
+        from database import DatabaseService
+
+        service = DatabaseService(db_path=args.db)
+        service.init_database()
+        result = service.ingest_csv_files(csv_files, replace=True)
+        print(f"Ingested {result['rows']:,} rows into {args.db} in {result['elapsed_seconds']}s "
+              f"({result['rows_per_second']:,} rows/sec)")
+        service.close()
@@ -0,0 +1,217 @@
+"""
+Chart data preparation: reduces large SQL results to what the chosen chart can show before they reach the browser
+(LTTB downsampling per line series, top-N categories + "기타" for bar/pie, cell-budget binning for heatmaps)
+"""
+import os
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from pandas.api.types import is_bool_dtype, is_numeric_dtype
+
+from chart_recommender import MAX_PIE_SLICES, is_rate_name, is_time_name
+from result_format import encode_result
+
+CHART_LINE_MAX_POINTS = int(os.getenv("CHART_LINE_MAX_POINTS", "500"))         # 선 차트 시리즈당 최대 점 수 (넘으면 LTTB, 0이면 비활성화)
+CHART_BAR_TOP_N = int(os.getenv("CHART_BAR_TOP_N", "20"))                     # 막대 차트 최대 범주 수 ("기타" 포함, 0이면 비활성화)
+CHART_HEATMAP_MAX_CELLS = int(os.getenv("CHART_HEATMAP_MAX_CELLS", "2500"))   # 히트맵 최대 셀 수 (넘으면 축 값을 구간/기타로 묶음)
+
+OTHER_LABEL = "기타"
+
+
+def lttb_indices(x: np.ndarray, y: np.ndarray, threshold: int) -> np.ndarray:
+    """Largest-Triangle-Three-Buckets로 남길 점의 인덱스 (x 오름차순 입력, 첫/마지막 점은 항상 포함)"""
+    return lttb_series([x], [y], threshold)[0]
+
+
+def lttb_series(xs: List[np.ndarray], ys: List[np.ndarray], threshold: int) -> List[np.ndarray]:
+    """여러 시리즈의 LTTB를 한 번에 계산 (시리즈별 남길 점의 인덱스)
+
+    버킷 경계·버킷별 평균은 (시리즈, 버킷, 버킷 내 위치) 배열로 한 번에 만들고, 각 버킷에서 직전에 고른 점과
+    다음 버킷 평균으로 이루는 삼각형 넓이가 가장 큰 점을 전체 시리즈에 대해 동시에 고름
+    (직전에 고른 점에 의존하므로 버킷 수만큼의 반복만 남음)
+    """
+    result = [np.arange(len(x)) for x in xs]
+    targets = [i for i, x in enumerate(xs) if 3 <= threshold < len(x)]
+    if not targets:
+        return result
+    lengths = np.array([len(xs[i]) for i in targets])
+    offsets = np.concatenate([[0], np.cumsum(lengths)[:-1]])
+    x_all = np.concatenate([xs[i] for i in targets]).astype(float)
+    y_all = np.concatenate([ys[i] for i in targets]).astype(float)
+
+    # 첫/마지막 점을 제외한 n - 2개 점을 threshold - 2개 버킷으로 분할 (threshold < n이므로 버킷은 비어 있지 않음)
+    buckets = threshold - 2
+    edges = np.arange(buckets + 1)[None, :] * (lengths[:, None] - 2) // buckets + 1
+    edges[:, -1] = lengths - 1
+    starts, counts = edges[:, :-1], np.diff(edges, axis=1)
+    # 점을 복소수(x + yi)로 두면 삼각형 넓이는 두 변 벡터 곱의 허수부 (외적) 절댓값
+    # 버킷 길이가 모자란 칸은 버킷 첫 점을 반복해 채움 (넓이가 같으면 argmax는 첫 칸을 고르므로 마스크 불필요)
+    offset = np.minimum(np.arange(counts.max()), counts[..., None] - 1)
+    index = starts[..., None] + offset                                # (시리즈, 버킷, 버킷 내 위치)
+    points = (x_all + 1j * y_all)[offsets[:, None, None] + index]
+    means = np.where(offset == np.arange(offset.shape[-1]), points, 0).sum(axis=2) / counts
+    # 버킷 i의 기준점: 다음 버킷 평균 (마지막 버킷은 마지막 점)
+    last = offsets + lengths - 1
+    targets_next = np.concatenate([means[:, 1:], (x_all[last] + 1j * y_all[last])[:, None]], axis=1)
+
+    rows = np.arange(len(targets))
+    best = np.empty((len(targets), buckets), dtype=np.intp)
+    anchor = x_all[offsets] + 1j * y_all[offsets]
+    for i in range(buckets):
+        area = np.abs(((points[:, i] - anchor[:, None]) * np.conj(targets_next[:, i] - anchor)[:, None]).imag)
+        best[:, i] = area.argmax(axis=1)
+        anchor = points[rows, i, best[:, i]]
+    selected = np.empty((len(targets), threshold), dtype=np.intp)
+    selected[:, 0], selected[:, -1] = 0, lengths - 1
+    selected[:, 1:-1] = np.take_along_axis(index, best[..., None], axis=2)[..., 0]
+    for row, i in enumerate(targets):
+        result[i] = selected[row]
+    return result
+
+
+def prepare_chart_data(df: pd.DataFrame, visualization: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """시각화 설정에 맞춰 줄인 차트용 데이터 (컬럼 단위 형식, 줄일 필요가 없으면 None)
+
+    - line: 시리즈별 점 수가 CHART_LINE_MAX_POINTS를 넘으면 LTTB로 다운샘플링
+    - bar/pie: 시간 축이 아닌 범주가 CHART_BAR_TOP_N(원형은 MAX_PIE_SLICES)개를 넘으면 상위 항목 + "기타"
+    - heatmap: x·y 값 조합이 CHART_HEATMAP_MAX_CELLS를 넘으면 시간 축은 연속 구간, 범주 축은 상위 항목 + "기타"로 묶음
+    결과에는 {"reduction": {"method", "source_rows"}}가 붙고, 원본 해상도 데이터는 sql_results(페이지 조회)로 그대로 제공
+    """
+    chart_type = str(visualization.get("chartType") or "").lower()
+    x, y = visualization.get("xAxis"), visualization.get("yAxis")
+    if df.empty or x not in df.columns or y not in df.columns or x == y:
+        return None
+    series = visualization.get("seriesBy")
+    series = series if series in df.columns and series not in (x, y) else None
+
+    if chart_type == "line":
+        reduced, method = _downsample_lines(df, x, y, series, CHART_LINE_MAX_POINTS), "lttb"
+    elif chart_type in ("bar", "pie"):
+        top_n = MAX_PIE_SLICES if chart_type == "pie" else CHART_BAR_TOP_N
+        reduced, method = _collapse_categories(df, x, y, series, top_n), "top_n"
+    elif chart_type == "heatmap":
+        # 히트맵 값 컬럼은 화면과 같은 규칙 (seriesBy, 없으면 x/y가 아닌 첫 컬럼)
+        value = series or next((name for name in df.columns if name not in (x, y)), None)
+        reduced, method = (_bin_heatmap(df, x, y, value, CHART_HEATMAP_MAX_CELLS) if value else None), "binning"
+    else:
+        return None
+    if reduced is None:
+        return None
+    return {**encode_result(reduced, limit=len(reduced)), "reduction": {"method": method, "source_rows": len(df)}}
+
+
+def _measure(df: pd.DataFrame, name: str) -> Optional[np.ndarray]:
+    if not is_numeric_dtype(df[name]) or is_bool_dtype(df[name]):
+        return None
+    return df[name].to_numpy(dtype=float, na_value=np.nan)
+
+
+def _aggregate(codes: np.ndarray, values: np.ndarray, size: int, mean: bool) -> Tuple[np.ndarray, np.ndarray]:
+    """그룹 코드별 합계(비율 측정값이면 평균)와 값 개수 (음수 코드/NaN 값은 제외)"""
+    valid = (codes >= 0) & ~np.isnan(values)
+    totals = np.bincount(codes[valid], weights=values[valid], minlength=size)
+    counts = np.bincount(codes[valid], minlength=size)
+    if mean:
+        with np.errstate(divide="ignore", invalid="ignore"):
+            totals = totals / counts
+    return totals, counts
+
+
+def _downsample_lines(df: pd.DataFrame, x: str, y: str, series: Optional[str], max_points: int) -> Optional[pd.DataFrame]:
+    values = _measure(df, y)
+    if max_points < 3 or values is None:
+        return None
+    positions = pd.factorize(df[x], sort=True)[0]
+    groups = pd.factorize(df[series])[0] if series else np.zeros(len(df), dtype=np.intp)
+    if np.bincount(groups[groups >= 0]).max(initial=0) <= max_points:
+        return None
+
+    # 시리즈 → x 순서로 정렬한 뒤 시리즈 경계마다 LTTB (x 좌표는 범주 축과 같은 순번)
+    valid = np.flatnonzero((positions >= 0) & (groups >= 0) & ~np.isnan(values))
+    order = valid[np.lexsort((positions[valid], groups[valid]))]
+    bounds = np.flatnonzero(np.diff(groups[order])) + 1
+    groups_index = [index for index in np.split(order, bounds) if len(index)]
+    selected = lttb_series([positions[index] for index in groups_index], [values[index] for index in groups_index], max_points)
+    keep = [index[chosen] for index, chosen in zip(groups_index, selected)]
+    columns = [name for name in (x, y, series) if name]
+    return df.iloc[np.sort(np.concatenate(keep))][columns].reset_index(drop=True)
+
+
+def _collapse_categories(df: pd.DataFrame, x: str, y: str, series: Optional[str], top_n: int) -> Optional[pd.DataFrame]:
+    values = _measure(df, y)
+    if top_n < 2 or values is None or is_time_name(x):
+        return None
+    codes, labels = pd.factorize(df[x])
+    if len(labels) <= top_n:
+        return None
+
+    # 합계(비율 측정값은 평균)의 절댓값 기준 상위 top_n - 1개 범주만 남기고 나머지는 "기타" 1개로 합침
+    rate = is_rate_name(y)
+    totals, _ = _aggregate(codes, values, len(labels), rate)
+    top = np.argsort(-np.nan_to_num(np.abs(totals), nan=-1.0), kind="stable")[:top_n - 1]
+    kept = np.isin(codes, top)
+    columns = [name for name in (x, y, series) if name]
+    head = df.loc[kept, columns].astype({x: object})
+    tail = df.loc[~kept, columns]
+    how = "mean" if rate else "sum"
+    if series:
+        other = tail.groupby(series, sort=False, dropna=False)[y].agg(how).reset_index()
+    else:
+        other = pd.DataFrame({y: [tail[y].agg(how)]})
+    other[x] = OTHER_LABEL
+    return pd.concat([head, other[columns]], ignore_index=True)
+
+
+def _bin_axis(codes: np.ndarray, labels: Any, weights: np.ndarray, bins: int, time: bool) -> Tuple[np.ndarray, List[Any]]:
+    """축 값 코드를 bins개 구간으로 (시간 축: 정렬 순서대로 연속 구간 "시작~끝", 범주 축: 상위 항목 + 기타)"""
+    size = len(labels)
+    if size <= bins:
+        return codes, [_label(value) for value in labels]
+    if time:
+        bin_of = np.arange(size) * bins // size
+        first = np.flatnonzero(np.diff(bin_of, prepend=-1))
+        last = np.append(first[1:] - 1, size - 1)
+        names = [_label(labels[a]) if a == b else f"{_label(labels[a])}~{_label(labels[b])}"
+                 for a, b in zip(first.tolist(), last.tolist())]
+    else:
+        totals, _ = _aggregate(codes, np.abs(weights), size, mean=False)
+        top = np.argsort(-totals, kind="stable")[:bins - 1]
+        bin_of = np.full(size, len(top), dtype=np.intp)
+        bin_of[top] = np.arange(len(top))
+        names = [_label(labels[i]) for i in top.tolist()] + [OTHER_LABEL]
+    return np.where(codes >= 0, bin_of[np.maximum(codes, 0)], -1), names
+
+
+def _bin_heatmap(df: pd.DataFrame, x: str, y: str, value: str, max_cells: int) -> Optional[pd.DataFrame]:
+    values = _measure(df, value)
+    if max_cells < 4 or values is None:
+        return None
+    x_codes, x_labels = pd.factorize(df[x], sort=True)
+    y_codes, y_labels = pd.factorize(df[y], sort=True)
+    nx, ny = len(x_labels), len(y_labels)
+    if nx * ny <= max_cells:
+        return None
+
+    # 값 종류가 적은 축은 그대로 두고 (셀 예산의 제곱근 이하일 때) 나머지 축만 줄임
+    side = int(np.sqrt(max_cells))
+    if min(nx, ny) <= side:
+        bx, by = (nx, max_cells // nx) if nx <= ny else (max_cells // ny, ny)
+    else:
+        bx = by = side
+    x_bins, x_names = _bin_axis(x_codes, x_labels, values, bx, is_time_name(x))
+    y_bins, y_names = _bin_axis(y_codes, y_labels, values, by, is_time_name(y))
+
+    # (x 구간, y 구간) 셀별 합계 (비율 측정값은 평균), 값이 있는 셀만 남김
+    cells = np.where((x_bins >= 0) & (y_bins >= 0), x_bins * len(y_names) + y_bins, -1)
+    totals, counts = _aggregate(cells, values, len(x_names) * len(y_names), is_rate_name(value))
+    filled = np.flatnonzero(counts)
+    return pd.DataFrame({
+        x: np.asarray(x_names, dtype=object)[filled // len(y_names)],
+        y: np.asarray(y_names, dtype=object)[filled % len(y_names)],
+        value: totals[filled],
+    })
+
+
+def _label(value: Any) -> Any:
+    return value.item() if isinstance(value, np.generic) else value
@@ -0,0 +1,154 @@
+"""
+Deterministic chart recommender: infers column roles (time / category / measure) from the SQL result itself
+and picks chartType, xAxis, yAxis, seriesBy locally; ambiguous shapes can optionally fall back to the LLM
+"""
+import os
+import re
+from typing import Any, Dict, List, NamedTuple, Optional
+
+from result_format import column_values, page_rows
+
+VISUALIZATION_LLM_FALLBACK = os.getenv("VISUALIZATION_LLM_FALLBACK", "0") == "1"  # 1이면 애매한 결과만 LLM으로 추천
+
+MAX_SERIES = 10       # seriesBy 컬럼의 최대 값 개수 (넘으면 범례를 읽기 어려우므로 애매한 결과로 처리)
+MAX_PIE_SLICES = 8    # 원형 차트의 최대 조각 수
+LINE_MIN_POINTS = 3   # 시간 축 값이 이보다 적으면 선 대신 막대 차트
+
+# 이름으로 판단하는 시간 컬럼 (YEAR, YYYYMM, DAY_CD, SALES_DATE, 년도, 월 등)
+_TIME_NAME = re.compile(
+    r"^(?:year|yyyy|yyyymm|ym|month|quarter|date|day)$|_(?:year|yyyymm|month|date)$|^day_"
+    r"|^(?:연도|년도|년|월|년월|분기|기간)$|(?:일자|날짜)$",
+    re.IGNORECASE,
+)
+# 값으로 판단하는 날짜 (YYYYMM, YYYYMMDD, YYYY-MM, YYYY-MM-DD; 4자리 연도만 있는 값은 이름으로만 판단)
+_DATE_VALUE = re.compile(r"^(?:19|20)\d{2}(?:-(?:0[1-9]|1[0-2])(?:-\d{2})?|(?:0[1-9]|1[0-2])(?:[0-3]\d)?)$")
+# 비율/률 측정값
+_RATE_NAME = re.compile(r"률|율|비율|rate|ratio|pct|percent|%", re.IGNORECASE)
+# 구성비를 묻는 질문 (원형 차트 후보)
+_COMPOSITION_CUE = re.compile(r"구성|비중|점유|차지")
+_NULL_TEXT = {"", "none", "nan", "null", "nat"}
+
+
+def is_time_name(name: str) -> bool:
+    return bool(_TIME_NAME.search(name))
+
+
+def is_rate_name(name: str) -> bool:
+    return bool(_RATE_NAME.search(name))
+
+
+class ColumnProfile(NamedTuple):
+    name: str
+    role: str        # time | category | measure
+    distinct: int
+    is_rate: bool
+
+
+def _non_null(values: List[Any]) -> List[Any]:
+    return [value for value in values
+            if value is not None and not (isinstance(value, str) and value.strip().lower() in _NULL_TEXT)
+            and not (isinstance(value, float) and value != value)]
+
+
+def _to_number(value: Any) -> Optional[float]:
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    try:
+        return float(str(value).replace(",", ""))
+    except ValueError:
+        return None
+
+
+def profile_column(name: str, values: List[Any], value_type: Optional[str] = None) -> ColumnProfile:
+    """컬럼 역할 추정 (이름/값의 날짜 형식 → time, 전부 숫자 → measure, 그 외 → category)
+
+    value_type(결과의 컬럼 형식)이 int/float이면 값마다 숫자 변환을 시도하지 않음
+    """
+    present = _non_null(values)
+    distinct = len(set(present))
+    numeric = value_type in ("int", "float")
+    if is_time_name(name) or (present and all(_DATE_VALUE.match(str(value).strip()) for value in present)):
+        role = "time"
+    elif present and (numeric or all(_to_number(value) is not None for value in present)):
+        role = "measure"
+    else:
+        role = "category"
+    return ColumnProfile(name, role, distinct, role == "measure" and is_rate_name(name))
+
+
+def profile_result(result: Dict[str, Any]) -> List[ColumnProfile]:
+    columns = result.get("columns") or []
+    types = result.get("types") or [None] * len(columns)
+    return [profile_column(name, column_values(result, name), value_type) for name, value_type in zip(columns, types)]
+
+
+def recommend_visualization(result: Dict[str, Any], query: str = "") -> Optional[Dict[str, Any]]:
+    """SQL 결과 1건의 시각화 설정 추천 (애매한 모양이면 None)
+
+    - yAxis: 비율/률 측정값 우선, 없으면 첫 측정값
+    - xAxis: 시간 컬럼 우선, 없으면 범주 컬럼 (차원 컬럼이 2개면 값 종류가 많은 쪽이 xAxis, 적은 쪽이 seriesBy)
+      단, 시간 값이 몇 개 안 되는 비교(예: 24년 vs 25년)는 범주를 xAxis, 시간을 seriesBy로
+    - chartType: 시간 축 → line (점이 적으면 bar), 범주 축 → bar (구성비 질문이면 pie), 측정값만 2개 이상 → scatter
+    - 애매함: 측정값 없음, 차원 컬럼 3개 이상, seriesBy 값이 너무 많음, (xAxis, seriesBy) 조합이 중복되는 행
+    """
+    rows = page_rows(result)
+    if not rows:
+        return None
+    profiles = profile_result(result)
+    measures = [p for p in profiles if p.role == "measure"]
+    dimensions = [p for p in profiles if p.role != "measure"]
+    if not measures or len(dimensions) > 2:
+        return None
+    y_axis = next((p for p in measures if p.is_rate), measures[0])
+
+    if not dimensions:
+        if len(measures) < 2 or rows < 2:
+            return None
+        # 비율 측정값이 있으면 y축, 없으면 컬럼 순서대로 x축/y축
+        x_axis = next(p for p in measures if p is not y_axis) if y_axis.is_rate else measures[0]
+        y_axis = y_axis if y_axis.is_rate else measures[1]
+        return _config("scatter", x_axis.name, y_axis.name, None)
+
+    series = None
+    if len(dimensions) == 1:
+        x_axis = dimensions[0]
+    else:
+        time = next((p for p in dimensions if p.role == "time"), None)
+        category = next((p for p in dimensions if p.role == "category"), None)
+        if time and category and time.distinct < LINE_MIN_POINTS and category.distinct > time.distinct:
+            x_axis, series = category, time
+        elif time and category:
+            x_axis, series = time, category
+        else:
+            x_axis, series = sorted(dimensions, key=lambda p: p.distinct, reverse=True)
+        if series.distinct > MAX_SERIES:
+            return None
+
+    keys = set(zip(column_values(result, x_axis.name), column_values(result, series.name) if series else [None] * rows))
+    if len(keys) != rows:
+        return None
+
+    if x_axis.role == "time":
+        chart_type = "line" if x_axis.distinct >= LINE_MIN_POINTS else "bar"
+    elif (series is None and not y_axis.is_rate and x_axis.distinct <= MAX_PIE_SLICES
+          and _COMPOSITION_CUE.search(query or "")
+          and all((_to_number(value) or 0) >= 0 for value in _non_null(column_values(result, y_axis.name)))):
+        chart_type = "pie"
+    else:
+        chart_type = "bar"
+    return _config(chart_type, x_axis.name, y_axis.name, series.name if series else None)
+
+
+def default_visualization(result: Dict[str, Any]) -> Dict[str, Any]:
+    """추천할 수 없을 때의 기본 설정 (첫 컬럼 x 첫 측정값 막대 차트)"""
+    columns = result.get("columns") or []
+    if not columns:
+        return {"chartType": "bar", "xAxis": "X축", "yAxis": "Y축", "seriesBy": None}
+    measures = [p.name for p in profile_result(result) if p.role == "measure" and p.name != columns[0]]
+    return _config("bar", columns[0], measures[0] if measures else columns[-1], None)
+
+
+def _config(chart_type: str, x_axis: str, y_axis: str, series_by: Optional[str]) -> Dict[str, Any]:
+    return {"chartType": chart_type, "xAxis": x_axis, "yAxis": y_axis, "seriesBy": series_by}
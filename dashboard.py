@@ -0,0 +1,145 @@
+"""
+Dashboard tiles: yearly / monthly quality-nonconformance rates served from monthly totals that are
+materialized once per data version (right after ingest), with ETags that change whenever an ingest changes the totals
+"""
+import asyncio
+import hashlib
+import math
+import os
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from structured_logging import get_logger
+
+DASHBOARD_MAX_AGE_SECONDS = int(os.getenv("DASHBOARD_MAX_AGE_SECONDS", "30"))  # 브라우저가 재검증 없이 재사용하는 시간(초), 0이면 매번 재검증
+DASHBOARD_TILE_CACHE_MAXSIZE = 256   # 데이터 버전당 보관하는 (타일, 파라미터) 응답 수
+
+# 월별 부적합량/생산량 합계 (월 단위 요약 테이블로 재작성되는 집계)
+MONTHLY_TOTALS_SQL = """
+SELECT
+    DAY_YEAR as year,
+    DAY_MONTH as month,
+    SUM(QLY_INC_HPW) as total_defects,
+    SUM(TR_F_PRODQUANTITY) as total_production
+FROM TB_SUM_MQS_QMHT200
+WHERE DAY_YEAR IS NOT NULL
+GROUP BY DAY_YEAR, DAY_MONTH
+"""
+
+log = get_logger("dashboard")
+
+# {연도: {월: (부적합량, 생산량)}}
+MonthlyTotals = Dict[int, Dict[int, Tuple[float, float]]]
+
+
+def quality_rate(defects: float, production: float) -> Optional[float]:
+    """품질부적합률(%) = 품질부적합발생량 / 제품생산량 * 100 (생산량이 없으면 None)"""
+    return round(defects / production * 100, 2) if production else None
+
+
+def yearly_quality(months: MonthlyTotals, from_year: Optional[int] = None,
+                   to_year: Optional[int] = None) -> Dict[str, Any]:
+    """연도별 품질부적합률 (from_year~to_year, 생략 시 전체 연도)"""
+    years = [year for year in sorted(months)
+             if (from_year is None or year >= from_year) and (to_year is None or year <= to_year)]
+    totals = [[sum(values) for values in zip(*months[year].values())] for year in years]
+    return {
+        "years": [str(year) for year in years],
+        "quality_rates": [quality_rate(defects, production) for defects, production in totals],
+    }
+
+
+def monthly_quality_trend(months: MonthlyTotals, year: Optional[int] = None,
+                          from_month: int = 1, to_month: int = 12) -> Dict[str, Any]:
+    """year년 from_month~to_month월 품질부적합률 추이 (year 생략 시 데이터가 있는 마지막 연도)"""
+    if year is None:
+        year = max(months, default=None)
+    rows = sorted((month, totals) for month, totals in months.get(year, {}).items() if from_month <= month <= to_month)
+    return {
+        "year": year,
+        "months": [f"{month}월" for month, _ in rows],
+        "quality_rates": [quality_rate(*totals) for _, totals in rows],
+    }
+
+
+def legacy_monthly_quality_trend(months: MonthlyTotals) -> Dict[str, Any]:
+    """이전 POST /api/monthly_quality_trend 응답: 2025년 1~5월 고정, months/quality_rates만 포함"""
+    trend = monthly_quality_trend(months, year=2025, from_month=1, to_month=5)
+    return {"months": trend["months"], "quality_rates": trend["quality_rates"]}
+
+
+TILES: Dict[str, Callable[..., Dict[str, Any]]] = {
+    "yearly_quality": yearly_quality,
+    "monthly_quality_trend": monthly_quality_trend,
+    "legacy_monthly_quality_trend": legacy_monthly_quality_trend,
+}
+
+
+class DashboardTiles:
+    """데이터 버전별 월 합계를 메모리에 두고 대시보드 타일 응답을 만드는 저장소
+
+    - refresh: 월 합계를 다시 읽음 (적재 직후 호출, 다른 워커의 적재로 버전이 바뀌면 다음 요청에서 한 번)
+    - etag: 월 합계 지문 + 타일 이름 + 파라미터 (본문을 만들지 않고 계산하므로 304 응답은 DB/집계 비용 없음)
+      데이터 버전이 바뀌면 다시 읽은 월 합계로 지문을 새로 만듦 (버전 번호 대신 내용 기준이라 재시작/워커 간에도 일관됨)
+    - tile: 타일 응답 본문 (같은 데이터 버전·파라미터는 재사용)
+    """
+
+    def __init__(self, db_service):
+        self.db_service = db_service
+        self.version: Optional[int] = None
+        self.months: MonthlyTotals = {}
+        self.fingerprint = ""
+        self._payloads: Dict[Tuple[str, Tuple], Dict[str, Any]] = {}
+        self._lock = asyncio.Lock()
+
+    async def refresh(self) -> None:
+        # 집계 전에 버전을 읽어 두어, 집계 중 적재가 끝나면 다음 요청에서 다시 읽도록 함
+        version = self.db_service.data_version
+        df = await self.db_service.execute_query_async(MONTHLY_TOTALS_SQL)
+        months: MonthlyTotals = {}
+        for year, month, defects, production in df.itertuples(index=False):
+            months.setdefault(int(year), {})[int(month)] = (_number(defects), _number(production))
+        fingerprint = hashlib.sha1(repr(sorted((year, sorted(values.items())) for year, values in months.items()))
+                                   .encode("utf-8")).hexdigest()[:12]
+        self.months, self.fingerprint, self._payloads, self.version = months, fingerprint, {}, version
+        log.info("dashboard.refreshed", data_version=version, months=len(df), fingerprint=fingerprint)
+
+    async def ensure_current(self) -> None:
+        """현재 데이터 버전의 월 합계가 아니면 다시 읽음 (동시 요청은 한 번만 집계)"""
+        if self.version == self.db_service.data_version:
+            return
+        async with self._lock:
+            if self.version != self.db_service.data_version:
+                await self.refresh()
+
+    def etag(self, name: str, params: Dict[str, Any]) -> str:
+        query = "&".join(f"{key}={value}" for key, value in sorted(params.items()))
+        digest = hashlib.sha1(f"{name}?{query}".encode("utf-8")).hexdigest()[:12]
+        return f'W/"{self.fingerprint}-{digest}"'
+
+    def tile(self, name: str, params: Dict[str, Any]) -> Dict[str, Any]:
+        key = (name, tuple(sorted(params.items())))
+        payload = self._payloads.get(key)
+        if payload is None:
+            if len(self._payloads) >= DASHBOARD_TILE_CACHE_MAXSIZE:
+                self._payloads.clear()
+            payload = self._payloads[key] = TILES[name](self.months, **params)
+        return payload
+
+
+def cache_control() -> str:
+    if DASHBOARD_MAX_AGE_SECONDS > 0:
+        return f"public, max-age={DASHBOARD_MAX_AGE_SECONDS}, must-revalidate"
+    return "no-cache"
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """If-None-Match 헤더에 현재 ETag가 있는지 (약한 비교, W/ 접두사 무시)"""
+    if not if_none_match:
+        return False
+    candidates: List[str] = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in candidates or etag.removeprefix("W/") in {tag.removeprefix("W/") for tag in candidates}
+
+
+def _number(value: Any) -> float:
+    value = float(value) if value is not None else 0.0
+    return 0.0 if math.isnan(value) else value
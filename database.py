@@ -1,176 +1,293 @@
+import asyncio
+import contextvars
+import functools
 import sqlite3
+import time
 import pandas as pd
 import os
-from typing import List, Dict, Any
+import re
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any, Optional
+
+import metrics
+from db_pool import ConnectionPool, DB_POOL_SIZE
+from ingest import CSVIngestor, DEFAULT_CSV_FILES, INGEST_CHUNK_ROWS
+from query_governor import QueryGovernor
+from rollup import RollupManager
+from schema import ensure_schema
+from shared_state import create_cache, get_shared_state
+from structured_logging import get_logger, lazy
+
+log = get_logger("db")
+
+# 데이터베이스 파일 경로 (벤치마크 등에서 별도 DB를 쓸 때 지정)
+DB_PATH = os.getenv("DB_PATH", "quality_analysis.db")
+
+# SQL 결과 캐시 설정 (환경변수로 조정 가능, 항목 수 0이면 비활성화)
+DB_RESULT_CACHE_MAXSIZE = int(os.getenv("DB_RESULT_CACHE_MAXSIZE", "256"))
+DB_RESULT_CACHE_MAX_BYTES = int(os.getenv("DB_RESULT_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+
+# 비동기 쿼리 실행 설정: 전용 스레드 수와 LLM 생성 SQL 결과의 최대 행 수
+DB_MAX_WORKERS = int(os.getenv("DB_MAX_WORKERS", str(max(DB_POOL_SIZE, 1))))
+DB_MAX_RESULT_ROWS = int(os.getenv("DB_MAX_RESULT_ROWS", "10000"))
+
+# 문자열 리터럴 / 따옴표 식별자 / 주석 / 그 외 구간을 구분하는 토큰 패턴
+_SQL_TOKEN_PATTERN = re.compile(r"""('(?:[^']|'')*'|"(?:[^"]|"")*"|--[^\n]*|/\*.*?\*/|[^'"\-/]+|.)""", re.DOTALL)
+
+def canonicalize_sql(query: str) -> str:
+    """캐시 키 용 SQL 정규화
+
+    - 주석 제거, 연속 공백을 하나로 통일, 괄호·쉼표 주변 공백 제거, 끝 세미콜론 제거
+    - 문자열 리터럴과 따옴표 식별자는 그대로 유지 (대소문자 변환도 하지 않음: 별칭이 결과 컬럼명이 되므로)
+    """
+    parts, code = [], []
+
+    def flush_code():
+        if code:
+            segment = re.sub(r"\s+", " ", "".join(code))
+            parts.append(re.sub(r" ?([(),]) ?", r"\1", segment))
+            code.clear()
+
+    for token in _SQL_TOKEN_PATTERN.findall(query):
+        if token.startswith(("'", '"')) and len(token) > 1:
+            flush_code()
+            parts.append(token)
+        elif token.startswith("--") or token.startswith("/*"):
+            code.append(" ")
+        else:
+            code.append(token)
+    flush_code()
+    return "".join(parts).strip().rstrip(";").strip()
+
+def dataframe_nbytes(df: pd.DataFrame) -> int:
+    """캐시 용량 계산을 위한 DataFrame 메모리 사용량(바이트)"""
+    return int(df.memory_usage(index=True, deep=True).sum())
 
 class DatabaseService:
-    def __init__(self, db_path: str = "quality_analysis.db"):
+    def __init__(self, db_path: str = DB_PATH):
         self.db_path = db_path
+        # 읽기 전용 연결은 풀에서 재사용하고, 스키마 생성/적재는 단일 쓰기 연결로 처리
+        self.pool = ConnectionPool(db_path)
+        # 이벤트 루프를 막지 않도록 쿼리는 전용 스레드 풀에서 실행 (execute_query_async)
+        self._executor = ThreadPoolExecutor(max_workers=DB_MAX_WORKERS, thread_name_prefix="db-query")
+        self.max_result_rows = DB_MAX_RESULT_ROWS
+        # 실행 계획 검사 / 실행 시간 제한 / 결과 크기 제한
+        self.governor = QueryGovernor()
+        # 월 단위 요약 테이블 유지 및 집계 SQL 재작성
+        self.rollups = RollupManager()
+        # 데이터 적재 시마다 증가하는 버전. 결과 캐시 키에 포함되어 이전 데이터의 결과를 무효화함
+        # (멀티 워커에서는 공유 상태의 카운터를 사용하여 다른 워커의 적재도 반영)
+        self.shared_state = get_shared_state()
+        self._data_version = 0
+        self.result_cache = create_cache(
+            "sql_result",
+            maxsize=DB_RESULT_CACHE_MAXSIZE,
+            max_bytes=DB_RESULT_CACHE_MAX_BYTES,
+            sizeof=dataframe_nbytes
+        )
+
+    @property
+    def data_version(self) -> int:
+        if self.shared_state is not None:
+            return self.shared_state.counter("data_version")
+        return self._data_version
+
+    def bump_data_version(self):
+        """데이터가 바뀌었음을 알림 (적재/ingest 후 호출) - 기존 결과 캐시는 모두 무효화"""
+        if self.shared_state is not None:
+            self.shared_state.increment("data_version")
+        else:
+            self._data_version += 1
+        self.result_cache.clear()
+
+    def cache_stats(self) -> Dict[str, Any]:
+        """SQL 결과 캐시 적중 통계"""
+        return {"data_version": self.data_version, **self.result_cache.stats()}
+
+    def rollup_stats(self) -> Dict[str, Any]:
+        """요약 테이블 재작성 통계"""
+        return {"enabled": self.rollups.enabled, "ready": self.rollups.ready, "rewrites": self.rollups.rewrites}
+
+    def pool_stats(self) -> Dict[str, Any]:
+        """연결 풀 재사용 통계"""
+        return self.pool.stats()
+
+    def close(self):
+        """쿼리 스레드 풀과 모든 DB 연결 종료 (애플리케이션 종료 시 호출)"""
+        self._executor.shutdown(wait=True)
+        self.pool.close_all()
         
     def init_database(self):
         """Initialize database with table schemas"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
+        with self.pool.writer() as conn:
+            self._create_tables(conn)
+
+    def _create_tables(self, conn: sqlite3.Connection):
+        """테이블/정수형 날짜 키 생성 컬럼/보조 인덱스 생성 (이전 스키마는 데이터 보존하여 변환)"""
         try:
-            # Create TB_SUM_MQS_QMHT200 (품질부적합통합실적)
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS TB_SUM_MQS_QMHT200 (
-                    DAY_CD TEXT,
-                    TR_F_PRODQUANTITY INTEGER,
-                    QLY_INC_HPW INTEGER,
-                    ITEM_TYPE_GROUP_NAME TEXT,
-                    EX_A_MAST_GD_CAU_NM TEXT,
-                    END_USER_NAME TEXT,
-                    QLY_INC_HPN_FAC_TP_NM TEXT,
-                    QLY_INC_RESP_FAC_TP_NM TEXT,
-                    SPECIFICATION_CD_N TEXT
-                )
-            """)
-            
-            # Create TB_S95_SALS_CLAM030 (클레임제기보상)
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS TB_S95_SALS_CLAM030 (
-                    END_USER_NAME TEXT,
-                    RMA_QTY INTEGER,
-                    ITEM_TYPE_GROUP_NAME TEXT,
-                    EXPECTED_RESOLUTION_DATE TEXT
-                )
-            """)
-            
-            # Create TB_S95_A_GALA_SALESPROD (매출실적분석제품)
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS TB_S95_A_GALA_SALESPROD (
-                    END_USER_NAME TEXT,
-                    ITEM_TYPE_GROUP_NAME TEXT,
-                    SALE_QTY INTEGER,
-                    SALES_DATE TEXT
-                )
-            """)
-            
-            conn.commit()
-            print("Database tables created successfully")
-            
-        except Exception as e:
-            print(f"Error creating database tables: {e}")
+            ensure_schema(conn)
+            self.rollups.ensure(conn)
+            log.info("db.schema_ready", db_path=self.db_path)
+        except Exception:
+            log.exception("db.schema_failed", db_path=self.db_path)
             raise
-        finally:
-            conn.close()
     
     def is_database_empty(self) -> bool:
         """Check if database tables are empty"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
         try:
-            cursor.execute("SELECT COUNT(*) FROM TB_SUM_MQS_QMHT200")
-            count = cursor.fetchone()[0]
-            return count == 0
+            with self.pool.reader() as conn:
+                cursor = conn.cursor()
+                cursor.execute("SELECT COUNT(*) FROM TB_SUM_MQS_QMHT200")
+                count = cursor.fetchone()[0]
+                return count == 0
         except:
             return True
-        finally:
-            conn.close()
     
     def load_csv_data(self):
-        """Load data from CSV files into database"""
-        # Load TB_SUM_MQS_QMHT200
-        csv_files = {
-            'TB_SUM_MQS_QMHT200': 'attached_assets/TB_SUM_MQS_QMHT200_1749701517202.csv',
-            'TB_S95_SALS_CLAM030': 'attached_assets/TB_S95_SALS_CLAM030_1749701517203.csv',
-            'TB_S95_A_GALA_SALESPROD': 'attached_assets/TB_S95_A_GALA_SALESPROD_1749701517204.csv'
-        }
-        
-        conn = sqlite3.connect(self.db_path)
-        
+        """Load data from CSV files into database (기본 CSV로 원본 테이블 교체)"""
+        files = []
+        for table_name, csv_path in DEFAULT_CSV_FILES.items():
+            if os.path.exists(csv_path):
+                files.append({"path": csv_path, "table_name": table_name})
+            else:
+                log.warning("ingest.file_missing", path=csv_path, table=table_name)
+
         try:
-            for table_name, csv_path in csv_files.items():
-                if os.path.exists(csv_path):
-                    print(f"Loading {csv_path} into {table_name}")
-                    df = pd.read_csv(csv_path, encoding='utf-8')
-                    
-                    # Clean column names and data
-                    df.columns = df.columns.str.strip()
-                    
-                    # Handle missing values
-                    df = df.fillna('')
-                    
-                    # Convert numeric columns
-                    if table_name == 'TB_SUM_MQS_QMHT200':
-                        df['TR_F_PRODQUANTITY'] = pd.to_numeric(df['TR_F_PRODQUANTITY'], errors='coerce').fillna(0).astype(int)
-                        df['QLY_INC_HPW'] = pd.to_numeric(df['QLY_INC_HPW'], errors='coerce').fillna(0).astype(int)
-                    elif table_name == 'TB_S95_SALS_CLAM030':
-                        df['RMA_QTY'] = pd.to_numeric(df['RMA_QTY'], errors='coerce').fillna(0).astype(int)
-                    elif table_name == 'TB_S95_A_GALA_SALESPROD':
-                        df['SALE_QTY'] = pd.to_numeric(df['SALE_QTY'], errors='coerce').fillna(0).astype(int)
-                    
-                    # Insert data
-                    df.to_sql(table_name, conn, if_exists='replace', index=False)
-                    print(f"Loaded {len(df)} records into {table_name}")
-                else:
-                    print(f"CSV file not found: {csv_path}")
-                    
-        except Exception as e:
-            print(f"Error loading CSV data: {e}")
+            return self.ingest_csv_files(files, replace=True)
+        except Exception:
+            log.exception("ingest.load_failed")
             raise
-        finally:
-            conn.close()
-    
-    def execute_query(self, query: str) -> pd.DataFrame:
-        """Execute SQL query and return results as DataFrame"""
-        conn = sqlite3.connect(self.db_path)
-        try:
-            print(f"\n[DEBUG] Executing query in database: {query}")
+
+    def ingest_csv_files(self, files: List[Dict[str, Optional[str]]], replace: bool = False,
+                         chunksize: Optional[int] = None) -> Dict[str, Any]:
+        """CSV 파일을 청크 단위로 적재하고 요약 테이블/데이터 버전 갱신
+
+        - files=[{"path": ..., "table_name": ...}], 이미 적재된 파일(내용 해시 기준)은 건너뜀
+        - replace=True이면 대상 테이블을 비우고 적재 (적재 행이 없어도 요약 테이블 재집계 및 데이터 버전 갱신)
+        - 반환: 파일별 적재 행 수와 rows/sec
+        """
+        ingestor = CSVIngestor(chunksize or INGEST_CHUNK_ROWS)
+        with self.pool.writer() as conn:
+            result = ingestor.ingest(conn, files, replace=replace)
+            if result["rows"] == 0 and not replace:
+                return result  # 건너뛴 파일뿐이면 바뀐 데이터가 없음 (replace는 빈 파일이어도 테이블을 비웠으므로 갱신)
             try:
-                df = pd.read_sql_query(query, conn)
-                print(f"[DEBUG] DataFrame shape: {df.shape}")
-                print(f"[DEBUG] DataFrame columns: {df.columns.tolist()}")
-                # 각 셀 값을 str로 변환하여 안전하게 출력
-                head_str = df.head().astype(str)
-                print(f"[DEBUG] DataFrame head (as str):\n{head_str}\n")
+                if replace:
+                    # 원본이 전부 교체되었으므로 요약 테이블 전체 재집계 및 인덱스 통계 갱신
+                    self.rollups.refresh(conn)
+                    conn.execute("ANALYZE")
+                else:
+                    # 새로 들어온 년월만 요약 테이블 재집계
+                    self.rollups.refresh(conn, months=result["months"])
+                    conn.execute("PRAGMA optimize")
+            finally:
+                self.bump_data_version()
+        log.info("ingest.completed", rows=result["rows"], elapsed_seconds=result["elapsed_seconds"],
+                 rows_per_second=result["rows_per_second"], replace=replace)
+        return result
+
+    async def ingest_csv_files_async(self, files: List[Dict[str, Optional[str]]], replace: bool = False) -> Dict[str, Any]:
+        """ingest_csv_files를 기본 스레드 풀에서 실행 (쿼리 전용 스레드를 점유하지 않음)"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, functools.partial(self.ingest_csv_files, files, replace=replace))
+    
+    def execute_query(self, query: str, use_cache: bool = True, max_rows: Optional[int] = None) -> pd.DataFrame:
+        """Execute SQL query and return results as DataFrame
+
+        - 동일한 SQL(정규화 기준)은 데이터 버전이 바뀌기 전까지 캐시된 결과의 복사본을 반환
+        - 월 단위 요약 테이블로 결과가 같은 집계 SQL은 요약 테이블 대상으로 재작성하여 실행
+        - 모든 쿼리는 QueryGovernor를 거쳐 실행됨 (카테시안 곱 검사, 시간 제한, 바이트 상한)
+        - max_rows를 지정하면 그 이상의 행은 읽지 않음
+        - 결과 메타데이터: df.attrs["truncated"], df.attrs["truncated_reason"] ("rows"/"bytes"), df.attrs["warnings"]
+        - 소요 시간/행 수는 결과 출처(cache/rollup/raw)별로 metrics에 기록
+        """
+        started = time.perf_counter()
+        cache_key = (self.data_version, canonicalize_sql(query), max_rows)
+        if use_cache:
+            cached = self.result_cache.get(cache_key)
+            if cached is not None:
+                log.debug("db.cache_hit", sample=True, sql=cache_key[1])
+                df = cached.copy()
+                self._record_query(started, "cache", len(df))
                 return df
-            except pd.io.sql.DatabaseError as e:
-                print(f"Pandas SQL error: {str(e)}")
-                cursor = conn.cursor()
-                cursor.execute(query)
-                print("Direct cursor execution succeeded")
-                raise
-            except sqlite3.Error as e:
-                print(f"SQLite error: {str(e)}")
-                raise
-            except Exception as e:
-                print(f"Other error during query execution: {str(e)}")
-                raise
+
+        rewritten = self.rollups.rewrite(query)
+        if rewritten is not None:
+            log.debug("db.rollup_rewrite", sample=True, sql=query, rewritten=rewritten)
+        try:
+            df = self._run_query(rewritten or query, max_rows)
+        except Exception:
+            metrics.DB_QUERY_ERRORS.inc()
+            raise
+        if use_cache:
+            self.result_cache.set(cache_key, df.copy())
+        self._record_query(started, "rollup" if rewritten is not None else "raw", len(df))
+        return df
+
+    @staticmethod
+    def _record_query(started: float, source: str, rows: int) -> None:
+        elapsed = time.perf_counter() - started
+        metrics.DB_QUERY_SECONDS.observe(elapsed, source=source)
+        metrics.DB_QUERY_ROWS.observe(rows, source=source)
+        metrics.add_timing("db_ms", elapsed * 1000)
+        metrics.add_timing("db_rows", rows)
+
+    async def execute_query_async(self, query: str, use_cache: bool = True, max_rows: Optional[int] = None) -> pd.DataFrame:
+        """execute_query를 전용 스레드 풀에서 실행 (이벤트 루프를 막지 않음)
+
+        호출한 요청의 컨텍스트를 복사해 실행하므로 DB 소요 시간이 요청별 timings에도 합산됨
+        """
+        loop = asyncio.get_running_loop()
+        context = contextvars.copy_context()
+        return await loop.run_in_executor(
+            self._executor,
+            functools.partial(context.run, self.execute_query, query, use_cache=use_cache, max_rows=max_rows)
+        )
+
+    def _run_query(self, query: str, max_rows: Optional[int] = None) -> pd.DataFrame:
+        """SQL을 실제로 실행하여 DataFrame으로 반환 (캐시 미사용)"""
+        try:
+            with self.pool.reader() as conn:
+                return self._read_dataframe(conn, query, max_rows)
         except Exception as e:
-            print(f"Error executing query: {e}")
-            print(f"Query: {query}")
-            print(f"Database path: {self.db_path}")
-            print(f"Database exists: {os.path.exists(self.db_path)}")
+            log.error("db.query_failed", error=str(e), error_type=type(e).__name__, sql=query,
+                      db_path=self.db_path, db_exists=lazy(lambda: os.path.exists(self.db_path)))
             raise
-        finally:
-            conn.close()
+
+    def _read_dataframe(self, conn: sqlite3.Connection, query: str, max_rows: Optional[int] = None) -> pd.DataFrame:
+        outcome = self.governor.run(conn, query, max_rows=max_rows)
+        df = pd.DataFrame.from_records(outcome["rows"], columns=outcome["columns"], coerce_float=True)
+        df.attrs["truncated"] = outcome["truncated"]
+        df.attrs["truncated_reason"] = outcome["truncated_reason"]
+        df.attrs["warnings"] = outcome["warnings"]
+        for warning in outcome["warnings"]:
+            log.warning("db.query_warning", warning=warning, sql=query)
+        if outcome["truncated"]:
+            log.warning("db.result_truncated", reason=outcome["truncated_reason"], rows=len(df), sql=query)
+        # 결과 미리보기는 DEBUG 레벨이 켜져 있고 샘플링된 경우에만 계산
+        log.debug("db.query_executed", sample=True, sql=query, rows=len(df), columns=lazy(lambda: df.columns.tolist()),
+                  head=lazy(lambda: df.head().to_dict("records")))
+        return df
     
     def get_table_info(self, table_name: str) -> Dict[str, Any]:
         """Get table schema information"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
         try:
-            cursor.execute(f"PRAGMA table_info({table_name})")
-            columns = cursor.fetchall()
-            
-            cursor.execute(f"SELECT COUNT(*) FROM {table_name}")
-            row_count = cursor.fetchone()[0]
+            with self.pool.reader() as conn:
+                cursor = conn.cursor()
+                cursor.execute(f"PRAGMA table_info({table_name})")
+                columns = cursor.fetchall()
+                
+                cursor.execute(f"SELECT COUNT(*) FROM {table_name}")
+                row_count = cursor.fetchone()[0]
             
             return {
                 "table_name": table_name,
                 "columns": [{"name": col[1], "type": col[2]} for col in columns],
                 "row_count": row_count
             }
-        except Exception as e:
-            print(f"Error getting table info: {e}")
+        except Exception:
+            log.exception("db.table_info_failed", table=table_name)
             raise
-        finally:
-            conn.close()
     
     def get_sample_data(self, table_name: str, limit: int = 5) -> pd.DataFrame:
         """Get sample data from table"""
@@ -0,0 +1,139 @@
+"""
+SQLite connection pool: long-lived read-only connections plus a single writer connection
+"""
+import os
+import queue
+import sqlite3
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict, Optional
+from urllib.parse import quote
+
+# 연결 풀 설정 (환경변수로 조정 가능)
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "4"))                       # 읽기 전용 연결 수 (0이면 매번 새 연결)
+DB_POOL_TIMEOUT_SECONDS = float(os.getenv("DB_POOL_TIMEOUT_SECONDS", "30"))
+DB_MMAP_SIZE = int(os.getenv("DB_MMAP_SIZE", str(256 * 1024 * 1024)))     # 메모리 맵 I/O 크기(바이트)
+DB_CACHE_SIZE_KB = int(os.getenv("DB_CACHE_SIZE_KB", str(64 * 1024)))     # 연결별 페이지 캐시 크기(KiB)
+
+
+class ConnectionPool:
+    """읽기 전용 연결을 재사용하는 SQLite 연결 풀
+
+    - 읽기: mode=ro URI 연결을 최대 size개까지 만들어 재사용 (부족하면 반납될 때까지 대기)
+    - 쓰기: 적재(ingest) 전용 연결 1개를 잠금으로 보호하여 사용
+    - 모든 연결에 mmap_size / cache_size / temp_store=MEMORY 적용, DB 파일은 WAL 모드로 전환
+    """
+
+    def __init__(self, db_path: str, size: int = DB_POOL_SIZE, timeout: float = DB_POOL_TIMEOUT_SECONDS):
+        self.db_path = db_path
+        self.size = size
+        self.timeout = timeout
+        self._idle: "queue.LifoQueue[sqlite3.Connection]" = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._open_readers = 0
+        self._writer: Optional[sqlite3.Connection] = None
+        self._writer_lock = threading.RLock()
+        # 재사용 여부 확인용 통계
+        self.connections_created = 0
+        self.checkouts = 0
+
+    def _apply_pragmas(self, conn: sqlite3.Connection) -> None:
+        conn.execute(f"PRAGMA mmap_size = {DB_MMAP_SIZE}")
+        conn.execute(f"PRAGMA cache_size = -{DB_CACHE_SIZE_KB}")
+        conn.execute("PRAGMA temp_store = MEMORY")
+
+    def _open_reader(self) -> sqlite3.Connection:
+        uri = f"file:{quote(os.path.abspath(self.db_path))}?mode=ro"
+        conn = sqlite3.connect(uri, uri=True, check_same_thread=False)
+        self._apply_pragmas(conn)
+        conn.execute("PRAGMA query_only = ON")
+        with self._lock:
+            self.connections_created += 1
+        return conn
+
+    def _acquire_reader(self) -> sqlite3.Connection:
+        with self._lock:
+            self.checkouts += 1
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            can_open = self._open_readers < self.size
+            if can_open:
+                self._open_readers += 1
+        if can_open:
+            try:
+                return self._open_reader()
+            except Exception:
+                with self._lock:
+                    self._open_readers -= 1
+                raise
+        try:
+            return self._idle.get(timeout=self.timeout)
+        except queue.Empty:
+            raise TimeoutError(f"DB 연결 대기 시간 초과 ({self.timeout}초)")
+
+    @contextmanager
+    def reader(self):
+        """읽기 전용 연결 대여 (사용 후 자동 반납)"""
+        if self.size <= 0:
+            # 풀 비활성화: 요청마다 새 연결을 열고 닫음
+            with self._lock:
+                self.checkouts += 1
+            conn = self._open_reader()
+            try:
+                yield conn
+            finally:
+                conn.close()
+            return
+
+        conn = self._acquire_reader()
+        try:
+            yield conn
+        except Exception:
+            # 실패한 쿼리가 열어 둔 트랜잭션이 남지 않도록 정리
+            try:
+                conn.rollback()
+            except sqlite3.Error:
+                pass
+            raise
+        finally:
+            self._idle.put(conn)
+
+    @contextmanager
+    def writer(self):
+        """적재 전용 쓰기 연결 사용 (동시에 하나의 작업만 사용 가능)"""
+        with self._writer_lock:
+            if self._writer is None:
+                conn = sqlite3.connect(self.db_path, check_same_thread=False)
+                conn.execute("PRAGMA journal_mode = WAL")
+                conn.execute("PRAGMA synchronous = NORMAL")
+                self._apply_pragmas(conn)
+                self._writer = conn
+            yield self._writer
+
+    def close_all(self) -> None:
+        """모든 연결 종료"""
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
+        with self._lock:
+            self._open_readers = 0
+        with self._writer_lock:
+            if self._writer is not None:
+                self._writer.close()
+                self._writer = None
+
+    def stats(self) -> Dict[str, Any]:
+        """읽기 연결 생성 수 대비 대여 횟수 (재사용률)"""
+        return {
+            "pool_size": self.size,
+            "open_readers": self._open_readers,
+            "idle_readers": self._idle.qsize(),
+            "connections_created": self.connections_created,
+            "checkouts": self.checkouts,
+            "reuse_rate": round(1 - self.connections_created / self.checkouts, 4) if self.checkouts else 0.0,
+        }
@@ -90,3 +90,47 @@ LLM은 사용자에게 명확하고 의사결정 가능한 형태의 정보로 
 """
 
 
+
+# ---------- 규칙 기반 처리용 어휘 (DOMAIN_KNOWLEDGE의 [1]~[6]과 같은 내용을 구조화) ----------
+
+# [1] 주요 지표: 지표명 → 계산식
+METRICS = {
+    "품질부적합률": "(QLY_INC_HPW / TR_F_PRODQUANTITY) * 100",
+    "클레임률": "(RMA_QTY / SALE_QTY) * 100",
+}
+
+# 지표/측정값을 가리키는 표현 (지표명, 별칭, 계산에 쓰이는 수치 컬럼의 한글명)
+METRIC_TERMS = (
+    "품질부적합률", "부적합률", "불량률", "클레임률",
+    "품질부적합발생량", "부적합발생량", "부적합량", "불량량", "품질부적합", "부적합",
+    "제품생산량", "생산량", "클레임보상액", "보상액", "클레임", "제품매출가격", "매출액", "매출", "판매량",
+)
+
+# [2]~[4] 분석 축: 한글 표현 → 해당 컬럼 (컬럼이 2개 이상이면 [6]에 따라 기준 확인이 필요)
+COLUMN_ALIASES = {
+    "발생공장": ("QLY_INC_HPN_FAC_TP_NM",),
+    "책임공장": ("QLY_INC_RESP_FAC_TP_NM",),
+    "공장": ("QLY_INC_HPN_FAC_TP_NM", "QLY_INC_RESP_FAC_TP_NM"),
+    "공정": ("QLY_INC_HPN_FAC_TP_NM", "QLY_INC_RESP_FAC_TP_NM"),
+    "품종그룹": ("ITEM_TYPE_GROUP_NAME",),
+    "품종": ("ITEM_TYPE_GROUP_NAME",),
+    "제품규격": ("SPECIFICATION_CD_N",),
+    "규격": ("SPECIFICATION_CD_N",),
+    "제품": ("ITEM_TYPE_GROUP_NAME", "SPECIFICATION_CD_N"),
+    "고객사": ("END_USER_NAME",),
+    "고객": ("END_USER_NAME",),
+    "외관불량원인": ("EX_A_MAST_GD_CAU_NM",),
+    "불량원인": ("EX_A_MAST_GD_CAU_NM",),
+    "원인": ("EX_A_MAST_GD_CAU_NM",),
+}
+
+# 컬럼 값 예시
+ITEM_TYPES = ("냉연", "선재", "전기강판", "도금", "열연", "후판")
+CUSTOMERS = ("A고객사", "B고객사", "C고객사", "D고객사", "E고객사")
+SPECIFICATIONS = ("JS-A", "JS-B", "JS-C", "JS-D", "JS-E", "JS-F", "JS-G")
+
+# [5] 외관불량원인명 (정의가 있는 항목 + [2]의 예시 값)
+DEFECT_CAUSES = (
+    "Build Up", "Black Line", "Dust", "Edge burr", "Edge파손", "두께불량", "양파", "폭불량", "Crack", "겹침흠",
+    "Blow Hole", "Scab", "UST불량", "부푼흠", "단중미달", "딱지흠",
+)
@@ -0,0 +1,185 @@
+"""
+Streaming CSV ingest: chunked reads with explicit dtypes, executemany bulk inserts in one transaction,
+per-file SHA-256 dedup and rows/sec reporting
+
+실행: python ingest.py attached_assets/TB_SUM_MQS_QMHT200_20250601.csv [...] [--table TB_SUM_MQS_QMHT200] [--replace]
+"""
+import argparse
+import hashlib
+import os
+import sqlite3
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Set
+
+import pandas as pd
+
+from schema import DATE_COLUMNS, TABLE_COLUMNS
+from structured_logging import get_logger
+
+log = get_logger("ingest")
+
+# 적재 설정 (환경변수로 조정 가능)
+INGEST_CHUNK_ROWS = int(os.getenv("INGEST_CHUNK_ROWS", "50000"))   # 한 번에 읽어 INSERT하는 행 수
+INGEST_DIR = os.getenv("INGEST_DIR", "attached_assets")            # API로 적재 가능한 CSV 위치
+
+_HASH_BLOCK_SIZE = 1024 * 1024
+
+# 기본 데이터 파일 (최초 기동 시 적재)
+DEFAULT_CSV_FILES = {
+    'TB_SUM_MQS_QMHT200': 'attached_assets/TB_SUM_MQS_QMHT200_1749701517202.csv',
+    'TB_S95_SALS_CLAM030': 'attached_assets/TB_S95_SALS_CLAM030_1749701517203.csv',
+    'TB_S95_A_GALA_SALESPROD': 'attached_assets/TB_S95_A_GALA_SALESPROD_1749701517204.csv'
+}
+
+
+class IngestError(Exception):
+    """적재할 수 없는 파일 (대상 테이블 불명, 필수 컬럼 누락 등)"""
+
+
+def file_sha256(path: str) -> str:
+    """파일 내용의 SHA-256 (블록 단위로 읽어 메모리 사용량 일정)"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(_HASH_BLOCK_SIZE), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def infer_table(path: str) -> str:
+    """파일명 접두어로 대상 테이블 추정 (예: TB_SUM_MQS_QMHT200_20250601.csv)"""
+    file_name = os.path.basename(path).upper()
+    for table_name in TABLE_COLUMNS:
+        if file_name.startswith(table_name):
+            return table_name
+    raise IngestError(f"대상 테이블을 알 수 없는 파일입니다: {path}")
+
+
+def _read_chunks(path: str, table_name: str, chunksize: int):
+    """CSV를 chunksize 행씩 읽음 - 타입 추론 없이 모든 컬럼을 문자열로 읽고 숫자 컬럼만 변환"""
+    columns = TABLE_COLUMNS[table_name]
+    reader = pd.read_csv(
+        path,
+        encoding="utf-8-sig",
+        usecols=lambda col: col.strip() in columns,
+        dtype=str,
+        keep_default_na=False,  # 빈 값은 NaN이 아닌 '' 로 유지
+        chunksize=chunksize,
+    )
+    for chunk in reader:
+        chunk.columns = chunk.columns.str.strip()
+        missing = [col for col in columns if col not in chunk.columns]
+        if missing:
+            raise IngestError(f"{path}: 필수 컬럼 누락 {missing}")
+        for col, col_type in columns.items():
+            if col_type == "INTEGER":
+                chunk[col] = pd.to_numeric(chunk[col], errors="coerce").fillna(0).astype("int64")
+        yield chunk[list(columns)]
+
+
+class CSVIngestor:
+    """CSV 파일을 원본 테이블에 추가(또는 교체) 적재
+
+    - 파일 내용 해시를 INGEST_LOG에 기록하여 같은 파일은 다시 적재하지 않음
+    - 한 번의 ingest 호출에 포함된 모든 파일은 하나의 트랜잭션으로 반영 (실패 시 전부 롤백)
+    - 적재된 년월(YYYYMM) 목록을 반환하여 요약 테이블을 해당 월만 갱신할 수 있게 함
+    """
+
+    def __init__(self, chunksize: int = INGEST_CHUNK_ROWS):
+        self.chunksize = chunksize
+
+    def ingest(self, conn: sqlite3.Connection, files: List[Dict[str, Optional[str]]],
+               replace: bool = False) -> Dict[str, Any]:
+        """files=[{"path": ..., "table_name": ...(생략 시 파일명으로 추정)}]
+
+        replace=True이면 대상 테이블을 비우고 적재 (해시 중복 검사 생략)
+        """
+        started = time.perf_counter()
+        reports = []
+        months: Dict[str, Set[str]] = {}
+
+        conn.execute("BEGIN")
+        try:
+            cleared: Set[str] = set()
+            for entry in files:
+                path = entry["path"]
+                table_name = entry.get("table_name") or infer_table(path)
+                if table_name not in TABLE_COLUMNS:
+                    raise IngestError(f"알 수 없는 테이블입니다: {table_name}")
+                if not os.path.exists(path):
+                    raise IngestError(f"CSV 파일이 없습니다: {path}")
+
+                file_hash = file_sha256(path)
+                if replace and table_name not in cleared:
+                    conn.execute(f"DELETE FROM {table_name}")
+                    conn.execute("DELETE FROM INGEST_LOG WHERE TABLE_NAME = ?", (table_name,))
+                    cleared.add(table_name)
+                elif conn.execute("SELECT 1 FROM INGEST_LOG WHERE FILE_HASH = ?", (file_hash,)).fetchone():
+                    log.info("ingest.file_skipped", path=path, table=table_name, sha256=file_hash)
+                    reports.append({"path": path, "table_name": table_name, "status": "skipped", "rows": 0,
+                                    "sha256": file_hash})
+                    continue
+
+                report = self._ingest_file(conn, path, table_name, months.setdefault(table_name, set()))
+                report["sha256"] = file_hash
+                conn.execute(
+                    "INSERT OR REPLACE INTO INGEST_LOG (FILE_HASH, TABLE_NAME, FILE_NAME, ROW_COUNT, INGESTED_AT) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    (file_hash, table_name, os.path.basename(path), report["rows"], datetime.now().isoformat())
+                )
+                reports.append(report)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+
+        elapsed = time.perf_counter() - started
+        total_rows = sum(report["rows"] for report in reports)
+        return {
+            "files": reports,
+            "rows": total_rows,
+            "elapsed_seconds": round(elapsed, 3),
+            "rows_per_second": round(total_rows / elapsed) if elapsed > 0 else 0,
+            "months": {table: sorted(values) for table, values in months.items() if values},
+        }
+
+    def _ingest_file(self, conn: sqlite3.Connection, path: str, table_name: str, months: Set[str]) -> Dict[str, Any]:
+        columns = list(TABLE_COLUMNS[table_name])
+        date_col = DATE_COLUMNS[table_name]
+        insert_sql = f"INSERT INTO {table_name} ({', '.join(columns)}) VALUES ({', '.join('?' for _ in columns)})"
+
+        started = time.perf_counter()
+        rows = 0
+        for chunk in _read_chunks(path, table_name, self.chunksize):
+            conn.executemany(insert_sql, chunk.itertuples(index=False, name=None))
+            months.update(chunk[date_col].str[:6].unique())
+            rows += len(chunk)
+
+        elapsed = time.perf_counter() - started
+        rows_per_second = round(rows / elapsed) if elapsed > 0 else 0
+        log.info("ingest.file_loaded", path=path, table=table_name, rows=rows, rows_per_second=rows_per_second)
+        return {"path": path, "table_name": table_name, "status": "loaded", "rows": rows,
+                "elapsed_seconds": round(elapsed, 3), "rows_per_second": rows_per_second}
+
+
+if __name__ == "__main__":
+    from database import DB_PATH, DatabaseService
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("paths", nargs="+", help="적재할 CSV 파일")
+    parser.add_argument("--table", help="대상 테이블 (생략 시 파일명 접두어로 추정)")
+    parser.add_argument("--replace", action="store_true", help="대상 테이블을 비우고 적재")
+    parser.add_argument("--chunksize", type=int, default=INGEST_CHUNK_ROWS)
+    parser.add_argument("--db", default=DB_PATH)
+    args = parser.parse_args()
+
+    service = DatabaseService(db_path=args.db)
+    service.init_database()
+    result = service.ingest_csv_files(
+        [{"path": path, "table_name": args.table} for path in args.paths],
+        replace=args.replace, chunksize=args.chunksize
+    )
+    for file_report in result["files"]:
+        print(file_report)
+    print(f"Total: {result['rows']} rows in {result['elapsed_seconds']}s ({result['rows_per_second']:,} rows/sec)")
+    service.close()
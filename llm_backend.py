@@ -0,0 +1,306 @@
+"""
+Pluggable chat-completion backends for LLMService: OpenAI, a deterministic replay/canned stub with
+configurable latency (offline benchmarks and tests) and a recorder that captures real responses for replay
+"""
+import asyncio
+import json
+import os
+import random
+import re
+import threading
+from abc import ABC, abstractmethod
+from typing import AsyncIterator, Dict, List, NamedTuple, Optional
+
+# LLM 백엔드 설정 (환경변수로 조정 가능)
+LLM_BACKEND = os.getenv("LLM_BACKEND", "openai")                                # openai | replay
+LLM_REPLAY_PATH = os.getenv("LLM_REPLAY_PATH", "")                              # 녹화된 응답 파일 (JSON lines, 없으면 내장 응답만 사용)
+LLM_REPLAY_LATENCY_MS = float(os.getenv("LLM_REPLAY_LATENCY_MS", "800"))        # replay 호출 1회(또는 첫 조각)까지의 지연
+LLM_REPLAY_TOKEN_MS = float(os.getenv("LLM_REPLAY_TOKEN_MS", "15"))             # replay 스트리밍 조각 사이 지연
+LLM_REPLAY_JITTER = float(os.getenv("LLM_REPLAY_JITTER", "0.2"))               # 지연 변동 비율 (0이면 고정 지연)
+LLM_REPLAY_SEED = int(os.getenv("LLM_REPLAY_SEED", "42"))
+LLM_RECORD_PATH = os.getenv("LLM_RECORD_PATH", "")                              # 지정하면 OpenAI 응답을 replay 형식으로 기록
+
+
+class LLMCompletion(NamedTuple):
+    content: Optional[str]
+    usage: Optional[Dict[str, int]] = None      # {"prompt_tokens", "completion_tokens"}
+
+
+class LLMChunk(NamedTuple):
+    text: Optional[str]
+    usage: Optional[Dict[str, int]] = None      # 마지막 조각에만 포함
+
+
+class LLMBackend(ABC):
+    """LLMService가 사용하는 채팅 완성 백엔드 인터페이스
+
+    - stage: 호출한 처리 단계 (classify/confirm/sql/intake/visualization/summary/concept 등)
+    - 재시도, 시간 제한, 동시 호출 제한은 LLMService가 담당하므로 백엔드는 1회 호출만 수행
+    """
+
+    name = "base"
+
+    @abstractmethod
+    async def complete(self, messages: List[Dict], model: str, temperature: float, stage: str) -> LLMCompletion:
+        ...
+
+    async def stream(self, messages: List[Dict], model: str, temperature: float, stage: str) -> AsyncIterator[LLMChunk]:
+        """응답 텍스트를 조각 단위로 반환 (기본 구현: complete 결과를 한 조각으로)"""
+        completion = await self.complete(messages, model, temperature, stage)
+        yield LLMChunk(completion.content, completion.usage)
+
+    async def close(self) -> None:
+        pass
+
+
+def _usage_dict(usage) -> Optional[Dict[str, int]]:
+    if usage is None:
+        return None
+    return {
+        "prompt_tokens": getattr(usage, "prompt_tokens", 0) or 0,
+        "completion_tokens": getattr(usage, "completion_tokens", 0) or 0,
+    }
+
+
+class OpenAIBackend(LLMBackend):
+    """OpenAI Chat Completions (SDK 내부 재시도는 끔)"""
+
+    name = "openai"
+
+    def __init__(self, api_key: Optional[str] = None, timeout: Optional[float] = None):
+        from openai import AsyncOpenAI
+
+        api_key = api_key or os.getenv("OPENAI_API_KEY")
+        if not api_key:
+            raise ValueError("OPENAI_API_KEY environment variable is required")
+        self.client = AsyncOpenAI(api_key=api_key, timeout=timeout, max_retries=0)
+
+    async def complete(self, messages: List[Dict], model: str, temperature: float, stage: str) -> LLMCompletion:
+        response = await self.client.chat.completions.create(model=model, messages=messages, temperature=temperature)
+        return LLMCompletion(response.choices[0].message.content, _usage_dict(getattr(response, "usage", None)))
+
+    async def stream(self, messages: List[Dict], model: str, temperature: float, stage: str) -> AsyncIterator[LLMChunk]:
+        stream = await self.client.chat.completions.create(
+            model=model,
+            messages=messages,
+            temperature=temperature,
+            stream=True,
+            stream_options={"include_usage": True}
+        )
+        try:
+            async for chunk in stream:
+                # 마지막 조각에는 choices 없이 토큰 사용량만 담겨 옴
+                text = chunk.choices[0].delta.content if chunk.choices else None
+                yield LLMChunk(text, _usage_dict(getattr(chunk, "usage", None)))
+        finally:
+            await stream.close()
+
+    async def close(self) -> None:
+        await self.client.close()
+
+
+# ---------- replay / 내장 응답 ----------
+
+# 단계별 프롬프트에서 사용자 질문이 들어가는 위치
+_QUESTION_PATTERN = re.compile(r"(?:현재 질문|분석 요청|설명해주세요): ([^\n]*)")
+
+_CANNED_SQL = {
+    "yearly": ("YEAR", "SELECT DAY_YEAR AS YEAR, SUM(QLY_INC_HPW) AS 총품질부적합량, SUM(TR_F_PRODQUANTITY) AS 총생산량, "
+                       "(SUM(QLY_INC_HPW) * 1.0 / SUM(TR_F_PRODQUANTITY)) * 100 AS 품질부적합률 "
+                       "FROM TB_SUM_MQS_QMHT200 GROUP BY DAY_YEAR ORDER BY YEAR"),
+    "monthly": ("YYYYMM", "SELECT DAY_YYYYMM AS YYYYMM, (SUM(QLY_INC_HPW) * 1.0 / SUM(TR_F_PRODQUANTITY)) * 100 AS 품질부적합률 "
+                          "FROM TB_SUM_MQS_QMHT200 GROUP BY DAY_YYYYMM ORDER BY YYYYMM"),
+    "item": ("ITEM_TYPE_GROUP_NAME", "SELECT ITEM_TYPE_GROUP_NAME, DAY_YEAR AS YEAR, "
+                                     "(SUM(QLY_INC_HPW) * 1.0 / SUM(TR_F_PRODQUANTITY)) * 100 AS 품질부적합률 "
+                                     "FROM TB_SUM_MQS_QMHT200 GROUP BY ITEM_TYPE_GROUP_NAME, DAY_YEAR "
+                                     "ORDER BY ITEM_TYPE_GROUP_NAME, YEAR"),
+    "hpn_factory": ("QLY_INC_HPN_FAC_TP_NM", "SELECT QLY_INC_HPN_FAC_TP_NM, "
+                                             "(SUM(QLY_INC_HPW) * 1.0 / SUM(TR_F_PRODQUANTITY)) * 100 AS 품질부적합률 "
+                                             "FROM TB_SUM_MQS_QMHT200 GROUP BY QLY_INC_HPN_FAC_TP_NM ORDER BY 품질부적합률 DESC"),
+    "resp_factory": ("QLY_INC_RESP_FAC_TP_NM", "SELECT QLY_INC_RESP_FAC_TP_NM, "
+                                               "(SUM(QLY_INC_HPW) * 1.0 / SUM(TR_F_PRODQUANTITY)) * 100 AS 품질부적합률 "
+                                               "FROM TB_SUM_MQS_QMHT200 GROUP BY QLY_INC_RESP_FAC_TP_NM ORDER BY 품질부적합률 DESC"),
+    "claim": ("YEAR", "SELECT c.YEAR, (c.RMA * 1.0 / s.SALE) * 100 AS 클레임률 FROM "
+                      "(SELECT RESOLUTION_YEAR AS YEAR, SUM(RMA_QTY) AS RMA FROM TB_S95_SALS_CLAM030 GROUP BY RESOLUTION_YEAR) c "
+                      "JOIN (SELECT SALES_YEAR AS YEAR, SUM(SALE_QTY) AS SALE FROM TB_S95_A_GALA_SALESPROD GROUP BY SALES_YEAR) s "
+                      "ON c.YEAR = s.YEAR ORDER BY c.YEAR"),
+}
+
+_CANNED_SUMMARY = (
+    "요약: 조회 기간 동안 품질부적합률은 전년 대비 상승했으며, 일부 품종과 공장에 부적합량이 집중되어 있습니다.\n"
+    "인사이트: 부적합률 상위 품종의 외관불량원인과 책임공장을 drill-down하여 원인 공정을 확인하고, "
+    "상위 고객사 클레임과의 연관성을 함께 점검할 것을 권장합니다."
+)
+_CANNED_CONCEPT = "품질부적합률은 제품생산량 대비 품질부적합발생량의 비율((QLY_INC_HPW / TR_F_PRODQUANTITY) × 100)로, 공정 품질 수준을 나타내는 핵심 지표입니다."
+
+
+def _question(messages: List[Dict]) -> str:
+    """마지막 사용자 메시지에서 원래 질문 추출 (단계별 프롬프트 접두어 기준)"""
+    content = next((m["content"] for m in reversed(messages) if m.get("role") == "user"), "")
+    match = _QUESTION_PATTERN.search(content)
+    return (match.group(1) if match else content).strip()
+
+
+def _sql_template(question: str) -> str:
+    if "클레임" in question:
+        return "claim"
+    if "공장" in question:
+        return "resp_factory" if "책임" in question else "hpn_factory"
+    if "품종" in question:
+        return "item"
+    if "월" in question:
+        return "monthly"
+    return "yearly"
+
+
+def _canned_classification(question: str) -> Dict:
+    concept = any(word in question for word in ("뭐야", "무엇", "의미", "정의", "이란", "란?"))
+    return {"queryType": "concept_lookup" if concept else "analytical", "reason": "replay"}
+
+
+def _canned_confirmation(question: str) -> Dict:
+    # 공장 기준이 발생/책임 중 무엇인지 없으면 반문 (도메인 프롬프트의 예시와 동일한 상황)
+    ambiguous = "공장" in question and "발생" not in question and "책임" not in question
+    return {
+        "needsConfirmation": ambiguous,
+        "confirmationQuestion": "공장별 분석 시 발생공장과 책임공장 중 어느 기준으로 분석해드릴까요?" if ambiguous else "",
+        "candidateIntents": ["발생공장: 품질 문제가 발생한 공장 기준", "책임공장: 원인을 제공한 공장 기준"] if ambiguous else [],
+        "reason": "replay"
+    }
+
+
+def _canned_sql(question: str) -> Dict:
+    _, sql = _CANNED_SQL[_sql_template(question)]
+    return {"confirmedIntent": question, "sqlQueries": [{"query": sql}]}
+
+
+def canned_response(stage: str, messages: List[Dict]) -> str:
+    """질문 내용에 따라 결정적으로 고른 단계별 내장 응답 (실제 DB 컬럼/테이블을 사용하는 SQL 포함)"""
+    question = _question(messages)
+    if stage == "classify":
+        return json.dumps(_canned_classification(question), ensure_ascii=False)
+    if stage == "confirm":
+        return json.dumps(_canned_confirmation(question), ensure_ascii=False)
+    if stage == "sql":
+        return json.dumps(_canned_sql(question), ensure_ascii=False)
+    if stage == "intake":
+        # 분류 + 반문 확인 + SQL 계획을 합친 응답
+        result = {**_canned_classification(question), "needsConfirmation": False, "confirmationQuestion": "",
+                  "candidateIntents": [], "confirmedIntent": "", "sqlQueries": []}
+        if result["queryType"] == "analytical":
+            confirmation = _canned_confirmation(question)
+            result.update(confirmation)
+            if not confirmation["needsConfirmation"]:
+                result.update(_canned_sql(question))
+        return json.dumps(result, ensure_ascii=False)
+    if stage == "visualization":
+        template = _sql_template(question)
+        x_axis, sql = _CANNED_SQL[template]
+        y_axis = "클레임률" if template == "claim" else "품질부적합률"
+        return json.dumps({
+            "chartType": "line" if template in ("monthly", "yearly", "claim") else "bar",
+            "xAxis": x_axis,
+            "yAxis": y_axis,
+            "seriesBy": "YEAR" if template == "item" else None
+        }, ensure_ascii=False)
+    if stage == "concept":
+        return _CANNED_CONCEPT
+    return _CANNED_SUMMARY
+
+
+class ReplayBackend(LLMBackend):
+    """네트워크 없이 결정적인 응답을 돌려주는 백엔드
+
+    - path의 녹화 파일({"stage", "question", "content"} JSON lines)에 같은 단계/질문이 있으면 그 응답을,
+      없으면 canned_response의 내장 응답을 반환
+    - latency_ms(± jitter 비율) 후 응답, 스트리밍은 첫 조각까지 latency_ms, 이후 조각마다 token_ms
+    - 토큰 수는 글자 수 기반 근사치
+    """
+
+    name = "replay"
+
+    def __init__(self, path: str = LLM_REPLAY_PATH, latency_ms: float = LLM_REPLAY_LATENCY_MS,
+                 token_ms: float = LLM_REPLAY_TOKEN_MS, jitter: float = LLM_REPLAY_JITTER, seed: int = LLM_REPLAY_SEED):
+        self.latency_ms = latency_ms
+        self.token_ms = token_ms
+        self.jitter = jitter
+        self._random = random.Random(seed)
+        self.recorded: Dict[tuple, str] = {}
+        if path and os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    if line.strip():
+                        entry = json.loads(line)
+                        self.recorded[(entry["stage"], entry["question"])] = entry["content"]
+        self.calls = 0
+
+    def _delay(self, base_ms: float) -> float:
+        if base_ms <= 0:
+            return 0.0
+        return max(0.0, base_ms * (1 + self._random.uniform(-self.jitter, self.jitter))) / 1000
+
+    def _response(self, messages: List[Dict], stage: str) -> LLMCompletion:
+        self.calls += 1
+        content = self.recorded.get((stage, _question(messages))) or canned_response(stage, messages)
+        prompt_chars = sum(len(m.get("content") or "") for m in messages)
+        return LLMCompletion(content, {"prompt_tokens": prompt_chars // 2, "completion_tokens": len(content) // 2})
+
+    async def complete(self, messages: List[Dict], model: str, temperature: float, stage: str) -> LLMCompletion:
+        await asyncio.sleep(self._delay(self.latency_ms))
+        return self._response(messages, stage)
+
+    async def stream(self, messages: List[Dict], model: str, temperature: float, stage: str) -> AsyncIterator[LLMChunk]:
+        completion = self._response(messages, stage)
+        await asyncio.sleep(self._delay(self.latency_ms))
+        text = completion.content
+        for start in range(0, len(text), 4):
+            if start:
+                await asyncio.sleep(self._delay(self.token_ms))
+            yield LLMChunk(text[start:start + 4])
+        yield LLMChunk(None, completion.usage)
+
+
+class RecordingBackend(LLMBackend):
+    """다른 백엔드의 응답을 ReplayBackend가 읽는 형식으로 파일에 덧붙여 기록"""
+
+    def __init__(self, inner: LLMBackend, path: str):
+        self.inner = inner
+        self.path = path
+        self.name = f"{inner.name}+record"
+        self._lock = threading.Lock()
+
+    def _record(self, stage: str, messages: List[Dict], content: Optional[str]) -> None:
+        if not content:
+            return
+        line = json.dumps({"stage": stage, "question": _question(messages), "content": content}, ensure_ascii=False)
+        with self._lock, open(self.path, "a", encoding="utf-8") as f:
+            f.write(line + "\n")
+
+    async def complete(self, messages: List[Dict], model: str, temperature: float, stage: str) -> LLMCompletion:
+        completion = await self.inner.complete(messages, model, temperature, stage)
+        self._record(stage, messages, completion.content)
+        return completion
+
+    async def stream(self, messages: List[Dict], model: str, temperature: float, stage: str) -> AsyncIterator[LLMChunk]:
+        parts = []
+        async for chunk in self.inner.stream(messages, model, temperature, stage):
+            if chunk.text:
+                parts.append(chunk.text)
+            yield chunk
+        self._record(stage, messages, "".join(parts))
+
+    async def close(self) -> None:
+        await self.inner.close()
+
+
+def create_llm_backend(timeout: Optional[float] = None) -> LLMBackend:
+    """LLM_BACKEND 설정에 맞는 백엔드 (LLM_RECORD_PATH가 있으면 응답 기록)"""
+    if LLM_BACKEND == "replay":
+        backend: LLMBackend = ReplayBackend()
+    elif LLM_BACKEND == "openai":
+        backend = OpenAIBackend(timeout=timeout)
+    else:
+        raise ValueError(f"Unknown LLM_BACKEND: {LLM_BACKEND}")
+    if LLM_RECORD_PATH:
+        backend = RecordingBackend(backend, LLM_RECORD_PATH)
+    return backend
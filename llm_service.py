@@ -1,8 +1,35 @@
+import asyncio
+import copy
 import json
 import os
 import re
-from typing import Dict, List, Any, Optional, Union
-from openai import OpenAI
+import time
+import unicodedata
+from contextlib import aclosing
+from typing import AsyncIterator, Callable, Dict, List, Any, Optional, Tuple, Union
+import pandas as pd
+import metrics
+from chart_data import prepare_chart_data
+from chart_recommender import VISUALIZATION_LLM_FALLBACK, default_visualization, recommend_visualization
+from llm_backend import LLMBackend, create_llm_backend
+from prompt_context import PromptContext, PromptContextBuilder
+from result_format import (RESULT_HANDLE_MAXSIZE, RESULT_HANDLE_TTL_SECONDS, RESULT_PAGE_ROWS, decode_rows,
+                           encode_result, page_rows, result_id)
+from result_profile import RESULT_PROFILE_INLINE_ROWS, is_empty_or_zero, profile_dataframe, prompt_profile
+from domain_knowledge import METRIC_TERMS
+from query_classifier import QueryClassifier, compact_text
+from sql_templates import SQL_TEMPLATES_ENABLED, ambiguous_axes, template_sql
+from shared_state import create_cache
+from structured_logging import get_logger, lazy
+
+log = get_logger("llm")
+
+# LLM 호출 설정 (환경변수로 조정 가능)
+LLM_TIMEOUT_SECONDS = float(os.getenv("LLM_TIMEOUT_SECONDS", "60"))  # 호출 1회당 응답 대기 한도
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))    # 프로세스 전체 동시 호출 상한
+LLM_CACHE_MAXSIZE = int(os.getenv("LLM_CACHE_MAXSIZE", "512"))       # 분류/확인/SQL 생성 응답 캐시 크기 (0이면 비활성화)
+LLM_CACHE_TTL_SECONDS = float(os.getenv("LLM_CACHE_TTL_SECONDS", "3600"))
+LLM_INTAKE_ENABLED = os.getenv("LLM_INTAKE_ENABLED", "0") == "1"         # 1이면 분류/반문 확인/SQL 계획을 한 번의 호출로
 
 # Domain knowledge as a string constant
 DOMAIN_KNOWLEDGE = """
@@ -107,18 +134,48 @@ DB_SCHEMA = """
    - EX_A_MAST_GD_CAU_NM (외관불량원인명)
    - END_USER_NAME (최종고객사명)
    - SPECIFICATION_CD_N (제품규격약호)
+   - DAY_YEAR, DAY_MONTH, DAY_YYYYMM (DAY_CD에서 파생된 정수형 년/월/년월, 예: 2025, 1, 202501)
 
 2. TB_S95_SALS_CLAM030 (클레임제기보상)
    - END_USER_NAME (최종고객사명)
    - RMA_QTY (클레임보상액)
    - ITEM_TYPE_GROUP_NAME (품종그룹명)
    - EXPECTED_RESOLUTION_DATE (클레임보상품의일자, YYYYMMDD)
+   - RESOLUTION_YEAR, RESOLUTION_MONTH, RESOLUTION_YYYYMM (EXPECTED_RESOLUTION_DATE에서 파생된 정수형 년/월/년월)
 
 3. TB_S95_A_GALA_SALESPROD (매출실적분석제품)
    - END_USER_NAME (최종고객사명)
    - ITEM_TYPE_GROUP_NAME (품종그룹명)
    - SALE_QTY (매출액)
    - SALES_DATE (제품판매일자, YYYYMMDD)
+   - SALES_YEAR, SALES_MONTH, SALES_YYYYMM (SALES_DATE에서 파생된 정수형 년/월/년월)
+
+※ 년/월 단위 필터와 그룹화에는 인덱스가 있는 정수형 년/월/년월 컬럼을 사용하세요.
+"""
+
+# 반문 확인 기준 (반문 확인 단계와 intake 단계에서 공통 사용)
+CONFIRMATION_CRITERIA = """확인이 필요한 경우는 다음과 같습니다:
+- 사용자 질문에 비교 기준에 해당하는 DB 항목이 복수개인 경우에만 확인을 해줘.
+- 사용자 질문이 명확하게 하나의 기준(예: 년도 비교, 품종별 비교 등)만 요청하는 경우에는 확인 질문을 하지 않도록 해줘.
+- 예를 들어 "24년도와 25년도 품질부적합률 비교"는 기준이 명확하므로 추가 확인 질문이 필요하지 않아.
+
+확인 질문이 필요한 경우, 반드시 아래 구조를 따라 작성해주세요:
+
+1. [지표명] 지표정의 : [계산식]
+2. 층별화 기준 : [사용자가 언급한 분석 기준이나 조건]
+3. 확인 필요기준 : 아래 [개수]개 항목이 확인이 필요합니다.
+ - [항목1명] = [항목1 상세 설명]
+ - [항목2명] = [항목2 상세 설명]
+"""
+
+# SQL 생성 규칙 (SQL 생성 단계와 intake 단계에서 공통 사용)
+SQL_RULES = """SQL 생성 규칙:
+- SQLite 문법 사용
+- 날짜는 'YYYYMMDD' 문자열 형식
+- 품질부적합률 = (QLY_INC_HPW / TR_F_PRODQUANTITY) * 100
+- 년도 비교 시: DAY_YEAR 컬럼 사용 (정수, 예: DAY_YEAR IN (2024, 2025)), 월별은 DAY_YYYYMM 사용
+- 나눗셈(%) 연산 시 반드시 분자 또는 분모에 1.0을 곱해 소수점까지 계산하세요. 예시 : (SUM(QLY_INC_HPW) * 1.0 / SUM(TR_F_PRODQUANTITY)) * 100
+- 24년 = 2024, 25년 = 2025 (DAY_YEAR 기준, 문자열 비교 시 '2024', '2025')
 """
 
 def remove_trailing_commas(json_string: str) -> str:
@@ -130,56 +187,216 @@ def get_recent_context(chat_history, n=4):
         return ""
     return "\n".join([f"{msg['role']}: {msg['content']}" for msg in chat_history[-n:]])
 
+def normalize_text(text: str) -> str:
+    """캐시 키 용 정규화: 유니코드 정규화(NFKC), 소문자화, 공백 통일, 끝 문장부호 제거"""
+    if not text:
+        return ""
+    text = unicodedata.normalize("NFKC", text).lower()
+    text = re.sub(r"\s+", " ", text).strip()
+    return text.rstrip("?.!。 ")
+
+async def merge_async_iterators(*iterators: AsyncIterator[Any]) -> AsyncIterator[Any]:
+    """여러 비동기 이터레이터를 동시에 소비하여 도착한 순서대로 항목을 내보냄
+
+    - 한 이터레이터에서 예외가 나면 나머지를 취소하고 그 예외를 그대로 발생
+    - 소비자가 중간에 멈추거나 취소되면 남은 작업도 모두 취소
+    """
+    queue: asyncio.Queue = asyncio.Queue()
+    finished = object()
+
+    async def drain(iterator):
+        try:
+            async for item in iterator:
+                await queue.put((item, None))
+            await queue.put((finished, None))
+        except Exception as e:
+            await queue.put((None, e))
+
+    tasks = [asyncio.create_task(drain(iterator)) for iterator in iterators]
+    try:
+        remaining = len(tasks)
+        while remaining:
+            item, error = await queue.get()
+            if error is not None:
+                raise error
+            if item is finished:
+                remaining -= 1
+                continue
+            yield item
+    finally:
+        for task in tasks:
+            task.cancel()
+
+def pending_confirmation_query(chat_history: List[Dict]) -> str:
+    """직전 응답이 반문이었다면 그 반문을 낳은 사용자 질문 (현재 메시지는 반문에 대한 답변)"""
+    if not chat_history:
+        return ""
+    previous = chat_history[:-1] if chat_history[-1].get("role") == "user" else chat_history
+    for index in range(len(previous) - 1, -1, -1):
+        if previous[index].get("role") == "assistant":
+            if (previous[index].get("metadata") or {}).get("aborted"):
+                continue  # 연결이 끊겨 중단된 응답은 건너뛰고 그 전 응답 기준
+            if not (previous[index].get("metadata") or {}).get("needsConfirmation"):
+                return ""
+            return next((msg["content"] for msg in reversed(previous[:index]) if msg.get("role") == "user"), "")
+    return ""
+
+def selected_intent(query: str, candidates: Optional[List[str]]) -> Optional[str]:
+    """직전 반문의 후보 의도 중 사용자가 답한 것 (후보 이름 또는 '1번' 같은 번호로 답한 경우, 아니면 None)
+
+    - 지표가 들어 있는 질문은 답변이 아니라 새 질문으로 봄 (예: '2025년 발생공장별 부적합률')
+    """
+    if not candidates:
+        return None
+    text = compact_text(query)
+    number = re.fullmatch(r"(\d+)번?", text)
+    if number:
+        index = int(number.group(1)) - 1
+        return candidates[index] if 0 <= index < len(candidates) else None
+    if any(compact_text(term) in text for term in METRIC_TERMS):
+        return None
+    matched = [intent for intent in candidates if compact_text(intent.split(":", 1)[0]) in text]
+    return matched[0] if len(matched) == 1 else None
+
+def split_summary(text: str) -> Tuple[str, str]:
+    """LLM 요약 응답을 summary(첫 줄)와 insight(나머지)로 분리"""
+    if "\n" in text:
+        summary, insight = text.split("\n", 1)
+        return summary.strip(), insight.strip()
+    return text.strip(), ""
+
 class LLMService:
-    def __init__(self, db_service=None):
+    def __init__(self, db_service=None, backend: Optional[LLMBackend] = None):
         self.model = "gpt-4o"
         self.db_service = db_service
-        self.domain_knowledge = DOMAIN_KNOWLEDGE
-        self.db_schema = DB_SCHEMA
+        # 질문에 필요한 도메인 지식/스키마 섹션만 프롬프트에 포함 (PROMPT_SLICING_ENABLED=0이면 전체)
+        self.prompt_context = PromptContextBuilder(DOMAIN_KNOWLEDGE, DB_SCHEMA)
+
+        # 비동기 백엔드: 호출 대기 중에도 이벤트 루프가 다른 요청을 처리할 수 있음
+        # (LLM_BACKEND=openai|replay, 재시도/시간 제한은 _call_openai에서 직접 처리)
+        self.timeout = LLM_TIMEOUT_SECONDS
+        self.backend = backend or create_llm_backend(timeout=self.timeout)
+        self._semaphore = asyncio.Semaphore(LLM_MAX_CONCURRENCY)
+
+        # 같은 질문(정규화된 질문 + 최근 대화 맥락)에 대한 분류/확인/SQL 생성 결과 캐시 (멀티 워커 시 공유)
+        self.response_cache = create_cache("llm_response", maxsize=LLM_CACHE_MAXSIZE, ttl=LLM_CACHE_TTL_SECONDS)
+        # 페이지 조회용 결과 핸들 (result_id → SQL, 워커 간 공유)
+        self.result_handles = create_cache("result_handles", maxsize=RESULT_HANDLE_MAXSIZE, ttl=RESULT_HANDLE_TTL_SECONDS)
+
+        # 도메인 어휘로 확실히 분류되는 질문은 LLM 호출 없이 분류 (QUERY_CLASSIFIER_FAST_PATH=0이면 비활성화)
+        self.classifier = QueryClassifier()
+
+    async def close(self) -> None:
+        """백엔드 연결 정리 (애플리케이션 종료 시 호출)"""
+        await self.backend.close()
+
+    def cache_stats(self) -> Dict[str, Any]:
+        """LLM 응답 캐시 적중 통계"""
+        return self.response_cache.stats()
+
+    def _prompt_context(self, stage: str, query: str, recent_context: str, *extra: str) -> PromptContext:
+        """단계별 프롬프트의 도메인 지식/스키마 부분 (절감 전후 토큰 수는 metrics와 debug 로그에 기록)"""
+        context = self.prompt_context.build(stage, [query, recent_context, *extra])
+        metrics.PROMPT_CONTEXT_TOKENS.inc(context.full_tokens, kind="full")
+        metrics.PROMPT_CONTEXT_TOKENS.inc(context.tokens, kind="sliced")
+        log.debug("llm.prompt_context", stage=stage, sections=context.section_names,
+                  tokens=context.tokens, full_tokens=context.full_tokens)
+        return context
+
+    def classifier_stats(self) -> Dict[str, Any]:
+        """규칙 기반 분류 적중 통계"""
+        return self.classifier.stats()
+
+    async def _call_openai_cached(self, stage: str, query: str, recent_context: str, messages: List[Dict],
+                                  is_cacheable: Callable[[Any], bool], extra_key: str = "", **kwargs) -> Union[Dict[str, Any], str]:
+        """캐시를 거쳐 _call_openai 호출
+
+        - 키: (단계명, 정규화된 질문, 정규화된 최근 대화 맥락, 추가 키)
+        - is_cacheable을 통과한 정상 응답만 저장 (오류 응답은 저장하지 않음)
+        - 호출자가 결과를 수정해도 캐시가 오염되지 않도록 복사본을 주고받음
+        """
+        key = (stage, normalize_text(query), normalize_text(recent_context), extra_key)
+        cached = self.response_cache.get(key)
+        if cached is not None:
+            log.debug("llm.cache_hit", stage=stage)
+            return copy.deepcopy(cached)
+
+        result = await self._call_openai(messages, stage=stage, **kwargs)
+        if is_cacheable(result):
+            self.response_cache.set(key, copy.deepcopy(result))
+        return result
 
-        api_key = os.getenv("OPENAI_API_KEY")
-        if not api_key:
-            raise ValueError("OPENAI_API_KEY environment variable is required")
-        
-        print(f"[DEBUG] OpenAI API 키 설정됨: {api_key[:10]}...{api_key[-10:]}")
-        self.client = OpenAI(api_key=api_key)
+    async def _call_openai(self, messages: List[Dict], temperature: float = 0.1, return_json: bool = True, retry_count: int = 2,
+                           timeout: Optional[float] = None, stage: str = "completion") -> Union[Dict[str, Any], str]:
+        """LLM 백엔드 호출 및 응답 처리를 위한 헬퍼 메서드
 
-    async def _call_openai(self, messages: List[Dict], temperature: float = 0.1, return_json: bool = True, retry_count: int = 2) -> Union[Dict[str, Any], str]:
-        """OpenAI API 호출 및 응답 처리를 위한 헬퍼 메서드"""
+        - stage: 호출 단계 이름 (백엔드에 전달되어 replay 응답 선택/녹화에 사용)
+        - timeout: 호출 1회당 응답 대기 한도(초). 지정하지 않으면 LLM_TIMEOUT_SECONDS 사용
+        - 동시 호출 수는 LLM_MAX_CONCURRENCY로 제한되며, 상위 태스크가 취소되면 호출도 함께 취소됨
+        - 시도/재시도 횟수, 토큰 수, 소요 시간은 metrics에 기록
+        """
+        started = time.perf_counter()
+        outcome = "cancelled"
+        try:
+            result, outcome = await self._call_openai_attempts(messages, temperature, return_json, retry_count, timeout, stage)
+            return result
+        finally:
+            elapsed = time.perf_counter() - started
+            metrics.LLM_CALLS.inc(mode="completion", outcome=outcome)
+            metrics.LLM_SECONDS.observe(elapsed, mode="completion")
+            metrics.add_timing("llm_calls", 1)
+
+    def _record_usage(self, usage: Optional[Dict[str, int]]) -> None:
+        """백엔드가 보고한 토큰 수를 metrics와 현재 요청 기록부에 반영"""
+        if usage is None:
+            return
+        for kind in ("prompt_tokens", "completion_tokens"):
+            tokens = usage.get(kind) or 0
+            metrics.LLM_TOKENS.inc(tokens, kind=kind.split("_")[0])
+            metrics.add_timing(f"llm_{kind}", tokens)
+
+    async def _call_openai_attempts(self, messages: List[Dict], temperature: float, return_json: bool,
+                                    retry_count: int, timeout: Optional[float], stage: str) -> Tuple[Union[Dict[str, Any], str], str]:
+        """_call_openai의 재시도 루프 - (결과, 최종 결과 구분) 반환"""
+        deadline = timeout if timeout is not None else self.timeout
         for attempt in range(retry_count):
+            metrics.LLM_ATTEMPTS.inc(mode="completion")
+            if attempt > 0:
+                metrics.add_timing("llm_retries", 1)
             try:
-                print(f"[DEBUG] OpenAI API 호출 시도 {attempt + 1}/{retry_count}")
-                print(f"[DEBUG] 모델: {self.model}")
-                print(f"[DEBUG] Temperature: {temperature}")
-                print(f"[DEBUG] Messages: {len(messages)}개")
+                log.debug("llm.attempt", attempt=attempt + 1, retry_count=retry_count, model=self.model,
+                          temperature=temperature, messages=len(messages))
+
+                async with self._semaphore:
+                    response = await asyncio.wait_for(
+                        self.backend.complete(messages, model=self.model, temperature=temperature, stage=stage),
+                        timeout=deadline
+                    )
                 
-                response = self.client.chat.completions.create(
-                    model=self.model,
-                    messages=messages,
-                    temperature=temperature
-                )
-                
-                content = response.choices[0].message.content
-                print(f"[DEBUG] API 응답 길이: {len(content) if content else 0}")
-                print(f"[DEBUG] LLM 응답 원문: {content}")
+                self._record_usage(response.usage)
+                content = response.content
+                # 응답 원문은 길고 빈번하므로 DEBUG + 샘플링
+                log.debug("llm.response", sample=True, chars=len(content) if content else 0, content=content)
                 
                 if not content or not content.strip():
-                    print(f"[DEBUG] 빈 응답 수신, 재시도: {attempt < retry_count - 1}")
+                    log.warning("llm.empty_response", attempt=attempt + 1, will_retry=attempt < retry_count - 1)
                     if attempt < retry_count - 1:
+                        metrics.LLM_RETRIES.inc(reason="empty")
                         temperature = min(0.7, temperature + 0.3)
                         continue
-                    return {"type": "error", "message": "LLM 응답 생성 실패", "retry_attempted": True} if return_json else "응답을 생성할 수 없습니다."
+                    return ({"type": "error", "message": "LLM 응답 생성 실패", "retry_attempted": True} if return_json else "응답을 생성할 수 없습니다."), "empty"
                 
                 if return_json:
                     try:
-                        print(f"[DEBUG] JSON 파싱 시도 - 응답 시작: {content[:200]}...")
                         content_stripped = remove_trailing_commas(content.strip())  # 쉼표 자동 제거 적용
                         if not content_stripped.startswith("{"):
-                            print(f"[DEBUG] JSON 형식이 아님 - 전체 응답: {content}")
+                            log.warning("llm.not_json", attempt=attempt + 1, will_retry=attempt < retry_count - 1,
+                                        content=content)
                             if attempt < retry_count - 1:
+                                metrics.LLM_RETRIES.inc(reason="invalid_json")
                                 messages.append({"role": "user", "content": "반드시 설명 없이 JSON 형식만 반환하세요. 마크다운 코드블록(예: ```json)도 사용하지 마세요.\nJSON 안에서는 마지막 요소 뒤에 쉼표(,)를 절대 넣지 마세요. 예: {\"a\": 1,} ← 이런 형식은 금지입니다."})
                                 continue
-                            return {"type": "error", "message": "JSON 형식 응답 생성 실패", "raw_response": content}
+                            return {"type": "error", "message": "JSON 형식 응답 생성 실패", "raw_response": content}, "invalid_json"
                         result = json.loads(content_stripped)
                         if "needsConfirmation" in result:
                             if isinstance(result["needsConfirmation"], str):
@@ -189,102 +406,233 @@ class LLMService:
                                     result["needsConfirmation"] = False
                             elif not isinstance(result["needsConfirmation"], bool):
                                 result["needsConfirmation"] = False
-                        print(f"[DEBUG] JSON 파싱 성공 - 키들: {list(result.keys()) if isinstance(result, dict) else 'Not a dict'}")
-                        return result
+                        log.debug("llm.json_parsed", keys=lazy(lambda: list(result.keys()) if isinstance(result, dict) else None))
+                        return result, "success"
                     except json.JSONDecodeError as e:
-                        print(f"[DEBUG] JSON 파싱 오류: {str(e)}")
-                        print(f"[DEBUG] 파싱 실패한 전체 응답: {content}")
+                        log.warning("llm.json_error", attempt=attempt + 1, will_retry=attempt < retry_count - 1,
+                                    error=str(e), content=content)
                         if attempt < retry_count - 1:
+                            metrics.LLM_RETRIES.inc(reason="invalid_json")
                             messages.append({"role": "user", "content": "JSON 구문 오류가 있습니다. 설명 없이 JSON 형식만 반환하세요. 마크다운 코드블록(예: ```json)도 사용하지 마세요.\nJSON 안에서는 마지막 요소 뒤에 쉼표(,)를 절대 넣지 마세요. 예: {\"a\": 1,} ← 이런 형식은 금지입니다."})
                             continue
-                        return {"type": "error", "message": f"JSON 파싱 오류: {str(e)}", "raw_response": content}
+                        return {"type": "error", "message": f"JSON 파싱 오류: {str(e)}", "raw_response": content}, "invalid_json"
                 else:
-                    return content.strip()
+                    return content.strip(), "success"
+            except asyncio.TimeoutError:
+                log.warning("llm.timeout", attempt=attempt + 1, will_retry=attempt < retry_count - 1, timeout=deadline)
+                if attempt < retry_count - 1:
+                    metrics.LLM_RETRIES.inc(reason="timeout")
+                    continue
+                return ({"type": "error", "message": f"LLM 응답 시간 초과 ({deadline}초)", "retry_attempted": True} if return_json else f"LLM 응답 시간이 초과되었습니다 ({deadline}초)."), "timeout"
             except Exception as e:
-                print(f"[DEBUG] API 호출 예외: {str(e)}")
+                log.warning("llm.call_error", attempt=attempt + 1, will_retry=attempt < retry_count - 1,
+                            error=str(e), error_type=type(e).__name__)
                 if attempt < retry_count - 1:
+                    metrics.LLM_RETRIES.inc(reason="error")
                     continue
-                return {"type": "error", "message": f"API 호출 오류: {str(e)}", "retry_attempted": True} if return_json else f"시스템 오류가 발생했습니다: {str(e)}"
+                return ({"type": "error", "message": f"API 호출 오류: {str(e)}", "retry_attempted": True} if return_json else f"시스템 오류가 발생했습니다: {str(e)}"), "error"
+
+    async def _stream_openai(self, messages: List[Dict], temperature: float = 0.1,
+                             timeout: Optional[float] = None, stage: str = "completion") -> AsyncIterator[str]:
+        """LLM 백엔드 스트리밍 호출 - 응답 텍스트 조각을 도착하는 대로 반환
+
+        - timeout: 첫 조각 및 조각 사이 대기 한도(초). 지정하지 않으면 LLM_TIMEOUT_SECONDS 사용
+        - 첫 조각을 받기 전에 실패하면 일반 호출(_call_openai)로 전체 응답을 한 번에 반환
+        - 조각을 받던 중 실패하면 받은 부분까지만 반환
+        """
+        deadline = timeout if timeout is not None else self.timeout
+        received = False
+        chunks = self.backend.stream(messages, model=self.model, temperature=temperature, stage=stage)
+        started = time.perf_counter()
+        outcome = "cancelled"
+        metrics.LLM_ATTEMPTS.inc(mode="stream")
+        metrics.add_timing("llm_calls", 1)
+        try:
+            async with self._semaphore:
+                while True:
+                    try:
+                        chunk = await asyncio.wait_for(chunks.__anext__(), timeout=deadline)
+                    except StopAsyncIteration:
+                        break
+                    self._record_usage(chunk.usage)
+                    if chunk.text:
+                        received = True
+                        yield chunk.text
+            outcome = "success"
+        except Exception as e:
+            log.warning("llm.stream_error", received=received, error=str(e), error_type=type(e).__name__)
+            outcome = "partial" if received else "fallback"
+            if not received:
+                yield await self._call_openai(messages, temperature=temperature, return_json=False, timeout=timeout, stage=stage)
+        finally:
+            metrics.LLM_CALLS.inc(mode="stream", outcome=outcome)
+            metrics.LLM_SECONDS.observe(time.perf_counter() - started, mode="stream")
+            await chunks.aclose()
+
+    async def process_query(self, query: str, chat_history: List[Dict],
+                            pending_intent: Optional[List[str]] = None) -> Dict[str, Any]:
+        """사용자 쿼리 처리 메인 함수 - process_query_stream의 최종 결과(done)만 반환"""
+        result = None
+        async for event, data in self.process_query_stream(query, chat_history, pending_intent):
+            if event == "done":
+                result = data
+        return result
 
-    async def process_query(self, query: str, chat_history: List[Dict]) -> Dict[str, Any]:
-        """사용자 쿼리 처리 메인 함수 (개념설명/분석 분기 및 needsConfirmation 반복 반문, 에러 응답 보완)"""
-        # 0단계: 쿼리 타입 분류
-        classification = await self._classify_query(query, chat_history)
+    async def process_query_stream(self, query: str, chat_history: List[Dict],
+                                   pending_intent: Optional[List[str]] = None) -> AsyncIterator[Tuple[str, Any]]:
+        """사용자 쿼리 처리 - 각 단계가 끝날 때마다 (이벤트명, 데이터)를 내보냄
+
+        - pending_intent: 세션에 저장된 직전 반문의 후보 의도 (현재 질문이 그중 하나를 고른 답변이면 반문 확인을 생략)
+
+        - classification: 질문 유형 분류 결과
+        - confirmation: 반문이 필요한 경우 반문 정보 (이후 done)
+        - sql: 생성된 SQL 목록
+        - rows: SQL 1건의 실행 결과 {"index", "result"} (완료 순서대로)
+        - chart_data: 차트 데이터가 커서 줄인 경우 차트용 데이터 {"index", "chart_data"} (visualization 직전)
+        - visualization: 시각화 설정
+        - summary_token: 요약/인사이트 텍스트 조각 {"text"}
+        - done: 최종 응답 {"type", "message", "metadata"} (항상 마지막, metadata["timings"]에 단계별 소요 시간 포함)
+        """
+        timings = metrics.begin_request()
+        started = time.perf_counter()
+        async for event, data in self._query_stages(query, chat_history, pending_intent):
+            if event == "done":
+                elapsed = time.perf_counter() - started
+                metrics.REQUEST_SECONDS.observe(elapsed, type=data.get("type", "unknown"))
+                metrics.add_timing("total_ms", elapsed * 1000)
+                data.setdefault("metadata", {})["timings"] = metrics.timings_snapshot(timings)
+            yield event, data
+
+    async def _query_stages(self, query: str, chat_history: List[Dict],
+                            pending_intent: Optional[List[str]] = None) -> AsyncIterator[Tuple[str, Any]]:
+        """process_query_stream의 단계별 처리 (각 단계 소요 시간은 metrics.stage로 기록)"""
+        # 0·1단계: 쿼리 타입 분류 및 반문 확인
+        # (LLM_INTAKE_ENABLED이면 분류/반문 확인/SQL 계획을 한 번의 intake 호출로 처리,
+        #  직전 반문의 후보 중 하나를 고른 답변이면 분류/반문 확인 없이 선택한 기준으로 SQL 생성)
+        confirmation = None
+        sql_generation = None
+        selected = selected_intent(query, pending_intent)
+        if selected is not None:
+            if re.fullmatch(r"\d+번?", compact_text(query)):
+                query = selected.split(":", 1)[0].strip()  # 번호로 답하면 기준 이름으로 해석
+            classification = {"queryType": "analytical", "reason": "반문에 대한 답변", "source": "confirmation"}
+            confirmation = {"needsConfirmation": False, "candidateIntents": pending_intent, "selectedIntent": selected}
+        elif LLM_INTAKE_ENABLED:
+            with metrics.stage("intake"):
+                classification, confirmation, sql_generation = await self._intake(query, chat_history)
+        else:
+            with metrics.stage("classification"):
+                classification = await self._classify_query(query, chat_history)
+        yield "classification", classification
         if classification.get("queryType") == "concept_lookup":
-            answer = await self._generate_concept_answer(query, chat_history)
-            return {
+            with metrics.stage("concept_answer"):
+                answer = await self._generate_concept_answer(query, chat_history)
+            yield "done", {
                 "type": "concept",
                 "message": answer,
                 "metadata": {}
             }
+            return
 
-        # 분석(analytical) 질문일 경우, needsConfirmation 반복 체크
-        confirmation = None
-        if classification.get("queryType") == "analytical":
-            while True:
+        if classification.get("queryType") == "analytical" and confirmation is None and not LLM_INTAKE_ENABLED:
+            with metrics.stage("confirmation"):
                 confirmation = await self._check_confirmation_needed(query, chat_history)
-                if confirmation.get("needsConfirmation", False):
-                    # 반문 반환(프론트엔드에서 사용자의 추가 답변을 받아 chat_history에 누적 후 재호출 필요)
-                    return {
-                        "type": "confirmation",
-                        "message": confirmation["confirmationQuestion"],
-                        "metadata": confirmation
-                    }
-                else:
-                    break
+        if confirmation and confirmation.get("needsConfirmation", False):
+            # 반문 반환(프론트엔드에서 사용자의 추가 답변을 받아 chat_history에 누적 후 재호출 필요)
+            yield "confirmation", confirmation
+            yield "done", {
+                "type": "confirmation",
+                "message": confirmation["confirmationQuestion"],
+                "metadata": confirmation
+            }
+            return
 
-        # 2단계: SQL 생성 및 실행
-        sql_generation = await self._generate_sql(query, chat_history, confirmation if confirmation else {})
+        # 2단계: SQL 생성 및 실행 (intake에서 SQL 계획까지 받았으면 생략)
+        if sql_generation is None:
+            with metrics.stage("sql_generation"):
+                sql_generation = await self._generate_sql(query, chat_history, confirmation if confirmation else {})
         if "type" in sql_generation and sql_generation["type"] == "error":
             # LLM SQL 생성 자체가 실패한 경우에도 빈 sql_results라도 포함
-            return {
+            yield "done", {
                 "type": sql_generation.get("type", "error"),
                 "message": sql_generation.get("message", "오류가 발생했습니다."),
                 "metadata": {"sql_results": []},
                 "raw_response": sql_generation.get("raw_response", None)
             }
+            return
         if "sqlQueries" not in sql_generation or not sql_generation["sqlQueries"]:
-            return {"type": "error", "message": "SQL 쿼리 생성 실패", "metadata": {"sql_results": []}}
+            yield "done", {"type": "error", "message": "SQL 쿼리 생성 실패", "metadata": {"sql_results": []}}
+            return
+        yield "sql", {
+            "confirmedIntent": sql_generation.get("confirmedIntent", ""),
+            "queries": [sql_query["query"] for sql_query in sql_generation["sqlQueries"]]
+        }
 
-        # 3단계: SQL 실행 및 결과 추출
-        results = []
-        for sql_query in sql_generation["sqlQueries"]:
-            try:
-                df = self.db_service.execute_query(sql_query["query"])
-                df = df.astype(str)
-                if df.empty or (df.fillna(0).sum().sum() == 0):
-                    results.append({
-                        "query": sql_query["query"],
-                        "data": [],
-                        "columns": [],
-                        "error": "데이터 없음 또는 모두 0"
-                    })
-                    continue
-                results.append({
-                    "query": sql_query["query"],
-                    "data": df.to_dict('records'),
-                    "columns": df.columns.tolist()
-                })
-            except Exception as e:
-                results.append({
-                    "query": sql_query["query"],
-                    "data": [],
-                    "columns": [],
-                    "error": str(e)
-                })
-
-        # 4단계: 실행 결과를 LLM에 전달하여 시각화 정보만 추천받음
-        visualization = await self._generate_visualization_config(results, query, chat_history)
-        if "type" in visualization and visualization["type"] == "error":
-            return {
-                "message": "시각화 설정 생성 중 오류가 발생했습니다.",
-                "type": "error",
-                "metadata": {"sql_results": results, **visualization.get("metadata", {})}
-            }
+        # 3단계: SQL 실행 및 결과 추출 (쿼리끼리 서로 독립적이므로 병렬 실행, 끝나는 대로 전송하되 결과 순서는 유지)
+        async def execute(index: int, sql: str):
+            return index, await self._execute_sql_query(sql)
+
+        results: List[Optional[Dict[str, Any]]] = [None] * len(sql_generation["sqlQueries"])
+        frames: List[Optional[pd.DataFrame]] = [None] * len(results)
+        execution_started = time.perf_counter()
+        for finished in asyncio.as_completed(
+            [execute(i, sql_query["query"]) for i, sql_query in enumerate(sql_generation["sqlQueries"])]
+        ):
+            index, (result, frames[index]) = await finished
+            results[index] = result
+            yield "rows", {"index": index, "result": result}
+        execution_seconds = time.perf_counter() - execution_started
+        metrics.STAGE_SECONDS.observe(execution_seconds, stage="sql_execution")
+        metrics.add_timing("sql_execution_ms", execution_seconds * 1000)
+
+        # 4·5단계: 시각화 추천과 summary/insight 생성은 모두 SQL 실행 결과에만 의존하므로 동시에 실행
+        # (요약은 토큰 단위로 바로 전송하고, 시각화 설정은 완료되는 시점에 전송)
+        async def visualization_stage():
+            with metrics.stage("visualization"):
+                visualization = await self._generate_visualization_config(results, query, chat_history)
+            if frames[0] is not None and visualization.get("type") != "error":
+                # 차트가 그릴 수 있는 만큼만 전송 (원본 해상도는 sql_results와 result_id 페이지 조회로 유지)
+                with metrics.stage("chart_data"):
+                    chart_data = prepare_chart_data(frames[0], visualization)
+                if chart_data is not None:
+                    metrics.CHART_DATA_REDUCTIONS.inc(method=chart_data["reduction"]["method"])
+                    results[0]["chart_data"] = chart_data
+                    yield "chart_data", {"index": 0, "chart_data": chart_data}
+            yield "visualization", visualization
+
+        async def summary_stage():
+            summary_started = time.perf_counter()
+            first_token = True
+            async for text in self._stream_summary_and_insight(results, query, chat_history):
+                if first_token:
+                    metrics.add_timing("summary_first_token_ms", (time.perf_counter() - summary_started) * 1000)
+                    first_token = False
+                yield "summary_token", {"text": text}
+            summary_seconds = time.perf_counter() - summary_started
+            metrics.STAGE_SECONDS.observe(summary_seconds, stage="summary")
+            metrics.add_timing("summary_ms", summary_seconds * 1000)
+
+        visualization = None
+        summary_text = ""
+        async with aclosing(merge_async_iterators(visualization_stage(), summary_stage())) as stages:
+            async for event, data in stages:
+                if event == "visualization":
+                    visualization = data
+                    # 4단계 결과: 실행 결과를 LLM에 전달하여 시각화 정보만 추천받음 (오류 시 요약 생성도 중단)
+                    if "type" in visualization and visualization["type"] == "error":
+                        yield "done", {
+                            "message": "시각화 설정 생성 중 오류가 발생했습니다.",
+                            "type": "error",
+                            "metadata": {"sql_results": results, **visualization.get("metadata", {})}
+                        }
+                        return
+                else:
+                    summary_text += data["text"]
+                yield event, data
 
-        # 5단계: summary/insight 생성
-        summary, insight = await self._generate_summary_and_insight(results, query, chat_history)
-        return {
+        # 5단계 결과: summary/insight
+        summary, insight = split_summary(summary_text)
+        yield "done", {
             "message": f"{summary}\n\n{insight}",
             "type": "analysis",
             "metadata": {
@@ -294,38 +642,91 @@ class LLMService:
             }
         }
 
+    async def _execute_sql_query(self, sql: str) -> Tuple[Dict[str, Any], Optional[pd.DataFrame]]:
+        """SQL 1건 실행 후 (응답용 결과 구조, 차트 데이터 준비용 원본 DataFrame) 반환
+
+        오류/빈 결과는 결과의 error 필드로 반환하고 DataFrame은 None
+        """
+        try:
+            df = await self.db_service.execute_query_async(sql, max_rows=self.db_service.max_result_rows)
+            truncated = df.attrs.get("truncated", False)
+            warnings = df.attrs.get("warnings", [])
+            with metrics.stage("result_conversion"):
+                # 컬럼 단위 인코딩, 숫자형 유지 (첫 페이지만 응답에 포함하고 나머지는 result_id로 페이지 조회)
+                if is_empty_or_zero(df):
+                    return {
+                        "query": sql,
+                        "values": [],
+                        "columns": [],
+                        "error": "데이터 없음 또는 모두 0"
+                    }, None
+                result = {"query": sql, **encode_result(df)}
+                if "next_offset" in result:
+                    result["result_id"] = result_id(sql)
+                    self.result_handles.set(result["result_id"], sql)
+            with metrics.stage("result_profile"):
+                # 요약 프롬프트에 원본 행 대신 넣을 전체 결과 기준 집계
+                result["profile"] = profile_dataframe(df)
+            if truncated:
+                result["truncated"] = True
+                result["profile"]["truncated"] = True
+                result["truncated_reason"] = df.attrs.get("truncated_reason")
+            if warnings:
+                result["warnings"] = warnings
+            return result, df
+        except Exception as e:
+            return {
+                "query": sql,
+                "values": [],
+                "columns": [],
+                "error": str(e)
+            }, None
+
+    async def result_page(self, handle: str, offset: int, limit: int = RESULT_PAGE_ROWS) -> Optional[Dict[str, Any]]:
+        """이전 응답의 result_id로 결과의 [offset, offset + limit) 구간 조회 (핸들이 만료되었으면 None)
+
+        SQL은 서버에 보관된 것만 다시 실행하며 DB 결과 캐시를 그대로 사용
+        """
+        sql = self.result_handles.get(handle)
+        if sql is None:
+            return None
+        df = await self.db_service.execute_query_async(sql, max_rows=self.db_service.max_result_rows)
+        with metrics.stage("result_conversion"):
+            return {"query": sql, "result_id": handle, **encode_result(df, offset=offset, limit=limit)}
+
     async def _generate_concept_answer(self, query: str, chat_history: List[Dict] = None) -> str:
         """개념 및 용어 정의를 GPT를 통해 생성"""
         recent_context = get_recent_context(chat_history)
+        context = self._prompt_context("concept", query, recent_context)
         messages = [
             {"role": "system", "content": f"""
-{self.domain_knowledge}
-{self.db_schema}
+{context.prefix}
+
+제철소 품질 관리 맥락에 특화된 설명이어야 합니다. 전문 용어를 사용하되, 1~2줄로 간단하고 이해하기 쉽게 설명해주세요.
+
+{context.sections}
 
 대화 맥락:
 {recent_context}
-
-제철소 품질 관리 맥락에 특화된 설명이어야 합니다. 전문 용어를 사용하되, 1~2줄로 간단하고 이해하기 쉽게 설명해주세요.
 """},
             {"role": "user", "content": f"다음 용어나 개념에 대해 설명해주세요: {query}"}
         ]
         
-        response = await self._call_openai(messages, temperature=0.3, return_json=False)
+        response = await self._call_openai(messages, temperature=0.3, return_json=False, stage="concept")
         
         return response
 
     async def _classify_query(self, query: str, chat_history: List[Dict] = None) -> Dict[str, Any]:
-        """0단계: 쿼리 타입 분류"""
-        print(f"[DEBUG] 쿼리 분류 시작: {query}")
-        
+        """0단계: 쿼리 타입 분류 (규칙으로 확실한 경우 바로 반환, 애매하면 LLM 호출)"""
+        result = self._classify_by_rules(query)
+        if result is not None:
+            return result
+
         recent_context = get_recent_context(chat_history)
+        context = self._prompt_context("classify", query, recent_context)
         messages = [
             {"role": "system", "content": f"""
-{self.domain_knowledge}
-{self.db_schema}
-
-대화 맥락:
-{recent_context}
+{context.prefix}
 
 아래 기준에 따라 사용자의 질문을 분류하세요:
 1. concept_lookup: 용어나 개념의 정의를 묻는 질문
@@ -333,40 +734,46 @@ class LLMService:
 
 JSON 형식으로 응답:
 {{"queryType": "concept_lookup" 또는 "analytical", "reason": "이유"}}
+
+{context.sections}
+
+대화 맥락:
+{recent_context}
 """},
             {"role": "user", "content": query}
         ]
-        result = await self._call_openai(messages, return_json=True)
-        print(f"[DEBUG] OpenAI 분류 결과: {result}")
+        result = await self._call_openai_cached(
+            "classify", query, recent_context, messages,
+            is_cacheable=lambda r: isinstance(r, dict) and r.get("queryType") in ("concept_lookup", "analytical"),
+            return_json=True
+        )
+        query_type = result.get("queryType", "error") if isinstance(result, dict) else "error"
+        metrics.CLASSIFICATIONS.inc(path="llm", query_type=query_type)
+        log.debug("llm.classified", query=query, result=result, path="llm")
+        if isinstance(result, dict) and "queryType" in result:
+            result["source"] = "llm"
         return result
 
+    def _classify_by_rules(self, query: str) -> Optional[Dict[str, Any]]:
+        """규칙 기반 분류 (확실하지 않으면 None)"""
+        result = self.classifier.classify(query)
+        if result is None:
+            return None
+        metrics.CLASSIFICATIONS.inc(path="rule", query_type=result["queryType"])
+        log.debug("llm.classified", query=query, result=result, path="rule")
+        return {**result, "source": "rule"}
+
     async def _check_confirmation_needed(self, query: str, chat_history: List[Dict] = None) -> Dict[str, Any]:
         """1단계: 불명확성 체크"""
         recent_context = get_recent_context(chat_history)
-        
+        context = self._prompt_context("confirm", query, recent_context)
         messages = [
             {"role": "system", "content": f"""
-{self.domain_knowledge}
-{self.db_schema}
-
-대화 맥락:
-{recent_context}
+{context.prefix}
 
 당신은 제철소 품질 분석 전문가입니다. 사용자의 질문에서 SQL 쿼리 작성 시 대상 항목이 애매한 경우를 파악하고, 명확한 의도 파악을 위한 확인 질문을 생성해주세요.
 
-확인이 필요한 경우는 다음과 같습니다:
-- 사용자 질문에 비교 기준에 해당하는 DB 항목이 복수개인 경우에만 확인을 해줘.
-- 사용자 질문이 명확하게 하나의 기준(예: 년도 비교, 품종별 비교 등)만 요청하는 경우에는 확인 질문을 하지 않도록 해줘.
-- 예를 들어 "24년도와 25년도 품질부적합률 비교"는 기준이 명확하므로 추가 확인 질문이 필요하지 않아.
-
-확인 질문이 필요한 경우, 반드시 아래 구조를 따라 작성해주세요:
-
-1. [지표명] 지표정의 : [계산식]
-2. 층별화 기준 : [사용자가 언급한 분석 기준이나 조건]
-3. 확인 필요기준 : 아래 [개수]개 항목이 확인이 필요합니다.
- - [항목1명] = [항목1 상세 설명]
- - [항목2명] = [항목2 상세 설명]
-
+{CONFIRMATION_CRITERIA}
 JSON 형식으로 응답해주세요:
 {{
     "needsConfirmation": false,
@@ -397,43 +804,145 @@ JSON 형식으로 응답해주세요:
     "reason": "공장별 분석 시 발생공장과 책임공장 중 어느 것을 기준으로 할지 명확하지 않습니다."
 }}
 
-사용자에게 친절하고 전문적으로 설명해주세요."""},
+사용자에게 친절하고 전문적으로 설명해주세요.
+
+{context.sections}
+
+대화 맥락:
+{recent_context}
+"""},
             {"role": "user", "content": f"대화 맥락:\n{recent_context}\n\n현재 질문: {query}"}
         ]
         
-        result = await self._call_openai(messages, return_json=True)
+        result = await self._call_openai_cached(
+            "confirm", query, recent_context, messages,
+            is_cacheable=lambda r: isinstance(r, dict) and r.get("type") != "error" and "needsConfirmation" in r,
+            return_json=True
+        )
         return result
 
-    async def _generate_sql(self, query: str, chat_history: List[Dict], confirmation: Dict[str, Any]) -> Dict[str, Any]:
-        """2단계: SQL 쿼리 생성"""
-        print(f"[DEBUG] SQL 생성 시작 - needsConfirmation: {confirmation.get('needsConfirmation', False)}")
+    async def _intake(self, query: str, chat_history: List[Dict]) -> Tuple[Dict[str, Any], Optional[Dict[str, Any]], Optional[Dict[str, Any]]]:
+        """0~2단계 통합: (분류, 반문 확인, SQL 생성 결과)를 한 번의 LLM 호출로 받음
+
+        - 규칙으로 분류되고 SQL 템플릿으로 표현되는 질문은 LLM을 호출하지 않음 (모호한 기준이 남아 있으면 적용하지 않음)
+        - 반문이 필요하거나 SQL 계획이 없으면 SQL 생성 결과는 None (필요하면 _generate_sql로 생성)
+        - intake 응답이 올바르지 않으면 기존 단계별 호출(분류 → 반문 확인)로 대체
+        """
+        classification = self._classify_by_rules(query)
+        if classification is not None:
+            if classification["queryType"] == "concept_lookup":
+                return classification, None, None
+            # 모호한 기준('공장', '제품' 등)이 남아 있으면 템플릿을 쓰지 않고 intake 호출에서 반문 여부를 판단
+            if not ambiguous_axes(query, pending_confirmation_query(chat_history)):
+                template = self._template_sql(query, chat_history)
+                if template is not None:
+                    return classification, {"needsConfirmation": False, "candidateIntents": []}, template
+
         recent_context = get_recent_context(chat_history)
-        confirmation_info = ""
-        if confirmation and not confirmation.get("needsConfirmation", False):
-            selected_intent = None
-            for msg in reversed(chat_history):
-                if msg["role"] == "user" and any(intent.split(":")[0].strip() in msg["content"] for intent in confirmation.get("candidateIntents", [])):
-                    selected_intent = msg["content"]
-                    break
-            if selected_intent:
-                confirmation_info = f"\n선택된 분석 기준: {selected_intent}"
+        context = self._prompt_context("intake", query, recent_context)
         messages = [
             {"role": "system", "content": f"""
-{self.domain_knowledge}
-{self.db_schema}
+{context.prefix}
+
+사용자의 질문을 접수하여 아래 세 가지를 한 번에 판단하세요.
+
+[A] 질문 유형 분류
+1. concept_lookup: 용어나 개념의 정의를 묻는 질문
+2. analytical: 데이터 분석이나 비교를 요구하는 질문
+
+[B] analytical인 경우 확인 질문 필요 여부 (대화 맥락에서 사용자가 이미 기준을 선택했다면 확인하지 마세요)
+{CONFIRMATION_CRITERIA}
+[C] analytical이고 확인이 필요 없는 경우 SQL 계획
+{SQL_RULES}
+**중요: 반드시 설명 없이 JSON 형식만 반환하세요. 마크다운 코드블록(예: ```json)도 사용하지 마세요.**
+concept_lookup이거나 확인이 필요한 경우 sqlQueries는 빈 배열로 두세요.
+
+{{
+    "queryType": "concept_lookup" 또는 "analytical",
+    "reason": "분류 이유",
+    "needsConfirmation": false,
+    "confirmationQuestion": "",
+    "candidateIntents": [],
+    "confirmedIntent": "확정된 분석 의도",
+    "sqlQueries": [{{"query": "SQL 쿼리"}}]
+}}
+
+{context.sections}
 
 대화 맥락:
 {recent_context}
-{confirmation_info}
+"""},
+            {"role": "user", "content": f"대화 맥락:\n{recent_context}\n\n현재 질문: {query}"}
+        ]
+        result = await self._call_openai_cached(
+            "intake", query, recent_context, messages,
+            is_cacheable=lambda r: isinstance(r, dict) and r.get("queryType") in ("concept_lookup", "analytical")
+                                   and (r.get("queryType") == "concept_lookup" or r.get("needsConfirmation")
+                                        or bool(r.get("sqlQueries"))),
+            return_json=True
+        )
+        if not isinstance(result, dict) or result.get("queryType") not in ("concept_lookup", "analytical"):
+            log.warning("llm.intake_failed", query=query, result=result)
+            if classification is None:
+                classification = await self._classify_query(query, chat_history)
+            if classification.get("queryType") != "analytical":
+                return classification, None, None
+            return classification, await self._check_confirmation_needed(query, chat_history), None
+
+        if classification is None:
+            metrics.CLASSIFICATIONS.inc(path="llm", query_type=result["queryType"])
+            classification = {"queryType": result["queryType"], "reason": result.get("reason", ""), "source": "intake"}
+        log.debug("llm.intake", query=query, result=result)
+        if classification["queryType"] == "concept_lookup":
+            return classification, None, None
+
+        confirmation = {
+            "needsConfirmation": bool(result.get("needsConfirmation")),
+            "confirmationQuestion": result.get("confirmationQuestion", ""),
+            "candidateIntents": result.get("candidateIntents", []),
+            "reason": result.get("reason", ""),
+        }
+        if confirmation["needsConfirmation"]:
+            return classification, confirmation, None
+        # 반문에 대한 답변 등으로 템플릿이 적용되면 검증된 템플릿 SQL을 우선 사용
+        sql_generation = self._template_sql(query, chat_history)
+        sql_queries = [item for item in result.get("sqlQueries") or [] if isinstance(item, dict) and item.get("query")]
+        if sql_generation is None and sql_queries:
+            metrics.SQL_GENERATIONS.inc(path="intake")
+            sql_generation = {"confirmedIntent": result.get("confirmedIntent", ""), "sqlQueries": sql_queries,
+                              "source": "intake"}
+        return classification, confirmation, sql_generation
+
+    def _template_sql(self, query: str, chat_history: List[Dict]) -> Optional[Dict[str, Any]]:
+        """SQL 템플릿으로 생성한 SQL (템플릿으로 표현할 수 없는 질문이면 None)"""
+        if not SQL_TEMPLATES_ENABLED:
+            return None
+        rollups = getattr(self.db_service, "rollups", None)
+        result = template_sql(query, pending_confirmation_query(chat_history),
+                              claim_rollup_ready=bool(rollups and rollups.ready))
+        if result is not None:
+            metrics.SQL_GENERATIONS.inc(path="template")
+            log.debug("llm.sql_generated", query=query, path="template", slots=result["slots"],
+                      sql=lazy(lambda: [item["query"] for item in result["sqlQueries"]]))
+        return result
 
-SQL 생성 규칙:
-- SQLite 문법 사용
-- 날짜는 'YYYYMMDD' 문자열 형식
-- 품질부적합률 = (QLY_INC_HPW / TR_F_PRODQUANTITY) * 100
-- 년도 비교 시: DAY_CD에서 SUBSTR(DAY_CD, 1, 4)로 년도 추출
-- 나눗셈(%) 연산 시 반드시 분자 또는 분모에 1.0을 곱해 소수점까지 계산하세요. 예시 : (SUM(QLY_INC_HPW) * 1.0 / SUM(TR_F_PRODQUANTITY)) * 100
-- 24년 = '2024', 25년 = '2025'
+    async def _generate_sql(self, query: str, chat_history: List[Dict], confirmation: Dict[str, Any]) -> Dict[str, Any]:
+        """2단계: SQL 쿼리 생성 (정형 지표 질문은 SQL 템플릿, 그 외는 LLM)"""
+        result = self._template_sql(query, chat_history)
+        if result is not None:
+            return result
+        metrics.SQL_GENERATIONS.inc(path="llm")
+
+        recent_context = get_recent_context(chat_history)
+        confirmation_info = ""
+        if confirmation.get("selectedIntent"):
+            confirmation_info = f"\n선택된 분석 기준: {confirmation['selectedIntent']}"
+        context = self._prompt_context("sql", query, recent_context)
+        messages = [
+            {"role": "system", "content": f"""
+{context.prefix}
 
+{SQL_RULES}
 **중요: 반드시 설명 없이 JSON 형식만 반환하세요. 마크다운 코드블록(예: ```json)도 사용하지 마세요. 다른 텍스트는 포함하지 마세요.**
 
 {{
@@ -452,41 +961,54 @@ SQL 생성 규칙:
     "confirmedIntent": "2024년과 2025년의 품질부적합률 비교 분석",
     "sqlQueries": [
         {{
-            "query": "SELECT SUBSTR(DAY_CD, 1, 4) as YEAR, SUM(QLY_INC_HPW) as 총품질부적합량, SUM(TR_F_PRODQUANTITY) as 총생산량, (SUM(QLY_INC_HPW) / SUM(TR_F_PRODQUANTITY)) * 100 as 품질부적합률 FROM TB_SUM_MQS_QMHT200 WHERE SUBSTR(DAY_CD, 1, 4) IN ('2024', '2025') GROUP BY SUBSTR(DAY_CD, 1, 4) ORDER BY YEAR",
+            "query": "SELECT DAY_YEAR as YEAR, SUM(QLY_INC_HPW) as 총품질부적합량, SUM(TR_F_PRODQUANTITY) as 총생산량, (SUM(QLY_INC_HPW) * 1.0 / SUM(TR_F_PRODQUANTITY)) * 100 as 품질부적합률 FROM TB_SUM_MQS_QMHT200 WHERE DAY_YEAR IN (2024, 2025) GROUP BY DAY_YEAR ORDER BY YEAR",
         }}
     ],
-}}"""},
+}}
+
+{context.sections}
+
+대화 맥락:
+{recent_context}
+{confirmation_info}
+"""},
             {"role": "user", "content": f"대화 맥락:\n{recent_context}\n\n분석 요청: {query}"}
         ]
-        result = await self._call_openai(messages, return_json=True)
-        print("[DEBUG] _generate_sql() LLM 응답 구조:")
-        print(json.dumps(result, indent=2, ensure_ascii=False))
-        if isinstance(result, dict) and "sqlQueries" in result:
-            for i, query in enumerate(result["sqlQueries"]):
-                print(f"[DEBUG] LLM 생성 SQL: {str(query.get('query', ''))}")
-        if isinstance(result, dict):
-            print(f"[DEBUG] result keys: {list(result.keys())}")
-            if "sqlQueries" in result:
-                print(f"[DEBUG] sqlQueries 존재: {len(result['sqlQueries'])}개")
-                for i, query in enumerate(result['sqlQueries']):
-                    print(f"[DEBUG] Query {i+1}: {str(query)}")
-            else:
-                print(f"[DEBUG] sqlQueries 키가 없음!")
-            if "type" in result and result["type"] == "error":
-                print(f"[DEBUG] 오류 응답 감지: {str(result.get('message', 'Unknown error'))}")
+        result = await self._call_openai_cached(
+            "sql", query, recent_context, messages,
+            is_cacheable=lambda r: isinstance(r, dict) and r.get("type") != "error" and bool(r.get("sqlQueries")),
+            extra_key=confirmation_info,
+            return_json=True
+        )
+        if not isinstance(result, dict) or result.get("type") == "error" or not result.get("sqlQueries"):
+            log.warning("llm.sql_generation_failed", query=query, result=result)
         else:
-            print(f"[DEBUG] result가 딕셔너리가 아님: {str(result)}")
+            log.debug("llm.sql_generated", query=query,
+                      sql=lazy(lambda: [str(item.get("query", "")) for item in result["sqlQueries"]]))
         return result
 
     async def _generate_visualization_config(self, sql_results: List[Dict], query: str, chat_history: List[Dict] = None) -> Dict[str, Any]:
-        """5단계: 시각화 정보만 추천 (chartType, xAxis, yAxis, seriesBy)"""
-        recent_context = get_recent_context(chat_history)
-        
-        # 실제 데이터 구조 분석
-        if not sql_results or not sql_results[0].get('data'):
+        """5단계: 시각화 정보만 추천 (chartType, xAxis, yAxis, seriesBy)
+
+        결과 컬럼의 역할(시간/범주/측정값)로 로컬에서 추천하고, 애매한 모양의 결과만
+        VISUALIZATION_LLM_FALLBACK=1일 때 LLM으로 추천 (아니면 기본 막대 차트)
+        """
+        if not sql_results or not page_rows(sql_results[0]):
             return {"chartType": "bar", "xAxis": "X축", "yAxis": "Y축", "seriesBy": None}
-        
-        data_sample = sql_results[0]['data'][:3]  # 샘플 데이터
+
+        recommendation = recommend_visualization(sql_results[0], query)
+        if recommendation is not None:
+            metrics.VISUALIZATIONS.inc(path="rule")
+            log.debug("llm.visualization", result=recommendation, source="rule")
+            return recommendation
+        if not VISUALIZATION_LLM_FALLBACK:
+            metrics.VISUALIZATIONS.inc(path="default")
+            return default_visualization(sql_results[0])
+        metrics.VISUALIZATIONS.inc(path="llm")
+
+        # 실제 데이터 구조 분석
+        recent_context = get_recent_context(chat_history)
+        data_sample = decode_rows(sql_results[0], limit=3)  # 샘플 데이터
         available_columns = sql_results[0].get('columns', [])
         
         # 데이터 구조를 LLM에게 명확히 전달
@@ -503,13 +1025,14 @@ SQL 생성 규칙:
         for col in available_columns:
             sample_values = [str(row.get(col, '')) for row in data_sample[:3] if row.get(col)]
             data_structure_info += f"- {col}: {sample_values}\n"
-        
-        results_str = json.dumps(sql_results, ensure_ascii=False, indent=2)
-        
+
+        context = self._prompt_context("visualization", query, recent_context,
+                                       *[result.get("query", "") for result in sql_results])
         messages = [
             {"role": "system", "content": f"""
-{self.domain_knowledge}
-{self.db_schema}
+{context.prefix}
+
+{context.sections}
 
 대화 맥락:
 {recent_context}
@@ -550,8 +1073,7 @@ SQL 실행 결과를 기반으로 실제 차트 생성에 필요한 시각화 
             {"role": "user", "content": f"분석 요청: {query}\n\n사용자가 요청한 분석을 위해 위 데이터 구조를 바탕으로 가장 적절한 시각화 설정을 추천해주세요."}
         ]
         
-        result = await self._call_openai(messages, return_json=True)
-        print(f"[DEBUG] LLM 시각화 설정 추천: {result}")
+        result = await self._call_openai(messages, return_json=True, stage="visualization")
         
         # 결과 검증 및 기본값 설정
         if isinstance(result, dict):
@@ -568,44 +1090,56 @@ SQL 실행 결과를 기반으로 실제 차트 생성에 필요한 시각화 
             # seriesBy 값 정리 (문자열 "null"을 실제 None로 변환)
             if result.get("seriesBy") == "null" or result.get("seriesBy") == "None":
                 result["seriesBy"] = None
-                
-            print(f"[DEBUG] 최종 시각화 설정: {result}")
+
+            log.debug("llm.visualization", result=result, source="llm")
         
         return result
 
-    async def _generate_summary_and_insight(self, sql_results, query, chat_history):
-        """
-        SQL 실행 결과와 분석 요청을 바탕으로 LLM에게 데이터 요약(수치) + 인사이트(제언)를 생성하도록 요청
-        """
-        import json
+    def _summary_messages(self, sql_results, query, chat_history) -> Optional[List[Dict]]:
+        """요약/인사이트 생성 프롬프트 (결과 데이터가 없으면 None)"""
         recent_context = get_recent_context(chat_history)
-        # 데이터 샘플 및 주요 컬럼 추출
-        if not sql_results or not sql_results[0].get('data'):
-            return ("분석 결과 데이터가 없습니다.", "추가 데이터가 필요합니다.")
-        data_sample = sql_results[0]['data'][:5]
-        available_columns = sql_results[0].get('columns', [])
+        if not sql_results or not page_rows(sql_results[0]):
+            return None
+        # 결과별 프로파일 (전체 결과 기준 집계, 작은 결과는 원본 행도 포함)
+        result_info = ""
+        for index, result in enumerate(sql_results, 1):
+            if not page_rows(result):
+                continue
+            with_rows = result.get("row_count", 0) <= RESULT_PROFILE_INLINE_ROWS
+            profile = prompt_profile(result.get('profile', {}), with_rows)
+            result_info += f"\n[결과 {index}] 컬럼: {result.get('columns', [])}\n"
+            result_info += f"프로파일: {json.dumps(profile, ensure_ascii=False)}\n"
+            if with_rows:
+                result_info += f"전체 행: {json.dumps(decode_rows(result), ensure_ascii=False)}\n"
+        context = self._prompt_context("summary", query, recent_context,
+                                       *[result.get("query", "") for result in sql_results])
         # 프롬프트 구성
-        messages = [
+        return [
             {"role": "system", "content": f"""
-{self.domain_knowledge}
-{self.db_schema}
+{context.prefix}
+
+{context.sections}
 
 대화 맥락:
 {recent_context}
 
-아래는 SQL 실행 결과 데이터 샘플입니다. 주요 수치 요약(숫자 포함)과, 1~2문장 인사이트를 생성하세요. 반드시 데이터 기반으로 작성하세요.
-
-데이터 샘플 (최대 5행):
-{json.dumps(data_sample, ensure_ascii=False, indent=2)}
+아래는 SQL 실행 결과 전체를 기준으로 계산한 프로파일입니다. 주요 수치 요약(숫자 포함)과, 1~2문장 인사이트를 생성하세요. 반드시 데이터 기반으로 작성하세요.
+(measures: 측정값별 합계/최소/최대/평균, highest/lowest: 상위·하위 행, period_changes/largest_changes: 직전 기간 대비 변화, contributors: 항목별 비중(%), outliers: 이상치 행, truncated: 행 수 제한으로 일부만 집계)
+{result_info}
 
 분석 요청: {query}
 """},
             {"role": "user", "content": f"SQL 실행 결과를 요약하고, 인사이트를 1~2문장으로 작성해줘."}
         ]
-        response = await self._call_openai(messages, temperature=0.4, return_json=False)
-        # 응답에서 summary/insight 분리(간단하게 줄바꿈 기준)
-        if "\n" in response:
-            parts = response.split("\n", 1)
-            return parts[0].strip(), parts[1].strip()
-        else:
-            return response.strip(), ""
+
+    async def _stream_summary_and_insight(self, sql_results, query, chat_history) -> AsyncIterator[str]:
+        """
+        SQL 실행 결과와 분석 요청을 바탕으로 LLM에게 데이터 요약(수치) + 인사이트(제언)를 생성하도록 요청
+        (텍스트 조각을 생성되는 대로 반환, 전체 응답은 split_summary로 summary/insight 분리)
+        """
+        messages = self._summary_messages(sql_results, query, chat_history)
+        if messages is None:
+            yield "분석 결과 데이터가 없습니다.\n추가 데이터가 필요합니다."
+            return
+        async for text in self._stream_openai(messages, temperature=0.4, stage="summary"):
+            yield text
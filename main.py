@@ -1,67 +1,156 @@
 from dotenv import load_dotenv
 import os
 
-# .env 파일 로드 및 API 키 확인
+# .env 파일 로드 및 API 키 확인 (LLM_BACKEND=replay이면 키 없이 실행 가능)
 load_dotenv()
-if not os.getenv("OPENAI_API_KEY"):
+if os.getenv("LLM_BACKEND", "openai") == "openai" and not os.getenv("OPENAI_API_KEY"):
     raise ValueError("OPENAI_API_KEY environment variable is required")
 
-from fastapi import FastAPI, HTTPException, Request
+from fastapi import FastAPI, HTTPException, Query, Request
+from fastapi.middleware.gzip import GZipMiddleware
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
-from fastapi.responses import HTMLResponse
-from contextlib import asynccontextmanager
+from fastapi.responses import HTMLResponse, JSONResponse, PlainTextResponse, Response, StreamingResponse
+from contextlib import asynccontextmanager, nullcontext
+import asyncio
 import sqlite3
+import time
 import pandas as pd
 import json
-import uuid
 from datetime import datetime
-from typing import Dict, List, Optional
+from typing import Any, Dict, List, Optional
 
+import metrics
+from dashboard import DashboardTiles, cache_control as dashboard_cache_control, etag_matches
 from database import DatabaseService
+from ingest import INGEST_DIR, IngestError
+from session_store import SESSION_HISTORY_WINDOW, create_session_store
+from shared_state import APP_WORKERS, get_shared_state
+from structured_logging import get_logger
 from llm_service import LLMService
+from result_format import RESULT_PAGE_ROWS
 from models import *
 
 # Initialize services
 db_service = DatabaseService()
 llm_service = LLMService(db_service=db_service)
+# 대시보드 타일 (데이터 버전별 월 합계, 적재 직후 갱신)
+dashboard_tiles = DashboardTiles(db_service)
 
-# Session storage
-sessions: Dict[str, ChatSession] = {}
+log = get_logger("api")
+
+# Session storage (SESSION_BACKEND=memory|sqlite)
+session_store = create_session_store()
+
+# /metrics 수집 시점에 읽는 캐시/풀/세션 지표
+metrics.cache_gauges(lambda: {"llm_response": llm_service.cache_stats(), "sql_result": db_service.cache_stats()})
+metrics.REGISTRY.gauge_callback("qa_db_pool_reuse_ratio", "Share of reader checkouts served by a pooled connection", [],
+                                lambda: [((), db_service.pool_stats()["reuse_rate"])])
+metrics.REGISTRY.gauge_callback("qa_rollup_rewrites", "Queries rewritten onto rollup tables since process start", [],
+                                lambda: [((), db_service.rollup_stats()["rewrites"])])
+metrics.REGISTRY.gauge_callback("qa_data_version", "Data version bumped on every ingest", [],
+                                lambda: [((), db_service.data_version)])
+metrics.REGISTRY.gauge_callback("qa_classifier_fast_path_ratio", "Share of queries classified by rules without an LLM call", [],
+                                lambda: [((), llm_service.classifier_stats()["hit_rate"])])
+metrics.REGISTRY.gauge_callback("qa_sessions", "Chat sessions in the session store", [],
+                                lambda: [((), len(session_store))])
+
+# 클라이언트 연결 종료 여부 확인 주기(초)
+DISCONNECT_POLL_SECONDS = float(os.getenv("DISCONNECT_POLL_SECONDS", "0.5"))
+# 이 크기(바이트) 이상인 응답은 gzip 압축 (0이면 비활성화, SSE 스트림은 압축하지 않음)
+GZIP_MIN_SIZE = int(os.getenv("GZIP_MIN_SIZE", "1024"))
+
+async def run_until_disconnected(http_request: Request, coro):
+    """코루틴을 실행하다가 HTTP 클라이언트 연결이 끊기면 작업을 취소하고 None 반환"""
+    task = asyncio.create_task(coro)
+    try:
+        while True:
+            done, _ = await asyncio.wait({task}, timeout=DISCONNECT_POLL_SECONDS)
+            if done:
+                return task.result()
+            if await http_request.is_disconnected():
+                log.info("api.client_disconnected", path=http_request.url.path)
+                task.cancel()
+                return None
+    finally:
+        # 핸들러 자체가 취소된 경우에도 하위 작업(LLM 호출 등)이 남지 않도록 정리
+        if not task.done():
+            task.cancel()
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Application lifespan manager"""
     try:
-        # Initialize database
-        db_service.init_database()
-        
-        # Load CSV data if tables are empty
-        if db_service.is_database_empty():
-            print("Loading CSV data into database...")
-            db_service.load_csv_data()
-            print("Database initialized successfully")
-        else:
-            print("Database already contains data")
+        # 멀티 워커 기동 시 DB 초기화/적재/기본 세션 생성은 한 워커씩 순서대로 수행
+        shared_state = get_shared_state()
+        with shared_state.exclusive("startup") if shared_state else nullcontext():
+            # Initialize database
+            db_service.init_database()
             
-        # --- 여기서 기본 채팅방 5개 생성 ---
-        if not sessions:
-            for _ in range(5):
-                session_id = str(uuid.uuid4())
-                sessions[session_id] = ChatSession(
-                    session_id=session_id,
-                    chat_history=[],
-                    current_state="idle",
-                    created_at=datetime.now()
-                )
-    except Exception as e:
-        print(f"Error during startup: {e}")
+            # Load CSV data if tables are empty
+            if db_service.is_database_empty():
+                log.info("startup.loading_csv")
+                db_service.load_csv_data()
+                log.info("startup.database_initialized")
+            else:
+                log.info("startup.database_ready")
+                
+            # 대시보드 타일용 월 합계를 미리 집계
+            await dashboard_tiles.refresh()
+
+            # --- 여기서 기본 채팅방 5개 생성 ---
+            if len(session_store) == 0:
+                for _ in range(5):
+                    session_store.create()
+    except Exception:
+        log.exception("startup.failed")
         raise
     
     yield
 
+    # 종료 시 풀에 남아 있는 DB 연결 정리
+    db_service.close()
+    session_store.close()
+    await llm_service.close()
+
 app = FastAPI(title="Quality Analysis System", version="1.0.0", lifespan=lifespan)
 
+class RequestTimingMiddleware:
+    """요청별 처리 시간을 라우트 경로 템플릿 기준으로 기록하는 ASGI 미들웨어
+
+    (BaseHTTPMiddleware와 달리 요청 본문/연결 종료 감지를 가로채지 않으며, 스트리밍 응답은 전송 완료까지 측정)
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        started = time.perf_counter()
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            route = scope.get("route")
+            metrics.HTTP_SECONDS.observe(
+                time.perf_counter() - started,
+                method=scope["method"], route=getattr(route, "path", "unmatched"), status=status
+            )
+
+app.add_middleware(RequestTimingMiddleware)
+if GZIP_MIN_SIZE > 0:
+    # 압축률보다 CPU 비용을 우선해 기본 레벨(9) 대신 6 사용
+    app.add_middleware(GZipMiddleware, minimum_size=GZIP_MIN_SIZE, compresslevel=6)
+
 # Mount static files and templates
 app.mount("/static", StaticFiles(directory="static"), name="static")
 templates = Jinja2Templates(directory="templates")
@@ -71,66 +160,153 @@ async def read_root(request: Request):
     """메인 페이지 제공"""
     return templates.TemplateResponse("index.html", {"request": request})
 
+@app.get("/metrics")
+async def get_metrics():
+    """Prometheus 텍스트 형식 지표 (이 워커 프로세스의 값)"""
+    if not metrics.METRICS_ENABLED:
+        raise HTTPException(status_code=404, detail="Metrics disabled")
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
 @app.post("/api/start_session")
 async def start_session():
     """새로운 채팅 세션 생성"""
-    session_id = str(uuid.uuid4())
-    sessions[session_id] = ChatSession(
-        session_id=session_id,
-        chat_history=[],
-        current_state="idle",
-        created_at=datetime.now()
+    session = session_store.create()
+    return {"session_id": session.session_id}
+
+def start_chat_turn(request: ChatRequest) -> ChatSession:
+    """사용자 메시지를 기록하고 맥락 파악에 필요한 최근 대화가 담긴 세션 반환"""
+    if not session_store.exists(request.session_id):
+        raise HTTPException(status_code=404, detail="Session not found")
+    
+    user_message = request.message.strip()
+    
+    if not user_message:
+        raise HTTPException(status_code=400, detail="Message cannot be empty")
+    
+    # 사용자 메시지 기록
+    session_store.append_message(request.session_id, {
+        "role": "user",
+        "content": user_message,
+        "timestamp": datetime.now().isoformat()
+    })
+    # 맥락 파악에 필요한 최근 대화만 불러옴
+    session = session_store.get(request.session_id, history_limit=SESSION_HISTORY_WINDOW)
+    if session is None:
+        raise HTTPException(status_code=404, detail="Session not found")
+    return session
+
+def finish_chat_turn(session: ChatSession, response: ChatResponse) -> None:
+    """응답 유형에 따라 세션 상태를 갱신하고 시스템 응답 기록 (SQL 결과 행은 저장하지 않음)"""
+    if response.type == "confirmation":
+        session.current_state = "awaiting_confirmation"
+    elif response.type in ["analysis", "concept"]:
+        session.current_state = "confirmed"
+    # 반문이면 후보 의도를 남겨 두고, 그 외 응답이면 비움
+    session.pending_intent = (response.metadata or {}).get("candidateIntents") if response.type == "confirmation" else None
+    session_store.set_state(session.session_id, session.current_state, session.pending_intent)
+    session_store.append_message(session.session_id, {
+        "role": "assistant",
+        "content": response.message,
+        "timestamp": datetime.now().isoformat(),
+        "metadata": response.metadata
+    })
+
+def abort_chat_turn(session: ChatSession) -> None:
+    """응답 없이 끝난 턴(클라이언트 연결 끊김 등)을 중단된 응답으로 기록
+
+    - 사용자 메시지만 남아 대화 기록의 짝이 어긋나지 않도록 함
+    - 세션 상태와 반문 후보는 직전 완료된 응답 기준 그대로 둠 (같은 답변을 다시 보낼 수 있도록)
+    """
+    try:
+        session_store.append_message(session.session_id, {
+            "role": "assistant",
+            "content": "응답 생성이 중단되었습니다.",
+            "timestamp": datetime.now().isoformat(),
+            "metadata": {"aborted": True}
+        })
+    except Exception:
+        log.exception("api.abort_record_failed", session_id=session.session_id)
+
+def error_response(e: Exception) -> ChatResponse:
+    return ChatResponse(
+        message=f"처리 중 오류가 발생했습니다: {str(e)}",
+        type="error",
+        metadata={"error": str(e)}
     )
-    return {"session_id": session_id}
 
 @app.post("/api/chat")
-async def chat(request: ChatRequest):
+async def chat(request: ChatRequest, http_request: Request):
     """채팅 메시지 처리"""
+    session = None
+    finished = False
     try:
-        if request.session_id not in sessions:
-            raise HTTPException(status_code=404, detail="Session not found")
-        
-        session = sessions[request.session_id]
-        user_message = request.message.strip()
-        
-        if not user_message:
-            raise HTTPException(status_code=400, detail="Message cannot be empty")
-        
-        # 사용자 메시지 기록
-        session.chat_history.append({
-            "role": "user",
-            "content": user_message,
-            "timestamp": datetime.now().isoformat()
-        })
-        
-        # 메시지 처리
-        response = await process_chat_message(session, user_message)
+        session = start_chat_turn(request)
         
-        # 시스템 응답 기록
-        session.chat_history.append({
-            "role": "assistant",
-            "content": response.message,
-            "timestamp": datetime.now().isoformat(),
-            "metadata": response.metadata
-        })
+        # 메시지 처리 (클라이언트가 연결을 끊으면 LLM 호출까지 함께 취소)
+        response = await run_until_disconnected(http_request, process_chat_message(session, request.message.strip()))
+        if response is None:
+            return Response(status_code=499)
         
+        finish_chat_turn(session, response)
+        finished = True
         return response
         
     except Exception as e:
-        print(f"Error in chat: {e}")
+        log.exception("api.error", handler="chat")
         raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        # 연결 끊김(499), 핸들러 취소, 응답 기록 실패 시 사용자 메시지에 대응하는 중단 응답을 남김
+        if session is not None and not finished:
+            abort_chat_turn(session)
+
+def format_sse(event: str, data: Any) -> str:
+    """Server-Sent Events 형식의 이벤트 1건"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False, default=str)}\n\n"
+
+@app.post("/api/chat/stream")
+async def chat_stream(request: ChatRequest):
+    """채팅 메시지 처리 - 단계별 결과를 Server-Sent Events로 전송
+
+    이벤트: classification → (confirmation) → sql → rows(쿼리별) → (chart_data) → visualization / summary_token(요약 조각) → done(최종 응답)
+    클라이언트가 연결을 끊으면 응답 생성이 취소되어 진행 중인 LLM 호출도 함께 취소됨
+    """
+    session = start_chat_turn(request)
+
+    async def events():
+        finished = False
+        try:
+            async for event, data in llm_service.process_query_stream(request.message.strip(), session.chat_history,
+                                                                  session.pending_intent):
+                if event == "done":
+                    response = ChatResponse(message=data["message"], type=data["type"], metadata=data["metadata"])
+                    finish_chat_turn(session, response)
+                    finished = True
+                    data = response.model_dump()
+                yield format_sse(event, data)
+        except Exception as e:
+            log.exception("api.error", handler="chat_stream")
+            if not finished:
+                response = error_response(e)
+                finish_chat_turn(session, response)
+                finished = True
+                yield format_sse("done", response.model_dump())
+        finally:
+            # 클라이언트가 연결을 끊어 생성기가 닫히거나 취소되면 done 전에 끝나므로 중단된 응답으로 기록
+            if not finished:
+                abort_chat_turn(session)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
 async def process_chat_message(session: ChatSession, message: str) -> ChatResponse:
     """LLM 서비스를 통한 5단계 프로세스 처리"""
     try:
-        # LLM 서비스에 모든 처리 위임
-        result = await llm_service.process_query(message, session.chat_history)
-        
-        # 상태 업데이트
-        if result["type"] == "confirmation":
-            session.current_state = "awaiting_confirmation"
-        elif result["type"] in ["analysis", "concept"]:
-            session.current_state = "confirmed"
+        # LLM 서비스에 모든 처리 위임 (세션 상태 갱신은 finish_chat_turn에서 수행)
+        # 직전 반문의 후보 의도를 넘겨, 그중 하나를 고른 답변이면 다시 반문하지 않도록 함
+        result = await llm_service.process_query(message, session.chat_history, session.pending_intent)
         
         return ChatResponse(
             message=result["message"],
@@ -139,17 +315,13 @@ async def process_chat_message(session: ChatSession, message: str) -> ChatRespon
         )
         
     except Exception as e:
-        print(f"Error in process_chat_message: {e}")
-        return ChatResponse(
-            message=f"처리 중 오류가 발생했습니다: {str(e)}",
-            type="error",
-            metadata={"error": str(e)}
-        )
+        log.exception("api.error", handler="process_chat_message")
+        return error_response(e)
 
 @app.post("/api/select_metric")
 async def select_metric(request: MetricRequest):
     """메트릭 선택 처리 - 단순히 패널 활성화 상태만 반환"""
-    if request.session_id not in sessions:
+    if not session_store.exists(request.session_id):
         raise HTTPException(status_code=404, detail="Session not found")
     
     return {
@@ -160,57 +332,39 @@ async def select_metric(request: MetricRequest):
 @app.post("/api/reset_session")
 async def reset_session(request: ResetRequest):
     """세션 초기화"""
-    if request.session_id not in sessions:
+    if not session_store.reset(request.session_id):
         raise HTTPException(status_code=404, detail="Session not found")
     
-    sessions[request.session_id].chat_history = []
-    sessions[request.session_id].current_state = "idle"
-    
     return {"status": "success", "message": "Session reset successfully"}
 
 @app.post("/api/delete_session")
 async def delete_session(request: ResetRequest):
     """채팅 세션 삭제"""
-    if request.session_id not in sessions:
+    if not session_store.delete(request.session_id):
         raise HTTPException(status_code=404, detail="Session not found")
-    del sessions[request.session_id]
     return {"status": "success"}
 
 @app.get("/api/sessions")
 async def get_sessions():
     """Get list of all sessions (for chat history panel)"""
     try:
-        session_list = []
-        for session_id, session in sessions.items():
-            # 첫 user 메시지 요약(30자 이내, 줄바꿈 제거)
-            first_message = next(
-                (msg for msg in session.chat_history if msg["role"] == "user"),
-                {"content": "새 대화"}
-            )
-            summary = first_message["content"].replace("\n", " ").strip()
-            if len(summary) > 30:
-                summary = summary[:30] + "..."
-            session_list.append({
-                "session_id": session_id,
-                "title": summary,
-                "created_at": session.created_at.isoformat(),
-                "message_count": len(session.chat_history)
-            })
+        # 제목은 첫 user 메시지 요약(30자 이내, 줄바꿈 제거) - 대화 기록 전체는 읽지 않음
+        session_list = session_store.list_sessions()
         # Sort by creation time, newest first
         session_list.sort(key=lambda x: x["created_at"], reverse=True)
         return session_list
     except Exception as e:
-        print(f"Error in get_sessions: {e}")
+        log.exception("api.error", handler="get_sessions")
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/api/session/{session_id}")
 async def get_session(session_id: str):
     """Get specific session data"""
     try:
-        if session_id not in sessions:
+        session = session_store.get(session_id)
+        if session is None:
             raise HTTPException(status_code=404, detail="Session not found")
         
-        session = sessions[session_id]
         return {
             "session_id": session_id,
             "chat_history": session.chat_history,
@@ -219,83 +373,95 @@ async def get_session(session_id: str):
         }
         
     except Exception as e:
-        print(f"Error in get_session: {e}")
+        log.exception("api.error", handler="get_session")
         raise HTTPException(status_code=500, detail=str(e))
 
-@app.post("/api/yearly_quality_data")
-async def get_yearly_quality_data(request: dict):
-    """연도별 품질부적합률 데이터 제공"""
+@app.get("/api/result/{result_id}")
+async def get_result_page(result_id: str, offset: int = Query(0, ge=0),
+                          limit: int = Query(RESULT_PAGE_ROWS, ge=1, le=RESULT_PAGE_ROWS)):
+    """분석 응답의 sql_results[].result_id로 첫 페이지 이후 행을 컬럼 단위 형식으로 조회"""
     try:
-        # 품질부적합 데이터 조회
-        query = """
-        SELECT 
-            SUBSTR(DAY_CD, 1, 4) as year,
-            SUM(QLY_INC_HPW) as total_defects,
-            SUM(TR_F_PRODQUANTITY) as total_production
-        FROM TB_SUM_MQS_QMHT200 
-        WHERE DAY_CD IS NOT NULL 
-        GROUP BY SUBSTR(DAY_CD, 1, 4)
-        ORDER BY year
-        """
-        
-        df = db_service.execute_query(query)
-        
-        if df.empty:
-            return {"years": [], "quality_rates": []}
-        
-        # 품질부적합률 계산 (품질부적합발생량 / 제품생산량 * 100)
-        df['quality_rate'] = (df['total_defects'] / df['total_production'] * 100).round(2)
-        
-        return {
-            "years": df['year'].tolist(),
-            "quality_rates": df['quality_rate'].tolist()
-        }
-        
+        page = await llm_service.result_page(result_id, offset, limit)
     except Exception as e:
-        print(f"Error in get_yearly_quality_data: {e}")
+        log.exception("api.error", handler="get_result_page")
         raise HTTPException(status_code=500, detail=str(e))
+    if page is None:
+        raise HTTPException(status_code=404, detail="Result not found or expired")
+    return page
+
+@app.post("/api/ingest")
+async def ingest_csv(request: IngestRequest):
+    """서버의 INGEST_DIR 아래 CSV 파일을 추가(또는 교체) 적재"""
+    ingest_root = os.path.realpath(INGEST_DIR)
+    files = []
+    for path in request.paths:
+        resolved = os.path.realpath(os.path.join(ingest_root, path) if not os.path.isabs(path) else path)
+        if os.path.commonpath([ingest_root, resolved]) != ingest_root:
+            raise HTTPException(status_code=400, detail=f"{INGEST_DIR} 밖의 파일은 적재할 수 없습니다: {path}")
+        files.append({"path": resolved, "table_name": request.table_name})
 
-@app.post("/api/monthly_quality_trend")
-async def get_monthly_quality_trend(request: dict):
-    """2025년 1월~5월 품질부적합률 추세 데이터 제공"""
     try:
-        # 2025년 1월~5월 월별 품질부적합률 데이터 조회
-        query = """
-        SELECT 
-            SUBSTR(DAY_CD, 1, 6) as year_month,
-            SUM(QLY_INC_HPW) as total_defects,
-            SUM(TR_F_PRODQUANTITY) as total_production
-        FROM TB_SUM_MQS_QMHT200 
-        WHERE DAY_CD LIKE '2025%' 
-        AND SUBSTR(DAY_CD, 5, 2) IN ('01', '02', '03', '04', '05')
-        AND DAY_CD IS NOT NULL 
-        GROUP BY SUBSTR(DAY_CD, 1, 6)
-        ORDER BY year_month
-        """
-        
-        df = db_service.execute_query(query)
-        
-        if df.empty:
-            return {"months": [], "quality_rates": []}
-        
-        # 품질부적합률 계산 (품질부적합발생량 / 제품생산량 * 100)
-        df['quality_rate'] = (df['total_defects'] / df['total_production'] * 100).round(2)
-        
-        # 월 이름으로 변환 (202501 -> 1월)
-        month_names = []
-        for year_month in df['year_month']:
-            month = int(year_month[4:6])
-            month_names.append(f"{month}월")
-        
-        return {
-            "months": month_names,
-            "quality_rates": df['quality_rate'].tolist()
-        }
-        
+        result = await db_service.ingest_csv_files_async(files, replace=request.replace)
+    except IngestError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        log.exception("api.error", handler="ingest_csv")
+        raise HTTPException(status_code=500, detail=str(e))
+    if result["rows"] or request.replace:
+        # 적재된(replace면 비워진) 데이터 기준으로 대시보드 타일을 바로 다시 집계 (실패하면 다음 타일 요청에서 다시 시도)
+        try:
+            await dashboard_tiles.refresh()
+        except Exception:
+            log.exception("dashboard.refresh_failed")
+    return result
+
+async def dashboard_response(http_request: Request, name: str, params: Dict[str, Any]) -> Response:
+    """대시보드 타일 응답 - ETag는 데이터 버전 기준, If-None-Match가 같으면 본문 없이 304"""
+    try:
+        await dashboard_tiles.ensure_current()
     except Exception as e:
-        print(f"Error in get_monthly_quality_trend: {e}")
+        log.exception("api.error", handler=name)
         raise HTTPException(status_code=500, detail=str(e))
+    etag = dashboard_tiles.etag(name, params)
+    headers = {"ETag": etag, "Cache-Control": dashboard_cache_control()}
+    if etag_matches(http_request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    return JSONResponse(dashboard_tiles.tile(name, params), headers=headers)
+
+@app.get("/api/yearly_quality_data")
+async def get_yearly_quality_data(http_request: Request,
+                                  from_year: Optional[int] = Query(None, ge=1900, le=9999),
+                                  to_year: Optional[int] = Query(None, ge=1900, le=9999)):
+    """연도별 품질부적합률 (from_year~to_year, 생략 시 전체 연도)"""
+    return await dashboard_response(http_request, "yearly_quality", {"from_year": from_year, "to_year": to_year})
+
+@app.get("/api/monthly_quality_trend")
+async def get_monthly_quality_trend(http_request: Request,
+                                    year: Optional[int] = Query(None, ge=1900, le=9999),
+                                    from_month: int = Query(1, ge=1, le=12),
+                                    to_month: int = Query(12, ge=1, le=12)):
+    """year년 from_month~to_month월 품질부적합률 추세 (year 생략 시 데이터가 있는 마지막 연도)"""
+    return await dashboard_response(http_request, "monthly_quality_trend",
+                                    {"year": year, "from_month": from_month, "to_month": to_month})
+
+@app.post("/api/yearly_quality_data")
+async def post_yearly_quality_data(http_request: Request, request: dict):
+    """이전 클라이언트 호환용 - GET /api/yearly_quality_data 기본값과 같음 (요청 본문은 사용하지 않음)"""
+    return await get_yearly_quality_data(http_request, from_year=None, to_year=None)
+
+@app.post("/api/monthly_quality_trend")
+async def post_monthly_quality_trend(http_request: Request, request: dict):
+    """이전 클라이언트 호환용 - 이전과 같은 2025년 1월~5월 추세, 같은 형식(months/quality_rates) (요청 본문은 사용하지 않음)
+
+    다른 연도/기간은 GET /api/monthly_quality_trend?year=&from_month=&to_month= 사용
+    """
+    return await dashboard_response(http_request, "legacy_monthly_quality_trend", {})
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=True, log_level="debug")
+    # APP_WORKERS > 1이면 워커 프로세스를 여러 개 띄움 (reload는 단일 프로세스에서만 가능)
+    # 세션/캐시/데이터 버전은 SHARED_STATE_PATH의 SQLite 파일로 워커 간 공유됨
+    if APP_WORKERS > 1:
+        uvicorn.run("main:app", host="0.0.0.0", port=8000, workers=APP_WORKERS, log_level="info")
+    else:
+        uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=True, log_level="debug")
@@ -0,0 +1,265 @@
+"""
+Lightweight in-process metrics: counters/histograms rendered in Prometheus text format,
+plus a per-request stage timing breakdown carried in a ContextVar
+"""
+import os
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from structured_logging import get_logger
+
+log = get_logger("metrics")
+
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "1") == "1"    # 0이면 /metrics 비활성화 (요청별 timings는 유지)
+
+# 히스토그램 구간 (초 / 행 수)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+ROW_BUCKETS = (0, 1, 10, 100, 1000, 10000, 100000)
+
+LabelValues = Tuple[str, ...]
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape(value: Any) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """단조 증가 카운터 (라벨별)"""
+
+    type_name = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[LabelValues, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels: str) -> float:
+        return self._values.get(tuple(str(labels[name]) for name in self.labelnames), 0)
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}" for key, value in items]
+
+
+class Histogram:
+    """누적 구간(bucket) 히스토그램 (라벨별)"""
+
+    type_name = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+        # 라벨별 [구간별 개수..., 합계, 전체 개수]
+        self._values: Dict[LabelValues, List[float]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [0] * len(self.buckets) + [0.0, 0]
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[index] += 1
+                    break
+            state[-2] += value
+            state[-1] += 1
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = sorted((key, list(state)) for key, state in self._values.items())
+        lines = []
+        for key, state in items:
+            cumulative = 0
+            for index, bound in enumerate(self.buckets):
+                cumulative += state[index]
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {_format_value(state[-2])}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {state[-1]}")
+        return lines
+
+
+# 수집 시점에 값을 읽어오는 게이지: (이름, 설명, 라벨 이름, 콜백 → [(라벨 값, 값)])
+GaugeCallback = Callable[[], Iterable[Tuple[LabelValues, float]]]
+
+
+class MetricsRegistry:
+    """카운터/히스토그램/콜백 게이지를 모아 Prometheus 텍스트 형식으로 출력
+
+    값은 프로세스별로 집계됨 (멀티 워커에서는 스크레이프를 받은 워커의 값만 보임)
+    """
+
+    def __init__(self):
+        self._metrics: List[Any] = []
+        self._gauges: List[Tuple[str, str, Tuple[str, ...], GaugeCallback]] = []
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        metric = Counter(name, documentation, labelnames)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+        metric = Histogram(name, documentation, labelnames, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def gauge_callback(self, name: str, documentation: str, labelnames: Sequence[str], callback: GaugeCallback) -> None:
+        self._gauges.append((name, documentation, tuple(labelnames), callback))
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.type_name}")
+            lines.extend(metric.render())
+        for name, documentation, labelnames, callback in self._gauges:
+            try:
+                samples = list(callback())
+            except Exception as e:
+                log.warning("metrics.collect_failed", metric=name, error=str(e))
+                continue
+            lines.append(f"# HELP {name} {documentation}")
+            lines.append(f"# TYPE {name} gauge")
+            for key, value in samples:
+                lines.append(f"{name}{_format_labels(labelnames, key)} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+# 질의 처리 단계별 / 전체 소요 시간
+STAGE_SECONDS = REGISTRY.histogram(
+    "qa_stage_duration_seconds", "Duration of each chat pipeline stage", ["stage"])
+REQUEST_SECONDS = REGISTRY.histogram(
+    "qa_request_duration_seconds", "End-to-end chat processing time by response type", ["type"])
+
+# OpenAI 호출
+LLM_CALLS = REGISTRY.counter(
+    "qa_llm_calls_total", "OpenAI calls by final outcome", ["mode", "outcome"])
+LLM_ATTEMPTS = REGISTRY.counter(
+    "qa_llm_attempts_total", "OpenAI request attempts including retries", ["mode"])
+LLM_RETRIES = REGISTRY.counter(
+    "qa_llm_retries_total", "OpenAI retries by reason", ["reason"])
+LLM_TOKENS = REGISTRY.counter(
+    "qa_llm_tokens_total", "OpenAI tokens reported by the API", ["kind"])
+PROMPT_CONTEXT_TOKENS = REGISTRY.counter(
+    "qa_prompt_context_tokens_total", "Estimated domain knowledge/schema prompt tokens (full: unsliced, sliced: sent)",
+    ["kind"])
+LLM_SECONDS = REGISTRY.histogram(
+    "qa_llm_call_duration_seconds", "OpenAI call duration including retries", ["mode"])
+
+# 질의 분류 (rule: 규칙 기반 빠른 경로, llm: LLM 호출)
+CLASSIFICATIONS = REGISTRY.counter(
+    "qa_classifications_total", "Query classifications by path", ["path", "query_type"])
+
+# SQL 생성 (template: 질의 템플릿, intake: 통합 intake 호출, llm: SQL 생성 LLM 호출)
+SQL_GENERATIONS = REGISTRY.counter(
+    "qa_sql_generations_total", "SQL generations by path", ["path"])
+
+# 시각화 설정 (rule: 로컬 추천, llm: 애매한 결과의 LLM 추천, default: 추천 불가 시 기본 차트)
+VISUALIZATIONS = REGISTRY.counter(
+    "qa_visualizations_total", "Visualization configs by path", ["path"])
+CHART_DATA_REDUCTIONS = REGISTRY.counter(
+    "qa_chart_data_reductions_total", "Chart data reduced before sending by method", ["method"])
+
+# SQL 실행
+DB_QUERY_SECONDS = REGISTRY.histogram(
+    "qa_db_query_duration_seconds", "execute_query duration by source", ["source"])
+DB_QUERY_ROWS = REGISTRY.histogram(
+    "qa_db_query_rows", "Rows returned by execute_query", ["source"], buckets=ROW_BUCKETS)
+DB_QUERY_ERRORS = REGISTRY.counter(
+    "qa_db_query_errors_total", "execute_query failures")
+
+# HTTP 요청 (스트리밍 응답은 본문 전송 완료까지)
+HTTP_SECONDS = REGISTRY.histogram(
+    "qa_http_request_duration_seconds", "HTTP request duration until the response body is sent",
+    ["method", "route", "status"])
+
+
+def render() -> str:
+    return REGISTRY.render()
+
+
+def cache_gauges(stats_by_cache: Callable[[], Dict[str, Dict[str, Any]]]) -> None:
+    """캐시별 stats() 결과로 적중/실패 수와 적중률 게이지 등록"""
+    for field, name, documentation in (
+        ("hits", "qa_cache_hits", "Cache hits since process start"),
+        ("misses", "qa_cache_misses", "Cache misses since process start"),
+        ("hit_rate", "qa_cache_hit_ratio", "Cache hit ratio since process start"),
+        ("size", "qa_cache_entries", "Entries currently cached"),
+    ):
+        REGISTRY.gauge_callback(
+            name, documentation, ["cache"],
+            lambda field=field: [((cache,), stats.get(field, 0)) for cache, stats in stats_by_cache().items()]
+        )
+
+
+# ---------- 요청별 단계 시간 ----------
+
+# 현재 요청의 {단계: 누적 ms} (process_query_stream 시작 시 설정되며, 같은 요청에서 만든 태스크/스레드에도 전달됨)
+_request_timings: ContextVar[Optional[Dict[str, float]]] = ContextVar("request_timings", default=None)
+_timings_lock = threading.Lock()
+
+
+def begin_request() -> Dict[str, float]:
+    """현재 컨텍스트(요청)에 새 단계 시간 기록부를 설정하여 반환"""
+    timings: Dict[str, float] = {}
+    _request_timings.set(timings)
+    return timings
+
+
+def add_timing(name: str, value: float) -> None:
+    """현재 요청 기록부의 name 항목에 value를 더함 (기록부가 없으면 무시)"""
+    timings = _request_timings.get()
+    if timings is None:
+        return
+    with _timings_lock:
+        timings[name] = timings.get(name, 0) + value
+
+
+@contextmanager
+def stage(name: str):
+    """단계 소요 시간을 히스토그램과 현재 요청 기록부(`{name}_ms`)에 함께 기록"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        STAGE_SECONDS.observe(elapsed, stage=name)
+        add_timing(f"{name}_ms", elapsed * 1000)
+
+
+def timings_snapshot(timings: Dict[str, float]) -> Dict[str, float]:
+    """응답 metadata에 넣을 수 있도록 반올림한 복사본"""
+    with _timings_lock:
+        return {name: round(value, 1) if name.endswith("_ms") else value for name, value in timings.items()}
@@ -18,6 +18,11 @@ class MetricRequest(BaseModel):
 class ResetRequest(BaseModel):
     session_id: str
 
+class IngestRequest(BaseModel):
+    paths: List[str]  # INGEST_DIR 기준 상대 경로 (또는 INGEST_DIR 아래의 절대 경로)
+    table_name: Optional[str] = None  # 생략 시 파일명 접두어로 추정
+    replace: bool = False
+
 class ChatSession(BaseModel):
     session_id: str
     chat_history: List[Dict[str, Any]] = []
@@ -0,0 +1,156 @@
+"""
+Per-query prompt slicing: splits the domain knowledge and DB schema into sections (metrics, each table,
+defect-cause glossary, rules, examples) and keeps only the ones a question needs behind a stable shared prefix
+"""
+import os
+import re
+from typing import Dict, Iterable, List, NamedTuple, Optional
+
+from domain_knowledge import DEFECT_CAUSES, ITEM_TYPES, SPECIFICATIONS
+
+try:
+    import tiktoken
+except ImportError:  # 토큰 수는 근사치로 계산
+    tiktoken = None
+
+PROMPT_SLICING_ENABLED = os.getenv("PROMPT_SLICING_ENABLED", "1") == "1"  # 0이면 항상 전체 도메인 지식/스키마 사용
+
+# 테이블별 관련 표현 (질문/대화 맥락/SQL에 하나라도 있으면 해당 테이블 섹션 포함)
+TABLE_TERMS: Dict[str, str] = {
+    "TB_SUM_MQS_QMHT200": "|".join(
+        [r"부적합|불량|생산량|공장|공정|원인|결함|외관|규격|DAY_|QLY_INC|TR_F_PROD|QMHT200"]
+        + [re.escape(term) for term in DEFECT_CAUSES + SPECIFICATIONS]
+        + [rf"(?:{'|'.join(ITEM_TYPES)})\d"]
+    ),
+    "TB_S95_SALS_CLAM030": r"클레임|보상|RMA_QTY|RESOLUTION|CLAM030",
+    "TB_S95_A_GALA_SALESPROD": r"클레임률|매출|판매|SALE_QTY|SALES_|SALESPROD|RU_CLAIM_RATE",
+}
+# 외관불량원인 정의가 필요한 표현
+GLOSSARY_TERMS = "|".join([r"원인|결함|외관|흠|EX_A_MAST"] + [re.escape(term) for term in DEFECT_CAUSES])
+# 예시 SQL까지 포함하는 단계 (SQL을 생성하는 단계)
+EXAMPLE_STAGES = ("sql", "intake")
+
+# 도메인 지식 [n]번 섹션의 용도
+_TABLE_SECTIONS = {"2": "TB_SUM_MQS_QMHT200", "3": "TB_S95_SALS_CLAM030", "4": "TB_S95_A_GALA_SALESPROD"}
+_PREFIX_SECTIONS = ("1", "6")      # 주요 지표 정의, 유의사항 (항상 포함)
+_GLOSSARY_SECTION = "5"
+_EXAMPLE_SECTION = "7"
+
+
+def estimate_tokens(text: str) -> int:
+    """토큰 수 (tiktoken이 있으면 gpt-4o 인코딩 기준, 없으면 글자 수 기반 근사치)"""
+    if not text:
+        return 0
+    if tiktoken is not None:
+        return len(_encoding().encode(text))
+    # 한글은 대략 글자당 1토큰, 영문/숫자/기호는 4글자당 1토큰
+    hangul = len(re.findall(r"[가-힣]", text))
+    return hangul + (len(text) - hangul + 3) // 4
+
+
+_ENCODING = None
+
+
+def _encoding():
+    global _ENCODING
+    if _ENCODING is None:
+        _ENCODING = tiktoken.get_encoding("o200k_base")
+    return _ENCODING
+
+
+def split_domain_knowledge(text: str) -> Dict[str, str]:
+    """도메인 지식을 '[n] 제목' 단위로 분리 ({"intro": 도입부, "1": ..., "outro": 맺음말}, 구분선 제거)"""
+    sections: Dict[str, List[str]] = {"intro": [], "outro": []}
+    current = "intro"
+    for line in text.strip("\n").splitlines():
+        match = re.match(r"\[(\d+)\]", line)
+        if match:
+            current = match.group(1)
+            sections[current] = []
+        elif line.strip() == "---":
+            # 구분선 뒤에 번호 섹션이 오지 않으면 맺음말
+            current = "outro"
+            continue
+        sections[current].append(line)
+    return {key: "\n".join(lines).strip() for key, lines in sections.items()}
+
+
+def split_db_schema(text: str) -> Dict[str, str]:
+    """DB 스키마를 테이블별 블록으로 분리 ({테이블명: 블록, "notes": 공통 안내})"""
+    blocks: Dict[str, List[str]] = {"notes": []}
+    current = "notes"
+    for line in text.strip("\n").splitlines():
+        match = re.match(r"\d+\.\s+(\w+)", line)
+        if match:
+            current = match.group(1)
+            blocks[current] = []
+        elif line.startswith("※"):
+            current = "notes"
+        elif line.startswith("[DB 스키마]"):
+            continue
+        blocks[current].append(line)
+    return {key: "\n".join(lines).strip() for key, lines in blocks.items()}
+
+
+class PromptContext(NamedTuple):
+    prefix: str             # 모든 질문/단계에서 같은 앞부분 (provider 프롬프트 캐시 대상)
+    sections: str           # 질문에 필요한 섹션만 모은 부분
+    section_names: List[str]
+    tokens: int             # prefix + sections 토큰 수
+    full_tokens: int        # 전체 도메인 지식 + 스키마 토큰 수
+
+
+class PromptContextBuilder:
+    """질문/대화 맥락/SQL에 나온 테이블·컬럼·용어를 기준으로 프롬프트 섹션 선택
+
+    - 항상 포함: 역할/태도(도입부), [1] 주요 지표 정의, [6] 유의사항, 스키마 공통 안내
+    - 관련 테이블만: [2]~[4] 테이블 설명 + 해당 테이블 스키마 (관련 테이블을 찾지 못하면 전체)
+    - 관련 용어가 있을 때만: [5] 외관불량원인 정의
+    - SQL 생성 단계에서만: [7] 예시 SQL 중 선택된 테이블을 사용하는 예시
+    """
+
+    def __init__(self, domain_knowledge: str, db_schema: str, enabled: bool = PROMPT_SLICING_ENABLED):
+        self.enabled = enabled
+        self.full_text = f"{domain_knowledge}\n{db_schema}"
+        self.full_tokens = estimate_tokens(self.full_text)
+
+        domain = split_domain_knowledge(domain_knowledge)
+        schema = split_db_schema(db_schema)
+        self.prefix = "\n\n".join(
+            [domain["intro"]] + [domain[key] for key in _PREFIX_SECTIONS if key in domain]
+            + [schema["notes"], domain["outro"]]
+        )
+        self.table_sections = {
+            table: f"{domain[key]}\n\n[DB 스키마] {schema.get(table, '')}".strip()
+            for key, table in _TABLE_SECTIONS.items() if key in domain
+        }
+        self.glossary = domain.get(_GLOSSARY_SECTION, "")
+        self.examples = domain.get(_EXAMPLE_SECTION, "").splitlines()
+        self._table_patterns = {table: re.compile(pattern, re.IGNORECASE) for table, pattern in TABLE_TERMS.items()}
+        self._glossary_pattern = re.compile(GLOSSARY_TERMS, re.IGNORECASE)
+
+    def detect_tables(self, text: str) -> List[str]:
+        return [table for table, pattern in self._table_patterns.items() if pattern.search(text)]
+
+    def build(self, stage: str, texts: Iterable[Optional[str]]) -> PromptContext:
+        """texts(질문, 대화 맥락, SQL 등)에 필요한 섹션으로 프롬프트 구성"""
+        if not self.enabled:
+            return PromptContext(self.full_text, "", ["all"], self.full_tokens, self.full_tokens)
+
+        text = "\n".join(t for t in texts if t)
+        tables = self.detect_tables(text) or list(self.table_sections)
+        names = list(tables)
+        parts = [self.table_sections[table] for table in tables if table in self.table_sections]
+        if self.glossary and self._glossary_pattern.search(text):
+            names.append("glossary")
+            parts.append(self.glossary)
+        if stage in EXAMPLE_STAGES and self.examples:
+            # 예시 SQL은 선택된 테이블만 사용하는 예시만 포함 (첫 줄은 섹션 제목)
+            examples = [line for line in self.examples[1:]
+                        if line.strip() and set(self.detect_tables(line)) <= set(tables)]
+            if examples:
+                names.append("examples")
+                parts.append("\n".join([self.examples[0]] + examples))
+        sections = "\n\n".join(parts)
+        tokens = estimate_tokens(self.prefix) + estimate_tokens(sections)
+        return PromptContext(self.prefix, sections, names, tokens, self.full_tokens)
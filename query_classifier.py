@@ -0,0 +1,101 @@
+"""
+Rule-based query classifier: answers obvious concept/analytical questions locally, defers the rest to the LLM
+"""
+import os
+import re
+import threading
+import unicodedata
+from typing import Any, Dict, Optional
+
+from domain_knowledge import COLUMN_ALIASES, CUSTOMERS, DEFECT_CAUSES, ITEM_TYPES, METRIC_TERMS, SPECIFICATIONS
+
+QUERY_CLASSIFIER_FAST_PATH = os.getenv("QUERY_CLASSIFIER_FAST_PATH", "1") == "1"  # 0이면 항상 LLM으로 분류
+
+
+def compact_text(text: str) -> str:
+    """비교용 정규화: NFKC, 소문자, 공백 제거, 끝 문장부호 제거"""
+    text = unicodedata.normalize("NFKC", text or "").lower()
+    return re.sub(r"\s+", "", text).rstrip("?.!。~")
+
+
+def _alternation(terms) -> str:
+    # 긴 표현부터 맞추도록 정렬 (예: 품질부적합률이 부적합보다 먼저)
+    return "|".join(re.escape(compact_text(term)) for term in sorted(terms, key=len, reverse=True))
+
+
+# 정의/의미를 묻는 표현
+_CONCEPT_CUE = re.compile(
+    r"뭐야|뭔가요|뭐예요|뭐에요|뭐지|뭔지|무엇|무슨뜻|무슨의미|의미|뜻이|뜻은|정의|개념|이란|란$|설명해"
+)
+# 기간/시점
+_PERIOD = re.compile(
+    r"\d{2,4}년|\d{1,2}월|\d{4}-?\d{2}|분기|상반기|하반기|월별|연도|년도|연별|년별|일별|주별|추이|추세|트렌드"
+    r"|최근|작년|올해|금년|전년|전월|지난달|이번달"
+)
+# 비교/집계/순위 요청
+_ANALYSIS_CUE = re.compile(r"비교|대비|순위|랭킹|상위|하위|top|가장|최고|최저|높은|낮은|증가|감소|변화|현황|분포|합계|평균|총")
+_METRIC = re.compile(_alternation(METRIC_TERMS))
+_AXIS = re.compile(_alternation(COLUMN_ALIASES))
+_GROUPING = re.compile(rf"(?:{_alternation(COLUMN_ALIASES)})(?:별|기준|단위|마다)")
+_VALUE = re.compile(rf"{_alternation(CUSTOMERS + SPECIFICATIONS)}|(?:{_alternation(ITEM_TYPES)})\d?")
+_DEFECT_CAUSE = re.compile(_alternation(DEFECT_CAUSES))
+
+
+def classify_by_rules(query: str) -> Optional[Dict[str, Any]]:
+    """도메인 어휘로 확실한 경우만 분류 (애매하면 None → LLM 분류)
+
+    - concept_lookup: 정의를 묻는 표현이 있고 기간/비교/그룹 기준이 없음, 또는 외관불량원인명만 언급
+    - analytical: 정의를 묻는 표현 없이 지표명과 기간/비교/분석 축/특정 값이 함께 있음
+    """
+    text = compact_text(query)
+    if not text:
+        return None
+    concept_cue = _CONCEPT_CUE.search(text)
+    period = _PERIOD.search(text)
+    analysis_cue = _ANALYSIS_CUE.search(text)
+    metric = _METRIC.search(text)
+
+    if concept_cue:
+        if period or analysis_cue or _GROUPING.search(text):
+            return None
+        return {"queryType": "concept_lookup", "reason": f"정의를 묻는 표현('{concept_cue.group()}')"}
+
+    axis = _AXIS.search(text)
+    value = _VALUE.search(text)
+    if metric and (period or analysis_cue or axis or value):
+        detail = (period or analysis_cue or axis or value).group()
+        return {"queryType": "analytical", "reason": f"지표('{metric.group()}')와 분석 조건('{detail}')"}
+
+    cause = _DEFECT_CAUSE.search(text)
+    if cause and not (metric or period or analysis_cue or axis):
+        return {"queryType": "concept_lookup", "reason": f"외관불량원인명('{cause.group()}')"}
+    return None
+
+
+class QueryClassifier:
+    """규칙 기반 분류기 + 적중 통계 (적중: 규칙으로 분류, 실패: LLM으로 넘김)"""
+
+    def __init__(self, enabled: bool = QUERY_CLASSIFIER_FAST_PATH):
+        self.enabled = enabled
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def classify(self, query: str) -> Optional[Dict[str, Any]]:
+        result = classify_by_rules(query) if self.enabled else None
+        with self._lock:
+            if result is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return result
+
+    def stats(self) -> Dict[str, Any]:
+        """규칙 분류 적중 횟수 및 적중률"""
+        total = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+        }
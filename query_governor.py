@@ -0,0 +1,165 @@
+"""
+Query governor for LLM-generated SQL: plan pre-check, wall-clock deadline and result size caps
+"""
+import os
+import re
+import sqlite3
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional, Tuple
+
+# 쿼리 제한 설정 (환경변수로 조정 가능)
+QUERY_TIMEOUT_SECONDS = float(os.getenv("QUERY_TIMEOUT_SECONDS", "10"))
+QUERY_MAX_BYTES = int(os.getenv("QUERY_MAX_BYTES", str(32 * 1024 * 1024)))       # 결과 행 데이터 추정 크기 상한
+QUERY_MAX_CARTESIAN_ROWS = int(os.getenv("QUERY_MAX_CARTESIAN_ROWS", "10000000"))  # 전체 스캔 조인 예상 조합 수 상한
+
+# progress handler 호출 주기 (SQLite VM 명령어 수 기준)
+_PROGRESS_STEPS = 10000
+_FETCH_BATCH_SIZE = 1000
+
+# 별칭으로 오인하면 안 되는 SQL 키워드
+_SQL_KEYWORDS = {
+    "ON", "WHERE", "JOIN", "INNER", "LEFT", "RIGHT", "FULL", "OUTER", "CROSS", "NATURAL", "GROUP", "ORDER",
+    "LIMIT", "HAVING", "UNION", "EXCEPT", "INTERSECT", "USING", "AS", "WINDOW", "SELECT", "FROM", "AND", "OR",
+}
+
+
+class QueryRejectedError(Exception):
+    """실행 계획 검사에서 거부된 쿼리"""
+
+
+class QueryTimeoutError(Exception):
+    """실행 시간 제한을 초과하여 중단된 쿼리"""
+
+
+class QueryGovernor:
+    """SQL 실행 전/중 제한을 적용하는 관리자
+
+    - check_plan: EXPLAIN QUERY PLAN으로 전체 스캔끼리의 조인(카테시안 곱)을 찾아 경고 또는 거부
+    - deadline: sqlite progress handler로 실행 시간 제한
+    - fetch: 행 수/바이트 상한까지만 읽고 잘림 여부 반환
+    """
+
+    def __init__(self, timeout_seconds: float = QUERY_TIMEOUT_SECONDS, max_rows: Optional[int] = None,
+                 max_bytes: Optional[int] = QUERY_MAX_BYTES, max_cartesian_rows: int = QUERY_MAX_CARTESIAN_ROWS):
+        self.timeout_seconds = timeout_seconds
+        self.max_rows = max_rows
+        self.max_bytes = max_bytes
+        self.max_cartesian_rows = max_cartesian_rows
+
+    def check_plan(self, conn: sqlite3.Connection, query: str) -> List[str]:
+        """실행 계획 검사 - 경고 목록 반환, 예상 조합 수가 상한을 넘으면 QueryRejectedError"""
+        plan = conn.execute(f"EXPLAIN QUERY PLAN {query}").fetchall()
+
+        # 같은 부모(같은 SELECT 루프) 안에서 전체 스캔되는 대상 수집
+        scans_by_parent: Dict[int, List[str]] = {}
+        for _, parent, _, detail in plan:
+            match = re.match(r"SCAN (\w+)", detail)
+            if match and not detail.startswith("SCAN CONSTANT"):
+                scans_by_parent.setdefault(parent, []).append(match.group(1))
+
+        warnings = []
+        aliases = self._table_aliases(conn, query)
+        for names in scans_by_parent.values():
+            if len(names) < 2:
+                continue
+            tables = [aliases.get(name.upper(), name) for name in names]
+            estimated = 1
+            for table in tables:
+                estimated *= max(self._estimate_rows(conn, table), 1)
+            message = f"전체 스캔 테이블 간 카테시안 곱 감지: {' × '.join(tables)} (예상 조합 약 {estimated:,}건)"
+            if estimated > self.max_cartesian_rows:
+                raise QueryRejectedError(f"{message} - 허용 한도 {self.max_cartesian_rows:,}건 초과로 실행하지 않습니다. 조인 조건을 추가해주세요.")
+            warnings.append(message)
+        return warnings
+
+    @staticmethod
+    def _table_aliases(conn: sqlite3.Connection, query: str) -> Dict[str, str]:
+        """쿼리에 등장하는 실제 테이블의 {별칭(대문자): 테이블명} 매핑"""
+        table_names = [row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")]
+        aliases = {}
+        for table in table_names:
+            for match in re.finditer(rf"\b{re.escape(table)}\b(?:\s+(?:AS\s+)?(\w+))?", query, re.IGNORECASE):
+                aliases[table.upper()] = table
+                alias = match.group(1)
+                if alias and alias.upper() not in _SQL_KEYWORDS:
+                    aliases[alias.upper()] = table
+        return aliases
+
+    @staticmethod
+    def _estimate_rows(conn: sqlite3.Connection, table: str) -> int:
+        """테이블 행 수 추정 (MAX(rowid)는 전체 스캔 없이 B-tree 끝에서 바로 읽음)"""
+        try:
+            value = conn.execute(f'SELECT MAX(rowid) FROM "{table}"').fetchone()[0]
+            return int(value or 0)
+        except sqlite3.Error:
+            return 0  # 서브쿼리/CTE 등 실제 테이블이 아닌 대상은 추정 불가
+
+    @contextmanager
+    def deadline(self, conn: sqlite3.Connection, timeout_seconds: Optional[float] = None):
+        """실행 시간 제한 - 초과 시 SQLite 실행을 중단하고 QueryTimeoutError 발생"""
+        limit = self.timeout_seconds if timeout_seconds is None else timeout_seconds
+        if not limit or limit <= 0:
+            yield
+            return
+        expires_at = time.monotonic() + limit
+        conn.set_progress_handler(lambda: 1 if time.monotonic() > expires_at else 0, _PROGRESS_STEPS)
+        try:
+            yield
+        except sqlite3.OperationalError as e:
+            if "interrupted" in str(e) and time.monotonic() > expires_at:
+                raise QueryTimeoutError(f"쿼리 실행 시간이 {limit}초를 초과하여 중단되었습니다.") from e
+            raise
+        finally:
+            # 풀에서 재사용되는 연결이므로 반드시 해제
+            conn.set_progress_handler(None, 0)
+
+    def fetch(self, conn: sqlite3.Connection, query: str, max_rows: Optional[int] = None,
+              max_bytes: Optional[int] = None) -> Tuple[List[str], List[tuple], Optional[str]]:
+        """행 수/바이트 상한까지만 결과를 읽음 - (컬럼 목록, 행 목록, 잘린 사유 또는 None) 반환"""
+        row_limit = self.max_rows if max_rows is None else max_rows
+        byte_limit = self.max_bytes if max_bytes is None else max_bytes
+
+        cursor = conn.execute(query)
+        try:
+            columns = [desc[0] for desc in cursor.description or []]
+            rows: List[tuple] = []
+            total_bytes = 0
+            while True:
+                batch = cursor.fetchmany(_FETCH_BATCH_SIZE)
+                if not batch:
+                    return columns, rows, None
+                for row in batch:
+                    if row_limit is not None and len(rows) >= row_limit:
+                        return columns, rows, "rows"
+                    total_bytes += _row_nbytes(row)
+                    if byte_limit is not None and total_bytes > byte_limit:
+                        return columns, rows, "bytes"
+                    rows.append(row)
+        finally:
+            cursor.close()
+
+    def run(self, conn: sqlite3.Connection, query: str, max_rows: Optional[int] = None,
+            max_bytes: Optional[int] = None) -> Dict[str, Any]:
+        """계획 검사 → 시간 제한 하에 실행 → 상한까지 읽기를 한 번에 수행"""
+        with self.deadline(conn):
+            warnings = self.check_plan(conn, query)
+            columns, rows, truncated_reason = self.fetch(conn, query, max_rows, max_bytes)
+        return {
+            "columns": columns,
+            "rows": rows,
+            "truncated": truncated_reason is not None,
+            "truncated_reason": truncated_reason,
+            "warnings": warnings,
+        }
+
+
+def _row_nbytes(row: tuple) -> int:
+    """결과 행의 대략적인 크기(바이트)"""
+    size = 0
+    for value in row:
+        if isinstance(value, (str, bytes)):
+            size += len(value)
+        else:
+            size += 8
+    return size
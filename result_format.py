@@ -0,0 +1,79 @@
+"""
+Columnar wire format for SQL results: column names + per-column value arrays (instead of one dict per row),
+capped at RESULT_PAGE_ROWS rows per response with an opaque handle for fetching the remaining pages
+"""
+import hashlib
+import os
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+from pandas.api.types import is_bool_dtype, is_float_dtype, is_integer_dtype
+
+RESULT_PAGE_ROWS = int(os.getenv("RESULT_PAGE_ROWS", "1000"))                  # 응답/페이지당 최대 행 수
+RESULT_HANDLE_MAXSIZE = int(os.getenv("RESULT_HANDLE_MAXSIZE", "1024"))         # 페이지 조회용 결과 핸들 보관 수
+RESULT_HANDLE_TTL_SECONDS = float(os.getenv("RESULT_HANDLE_TTL_SECONDS", "3600"))
+
+
+def column_type(series: pd.Series) -> str:
+    """컬럼 값 형식 (int | float | bool | str)"""
+    if is_bool_dtype(series):
+        return "bool"
+    if is_integer_dtype(series):
+        return "int"
+    if is_float_dtype(series):
+        return "float"
+    return "str"
+
+
+def _column_values(series: pd.Series) -> List[Any]:
+    """컬럼 값 배열 (NaN/inf → None, numpy 스칼라 → 파이썬 기본형)"""
+    if is_integer_dtype(series) or is_bool_dtype(series):
+        return series.tolist()
+    if is_float_dtype(series):
+        values = series.to_numpy()
+        finite = np.isfinite(values)
+        return values.tolist() if finite.all() else np.where(finite, values, None).tolist()
+    return series.astype(object).where(series.notna(), None).tolist()
+
+
+def result_id(sql: str) -> str:
+    """페이지 조회 핸들 (같은 SQL이면 같은 핸들)"""
+    return hashlib.sha256(sql.encode("utf-8")).hexdigest()[:16]
+
+
+def encode_result(df: pd.DataFrame, offset: int = 0, limit: int = RESULT_PAGE_ROWS) -> Dict[str, Any]:
+    """DataFrame의 [offset, offset + limit) 구간을 컬럼 단위로 인코딩
+
+    {"columns": [...], "types": [...], "values": [[컬럼별 값], ...], "row_count": 전체 행 수, "offset": offset,
+     "next_offset": 다음 페이지 시작 위치 (마지막 페이지면 없음)}
+    """
+    page = df.iloc[offset:offset + limit]
+    encoded = {
+        "columns": df.columns.tolist(),
+        "types": [column_type(df[name]) for name in df.columns],
+        "values": [_column_values(page[name]) for name in page.columns],
+        "row_count": len(df),
+        "offset": offset,
+    }
+    if offset + limit < len(df):
+        encoded["next_offset"] = offset + limit
+    return encoded
+
+
+def page_rows(result: Dict[str, Any]) -> int:
+    """이 응답(페이지)에 담긴 행 수"""
+    values = result.get("values") or []
+    return len(values[0]) if values else 0
+
+
+def column_values(result: Dict[str, Any], name: str) -> List[Any]:
+    columns = result.get("columns") or []
+    return result["values"][columns.index(name)] if name in columns and result.get("values") else []
+
+
+def decode_rows(result: Dict[str, Any], limit: Optional[int] = None) -> List[Dict[str, Any]]:
+    """행 단위 dict 목록으로 변환 (프롬프트에 넣는 작은 샘플용)"""
+    columns = result.get("columns") or []
+    values = [column[:limit] for column in result.get("values") or []]
+    return [dict(zip(columns, row)) for row in zip(*values)]
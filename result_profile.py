@@ -0,0 +1,219 @@
+"""
+SQL result profiling: a compact vectorized profile of the whole result (totals, min/max,
+period-over-period changes, top contributors, outliers) for the summary prompt
+"""
+import os
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+from pandas.api.types import is_bool_dtype, is_integer_dtype, is_numeric_dtype
+
+from chart_recommender import is_rate_name, is_time_name
+
+RESULT_PROFILE_TOP_K = int(os.getenv("RESULT_PROFILE_TOP_K", "3"))              # 상위/하위/변화량 목록 길이
+RESULT_PROFILE_INLINE_ROWS = int(os.getenv("RESULT_PROFILE_INLINE_ROWS", "10"))  # 이 행 수 이하면 원본 행도 요약 프롬프트에 포함
+
+OUTLIER_MIN_ROWS = 5      # 이상치 판단에 필요한 최소 행 수
+OUTLIER_THRESHOLD = 3.5   # 수정 z-score(중앙값/MAD 기준) 기준값
+
+
+def is_empty_or_zero(df: pd.DataFrame) -> bool:
+    """결과 없음 또는 숫자 컬럼이 모두 0/NULL"""
+    if df.empty:
+        return True
+    numeric = df.select_dtypes("number")
+    return not numeric.empty and bool((numeric.fillna(0) == 0).all().all())
+
+
+def _round(value: Any) -> Any:
+    if value is None or (isinstance(value, float) and not np.isfinite(value)):
+        return None
+    if isinstance(value, (np.integer, int)) and not isinstance(value, bool):
+        return int(value)
+    if isinstance(value, (np.floating, float)):
+        return round(float(value), 2 if abs(value) >= 1 else 4)
+    return value
+
+
+class _Columns:
+    """프로파일 계산용 numpy 배열 (작은 결과에서는 pandas 연산마다의 고정 비용이 계산보다 큼)"""
+
+    def __init__(self, df: pd.DataFrame, dimensions: List[str], measures: List[str]):
+        self.dimensions = dimensions
+        self.values = {name: df[name].to_numpy() for name in dimensions}
+        self.values.update({name: df[name].to_numpy(dtype=float, na_value=np.nan) for name in measures})
+        self.integer = {name for name in measures if is_integer_dtype(df[name])}
+
+    def rows(self, index: np.ndarray, names: List[str], **extra: np.ndarray) -> List[Dict[str, Any]]:
+        """선택한 행의 차원 값 + 지정 컬럼 (index 길이만큼, top-k 수준의 작은 목록에만 사용)"""
+        columns = {name: self.values[name][index] for name in self.dimensions + names}
+        columns.update(extra)
+        return [
+            {name: self.scalar(name, values[i]) for name, values in columns.items()}
+            for i in range(len(index))
+        ]
+
+    def scalar(self, name: str, value: Any) -> Any:
+        if name in self.integer and value == value:
+            return int(value)
+        return _round(value.item() if isinstance(value, np.generic) else value)
+
+
+def column_roles(df: pd.DataFrame) -> Dict[str, List[str]]:
+    """컬럼 역할 (time: 기간 컬럼, category: 범주, measure: 숫자 측정값)"""
+    roles: Dict[str, List[str]] = {"time": [], "category": [], "measure": []}
+    for name in df.columns:
+        if is_time_name(name):
+            roles["time"].append(name)
+        elif is_numeric_dtype(df[name]) and not is_bool_dtype(df[name]):
+            roles["measure"].append(name)
+        else:
+            roles["category"].append(name)
+    return roles
+
+
+def profile_dataframe(df: pd.DataFrame, top_k: int = RESULT_PROFILE_TOP_K) -> Dict[str, Any]:
+    """결과 전체에 대한 요약 통계 (numpy 벡터 연산, 행 단위 반복 없음)
+
+    - measures: 측정값별 합계(비율 컬럼 제외)/최소/최대/평균과 최소·최대 행의 차원 값
+    - highest/lowest: 주 측정값(비율 컬럼 우선) 상위·하위 행
+    - period_changes: 기간 컬럼이 있으면 시리즈별 마지막 기간의 직전 기간 대비 변화, largest_changes: 변화량이 큰 구간
+    - contributors: 범주별 수량 합계 상위 항목과 비중(%)
+    - outliers: 주 측정값의 수정 z-score가 기준 이상인 행
+    """
+    roles = column_roles(df)
+    dimensions = roles["time"] + roles["category"]
+    measures = roles["measure"]
+    profile: Dict[str, Any] = {
+        "rows": len(df),
+        "dimensions": {name: int(df[name].nunique()) for name in dimensions},
+        "measures": {},
+    }
+    if df.empty or not measures:
+        return profile
+
+    columns = _Columns(df, dimensions, measures)
+    for name in measures:
+        values = columns.values[name]
+        present = ~np.isnan(values)
+        if not present.any():
+            profile["measures"][name] = {}
+            continue
+        summary = {"min": columns.scalar(name, np.nanmin(values)), "max": columns.scalar(name, np.nanmax(values)),
+                   "mean": _round(float(np.nanmean(values)))}
+        if not is_rate_name(name):
+            summary["total"] = columns.scalar(name, np.nansum(values))
+        if dimensions:
+            extremes = np.array([np.nanargmin(values), np.nanargmax(values)])
+            summary["min_at"], summary["max_at"] = columns.rows(extremes, [])
+        profile["measures"][name] = summary
+
+    primary = next((name for name in measures if is_rate_name(name)), measures[0])
+    profile["primary_measure"] = primary
+    values = columns.values[primary]
+    present = np.flatnonzero(~np.isnan(values))
+    if dimensions and len(present) > 1:
+        order = present[np.argsort(values[present], kind="stable")]
+        profile["highest"] = columns.rows(order[::-1][:top_k], [primary])
+        profile["lowest"] = columns.rows(order[:top_k], [primary])
+
+    profile.update(_period_changes(columns, roles, primary, top_k))
+    contributors = _contributors(columns, roles, top_k)
+    if contributors:
+        profile["contributors"] = contributors
+    outliers = _outliers(columns, primary, top_k)
+    if outliers:
+        profile["outliers"] = outliers
+    return profile
+
+
+def prompt_profile(profile: Dict[str, Any], with_rows: bool) -> Dict[str, Any]:
+    """요약 프롬프트용 프로파일 (원본 행을 함께 보내면 행에서 바로 보이는 순위/최소·최대 위치는 제외)"""
+    if not with_rows:
+        return profile
+    compact = {key: value for key, value in profile.items() if key not in ("dimensions", "highest", "lowest")}
+    compact["measures"] = {
+        name: {key: value for key, value in summary.items() if key in ("total", "mean")}
+        for name, summary in profile.get("measures", {}).items()
+    }
+    return compact
+
+
+def _period_changes(columns: _Columns, roles: Dict[str, List[str]], measure: str, top_k: int) -> Dict[str, Any]:
+    """기간 컬럼 기준 직전 기간 대비 변화량/변화율 (시리즈 컬럼이 있으면 시리즈별)"""
+    if not roles["time"]:
+        return {}
+    time_codes, periods = pd.factorize(columns.values[roles["time"][0]], sort=True)
+    if len(periods) < 2:
+        return {}
+    if roles["category"]:
+        series_codes = pd.factorize(columns.values[roles["category"][0]])[0]
+    else:
+        series_codes = np.zeros(len(time_codes), dtype=int)
+    # (시리즈, 기간) 조합이 중복되면 다른 차원이 섞인 결과이므로 변화량을 계산하지 않음
+    keys = series_codes * len(periods) + time_codes
+    if len(np.unique(keys)) != len(keys):
+        return {}
+
+    order = np.argsort(keys, kind="stable")
+    values = columns.values[measure][order]
+    same_series = series_codes[order][1:] == series_codes[order][:-1]
+    delta = np.where(same_series, values[1:] - values[:-1], np.nan)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        delta_pct = delta / values[:-1] * 100
+    moved = np.flatnonzero(~np.isnan(delta))
+    if not len(moved):
+        return {}
+    # 시리즈의 마지막 행 (다음 행이 다른 시리즈이거나 끝)
+    last = np.append(~same_series, True)[1:]
+    latest = moved[last[moved]]
+
+    def changes(index: np.ndarray, limit: int) -> List[Dict[str, Any]]:
+        index = index[np.argsort(-np.abs(delta[index]), kind="stable")][:limit]
+        return columns.rows(order[index + 1], [measure], delta=delta[index], delta_pct=delta_pct[index])
+
+    result = {}
+    if len(latest):
+        result["period_changes"] = changes(latest, top_k * 3)
+    if len(moved) > len(latest):
+        result["largest_changes"] = changes(moved, top_k)
+    return result
+
+
+def _contributors(columns: _Columns, roles: Dict[str, List[str]], top_k: int) -> Optional[Dict[str, Any]]:
+    """첫 범주 컬럼 기준 수량(비율이 아닌 첫 측정값) 합계 상위 항목과 전체 대비 비중"""
+    quantities = [name for name in roles["measure"] if not is_rate_name(name)]
+    if not roles["category"] or not quantities:
+        return None
+    category, quantity = roles["category"][0], quantities[0]
+    codes, labels = pd.factorize(columns.values[category])
+    values = columns.values[quantity]
+    valid = (codes >= 0) & ~np.isnan(values)
+    totals = np.bincount(codes[valid], weights=values[valid], minlength=len(labels))
+    grand_total = totals.sum()
+    if len(labels) < 2 or not grand_total:
+        return None
+    top = np.argsort(-totals, kind="stable")[:top_k]
+    rows = [
+        {category: _round(label.item() if isinstance(label, np.generic) else label),
+         quantity: columns.scalar(quantity, total), "share_pct": _round(total / grand_total * 100)}
+        for label, total in zip(np.asarray(labels)[top], totals[top])
+    ]
+    return {"dimension": category, "measure": quantity, "top": rows}
+
+
+def _outliers(columns: _Columns, measure: str, top_k: int) -> List[Dict[str, Any]]:
+    """중앙값/MAD 기반 수정 z-score로 이상치 행 추출"""
+    values = columns.values[measure]
+    present = ~np.isnan(values)
+    if not columns.dimensions or present.sum() < OUTLIER_MIN_ROWS:
+        return []
+    deviation = np.abs(values - np.nanmedian(values))
+    mad = np.nanmedian(deviation)
+    if not mad:
+        return []
+    score = np.where(present, 0.6745 * deviation / mad, 0)
+    flagged = np.flatnonzero(score >= OUTLIER_THRESHOLD)
+    flagged = flagged[np.argsort(-score[flagged], kind="stable")][:top_k]
+    return columns.rows(flagged, [measure])
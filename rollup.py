@@ -0,0 +1,334 @@
+"""
+Monthly rollup tables for quality-nonconformance and claim rates, plus a rewriter that
+redirects matching aggregate SQL from the raw fact tables to the rollups
+"""
+import os
+import re
+import sqlite3
+from typing import Dict, Iterable, List, Optional
+
+from schema import DATE_COLUMNS, TABLE_COLUMNS, date_key_columns
+
+ROLLUP_REWRITE_ENABLED = os.getenv("ROLLUP_REWRITE_ENABLED", "1") == "1"
+
+# 원본 테이블별 합계 대상(측정값) 컬럼
+MEASURE_COLUMNS: Dict[str, List[str]] = {
+    "TB_SUM_MQS_QMHT200": ["QLY_INC_HPW", "TR_F_PRODQUANTITY"],
+    "TB_S95_SALS_CLAM030": ["RMA_QTY"],
+    "TB_S95_A_GALA_SALESPROD": ["SALE_QTY"],
+}
+
+# 원본 테이블별 월 단위 요약 테이블 {요약 테이블명: 분석 축(차원) 컬럼 목록}
+# 도메인 지식의 분석 축(품종그룹/제품규격/고객사/발생공장/책임공장/외관불량원인)별 단일 축 요약 + 전체 축 요약
+ROLLUP_TABLES: Dict[str, Dict[str, List[str]]] = {
+    "TB_SUM_MQS_QMHT200": {
+        "RU_QMHT200_M": [],
+        "RU_QMHT200_M_ITEM": ["ITEM_TYPE_GROUP_NAME"],
+        "RU_QMHT200_M_SPEC": ["SPECIFICATION_CD_N"],
+        "RU_QMHT200_M_USER": ["END_USER_NAME"],
+        "RU_QMHT200_M_HPN_FAC": ["QLY_INC_HPN_FAC_TP_NM"],
+        "RU_QMHT200_M_RESP_FAC": ["QLY_INC_RESP_FAC_TP_NM"],
+        "RU_QMHT200_M_CAUSE": ["EX_A_MAST_GD_CAU_NM"],
+        "RU_QMHT200_M_ALL": ["ITEM_TYPE_GROUP_NAME", "SPECIFICATION_CD_N", "END_USER_NAME", "QLY_INC_HPN_FAC_TP_NM",
+                             "QLY_INC_RESP_FAC_TP_NM", "EX_A_MAST_GD_CAU_NM"],
+    },
+    "TB_S95_SALS_CLAM030": {
+        "RU_CLAM030_M_ALL": ["ITEM_TYPE_GROUP_NAME", "END_USER_NAME"],
+    },
+    "TB_S95_A_GALA_SALESPROD": {
+        "RU_SALESPROD_M_ALL": ["ITEM_TYPE_GROUP_NAME", "END_USER_NAME"],
+    },
+}
+
+# 클레임률(RMA_QTY / SALE_QTY) 계산용 월별 결합 요약: 클레임/매출을 같은 (년월, 품종그룹, 고객사) 단위로 합산
+CLAIM_RATE_ROLLUP = "RU_CLAIM_RATE_M"
+CLAIM_RATE_DIMENSIONS = ["ITEM_TYPE_GROUP_NAME", "END_USER_NAME"]
+
+# 재작성 시 허용하는 함수 (SUM 외 집계 함수나 윈도 함수가 있으면 재작성하지 않음)
+_ALLOWED_FUNCTIONS = {"SUM", "SUBSTR", "SUBSTRING", "ROUND", "CAST", "COALESCE", "IFNULL", "NULLIF", "ABS",
+                      "IN", "AND", "OR", "NOT", "WHERE", "HAVING"}  # 괄호로 묶인 조건식
+_FORBIDDEN_KEYWORDS = re.compile(r"\b(JOIN|UNION|INTERSECT|EXCEPT|WITH|OVER|DISTINCT)\b", re.IGNORECASE)
+_LITERAL_PATTERN = re.compile(r"'(?:[^']|'')*'")
+_QUOTED_IDENT_PATTERN = re.compile(r'"(?:[^"]|"")*"')
+
+
+class RollupManager:
+    """요약 테이블 생성/갱신 및 집계 SQL 재작성
+
+    - refresh: 적재(ingest) 후 전체 또는 지정한 년월만 다시 집계
+    - rewrite: 원본 테이블에 대한 SUM 집계 SQL을 결과가 같은 가장 작은 요약 테이블 대상으로 변환
+    """
+
+    def __init__(self, enabled: bool = ROLLUP_REWRITE_ENABLED):
+        self.enabled = enabled
+        self.ready = False
+        self.rewrites = 0
+
+    # ---------- 요약 테이블 유지 ----------
+
+    def ensure(self, conn: sqlite3.Connection) -> None:
+        """요약 테이블이 하나라도 없으면 전체 재집계"""
+        existing = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+        required = [name for rollups in ROLLUP_TABLES.values() for name in rollups] + [CLAIM_RATE_ROLLUP]
+        if all(name in existing for name in required):
+            self.ready = True
+        else:
+            self.refresh(conn)
+
+    def refresh(self, conn: sqlite3.Connection, months: Optional[Dict[str, Iterable[str]]] = None) -> None:
+        """요약 테이블 재집계
+
+        - months가 None이면 모든 요약 테이블을 새로 생성
+        - months={원본 테이블명: [YYYYMM, ...]}이면 해당 년월 행만 지우고 다시 집계 (증분 적재용)
+        """
+        # 대용량 GROUP BY 정렬이 메모리에 쌓이지 않도록 집계 중에는 임시 파일 사용
+        temp_store = conn.execute("PRAGMA temp_store").fetchone()[0]
+        conn.execute("PRAGMA temp_store = FILE")
+        conn.execute("BEGIN")
+        try:
+            for table_name, rollups in ROLLUP_TABLES.items():
+                if months is not None and table_name not in months:
+                    continue
+                # 원본은 전체 축 요약으로 한 번만 집계하고, 나머지 요약은 전체 축 요약에서 다시 집계
+                ordered = sorted(rollups.items(), key=lambda item: len(item[1]), reverse=True)
+                source = table_name
+                for rollup_name, dims in ordered:
+                    self._refresh_rollup(conn, table_name, source, rollup_name, dims,
+                                         None if months is None else months[table_name])
+                    source = ordered[0][0]
+
+            claim_tables = ("TB_S95_SALS_CLAM030", "TB_S95_A_GALA_SALESPROD")
+            if months is None or any(table in months for table in claim_tables):
+                claim_months = None
+                if months is not None:
+                    claim_months = sorted({m for table in claim_tables for m in months.get(table, [])})
+                self._refresh_claim_rate(conn, claim_months)
+            conn.commit()
+            self.ready = True
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.execute(f"PRAGMA temp_store = {temp_store}")
+
+    def _refresh_rollup(self, conn: sqlite3.Connection, table_name: str, source: str, rollup_name: str,
+                        dims: List[str], months: Optional[Iterable[str]]) -> None:
+        """source(원본 테이블 또는 더 상세한 요약 테이블)에서 rollup_name을 집계"""
+        date_col = DATE_COLUMNS[table_name]
+        key_cols = list(date_key_columns(table_name))
+        measures = MEASURE_COLUMNS[table_name]
+
+        if months is None:
+            conn.execute(f"DROP TABLE IF EXISTS {rollup_name}")
+            columns = [f"{date_col} TEXT"] + [f"{col} INTEGER" for col in key_cols]
+            columns += [f"{col} TEXT" for col in dims] + [f"{col} INTEGER" for col in measures]
+            conn.execute(f"CREATE TABLE {rollup_name} ({', '.join(columns)})")
+            conn.execute(f"CREATE INDEX IX_{rollup_name}_YYYYMM ON {rollup_name} ({key_cols[2]})")
+            where = ""
+            params: List[int] = []
+        else:
+            params = [int(m) for m in months if str(m).isdigit()]
+            if not params:
+                return
+            # 정수형 년월 키(인덱스)로 해당 월만 삭제/재집계
+            placeholders = ", ".join("?" for _ in params)
+            conn.execute(f"DELETE FROM {rollup_name} WHERE {key_cols[2]} IN ({placeholders})", params)
+            where = f"WHERE {key_cols[2]} IN ({placeholders})"
+
+        select_cols = [f"SUBSTR({date_col}, 1, 6)"] + key_cols + dims + [f"SUM({col})" for col in measures]
+        group_cols = [f"SUBSTR({date_col}, 1, 6)"] + dims
+        conn.execute(
+            f"INSERT INTO {rollup_name} SELECT {', '.join(select_cols)} FROM {source} {where} "
+            f"GROUP BY {', '.join(group_cols)}",
+            params
+        )
+
+    def _refresh_claim_rate(self, conn: sqlite3.Connection, months: Optional[List[str]]) -> None:
+        dims = ", ".join(CLAIM_RATE_DIMENSIONS)
+        if months is None:
+            conn.execute(f"DROP TABLE IF EXISTS {CLAIM_RATE_ROLLUP}")
+            conn.execute(
+                f"CREATE TABLE {CLAIM_RATE_ROLLUP} (YYYYMM INTEGER, YEAR INTEGER, MONTH INTEGER, "
+                f"ITEM_TYPE_GROUP_NAME TEXT, END_USER_NAME TEXT, RMA_QTY INTEGER, SALE_QTY INTEGER)"
+            )
+            conn.execute(f"CREATE INDEX IX_{CLAIM_RATE_ROLLUP}_YYYYMM ON {CLAIM_RATE_ROLLUP} (YYYYMM)")
+            claim_where = sales_where = ""
+            params: List = []
+        else:
+            if not months:
+                return
+            int_months = [int(m) for m in months if str(m).isdigit()]
+            placeholders = ", ".join("?" for _ in int_months)
+            conn.execute(f"DELETE FROM {CLAIM_RATE_ROLLUP} WHERE YYYYMM IN ({placeholders})", int_months)
+            claim_where = f"WHERE RESOLUTION_YYYYMM IN ({placeholders})"
+            sales_where = f"WHERE SALES_YYYYMM IN ({placeholders})"
+            params = int_months + int_months
+
+        conn.execute(
+            f"""
+            INSERT INTO {CLAIM_RATE_ROLLUP}
+            SELECT YYYYMM, YEAR, MONTH, {dims}, SUM(RMA_QTY), SUM(SALE_QTY) FROM (
+                SELECT RESOLUTION_YYYYMM AS YYYYMM, RESOLUTION_YEAR AS YEAR, RESOLUTION_MONTH AS MONTH,
+                       {dims}, RMA_QTY, 0 AS SALE_QTY
+                FROM TB_S95_SALS_CLAM030 {claim_where}
+                UNION ALL
+                SELECT SALES_YYYYMM, SALES_YEAR, SALES_MONTH, {dims}, 0, SALE_QTY
+                FROM TB_S95_A_GALA_SALESPROD {sales_where}
+            )
+            GROUP BY YYYYMM, {dims}
+            """,
+            params
+        )
+
+    # ---------- SQL 재작성 ----------
+
+    def rewrite(self, query: str) -> Optional[str]:
+        """원본 테이블 대상 SUM 집계 SQL을 요약 테이블 대상으로 변환 (변환할 수 없으면 None)
+
+        다음 조건을 모두 만족할 때만 변환 (합계의 합계 = 원래 합계이므로 결과가 동일):
+        - 원본 테이블 1개만 조회 (JOIN/서브쿼리/UNION/WITH/DISTINCT/윈도 함수 없음)
+        - 집계 쿼리 (GROUP BY 또는 SUM이 있고, SUM 밖의 SELECT 항목은 모두 GROUP BY에 포함)
+          단순 조회(목록)는 요약 테이블에서 행이 합쳐지므로 항상 원본 테이블에서 실행
+        - 측정값 컬럼은 SUM(...) 안에서만 사용, SUM 이외의 집계 함수 없음
+        - 날짜 컬럼은 년/월 단위 표현(SUBSTR(날짜, 1, 4|6), SUBSTR(날짜, 5, 2), LIKE 'YYYY%'|'YYYYMM%', IS [NOT] NULL)으로만 사용
+        - 사용한 분석 축 컬럼을 모두 가진 요약 테이블이 존재
+        """
+        if not (self.enabled and self.ready):
+            return None
+
+        masked = _LITERAL_PATTERN.sub("''", query.strip().rstrip(";"))
+        if ";" in masked or not re.match(r"\s*SELECT\b", masked, re.IGNORECASE):
+            return None
+        if len(re.findall(r"\bSELECT\b", masked, re.IGNORECASE)) != 1 or _FORBIDDEN_KEYWORDS.search(masked):
+            return None
+        if re.search(r"(SELECT|,)\s*\*", masked, re.IGNORECASE):
+            return None
+
+        from_tables = re.findall(r"\bFROM\s+(\w+)", masked, re.IGNORECASE)
+        if len(from_tables) != 1 or re.search(r"\bFROM\s+\w+(\s+(AS\s+)?\w+)?\s*,", masked, re.IGNORECASE):
+            return None
+        table_name = next((t for t in ROLLUP_TABLES if t.upper() == from_tables[0].upper()), None)
+        if table_name is None:
+            return None
+
+        # 따옴표 식별자(별칭)는 원본 컬럼명이 아닌 경우에만 허용
+        source_columns = list(TABLE_COLUMNS[table_name]) + list(date_key_columns(table_name))
+        for quoted in _QUOTED_IDENT_PATTERN.findall(masked):
+            if quoted.strip('"').upper() in source_columns:
+                return None
+        masked = _QUOTED_IDENT_PATTERN.sub('""', masked)
+
+        # 허용되지 않은 함수 사용 여부
+        for func in re.findall(r"\b(\w+)\s*\(", masked):
+            if func.upper() not in _ALLOWED_FUNCTIONS:
+                return None
+
+        qualifier = r"(?:\b\w+\s*\.\s*)?"
+        # 측정값: SUM(측정값) 형태만 허용
+        for measure in MEASURE_COLUMNS[table_name]:
+            masked = re.sub(rf"\bSUM\s*\(\s*{qualifier}{measure}\s*(?:\*\s*1\.0\s*)?\)", "SUM()", masked, flags=re.IGNORECASE)
+            if re.search(rf"\b{measure}\b", masked, re.IGNORECASE):
+                return None
+        if not _is_grouped_aggregate(masked):
+            return None
+
+        # 날짜 컬럼: 년/월 단위 표현만 허용
+        date_col = DATE_COLUMNS[table_name]
+        date_patterns = [
+            rf"\bSUBSTR(?:ING)?\s*\(\s*{qualifier}{date_col}\s*,\s*(?:1\s*,\s*[46]|5\s*,\s*2)\s*\)",
+            rf"{qualifier}\b{date_col}\s+(?:NOT\s+)?LIKE\s+''",  # 리터럴은 아래에서 원문으로 검증
+            rf"{qualifier}\b{date_col}\s+IS\s+(?:NOT\s+)?NULL",
+        ]
+        for literal in re.findall(rf"\b{date_col}\s+(?:NOT\s+)?LIKE\s+('(?:[^']|'')*')", query, re.IGNORECASE):
+            if not re.fullmatch(r"'(\d{4}|\d{6})%'", literal):
+                return None
+        for pattern in date_patterns:
+            masked = re.sub(pattern, "", masked, flags=re.IGNORECASE)
+        if re.search(rf"\b{date_col}\b", masked, re.IGNORECASE):
+            return None
+
+        # 사용한 분석 축을 모두 포함하는 가장 작은 요약 테이블 선택
+        used_dims = {
+            col for col in TABLE_COLUMNS[table_name]
+            if col not in MEASURE_COLUMNS[table_name] and col != date_col
+            and re.search(rf"\b{col}\b", masked, re.IGNORECASE)
+        }
+        candidates = [
+            (len(dims), rollup_name) for rollup_name, dims in ROLLUP_TABLES[table_name].items()
+            if used_dims.issubset(dims)
+        ]
+        if not candidates:
+            return None
+        rollup_name = min(candidates)[1]
+
+        # 리터럴 밖의 테이블명만 요약 테이블명으로 교체
+        rewritten = _replace_outside_literals(query, table_name, rollup_name)
+        self.rewrites += 1
+        return rewritten
+
+
+def _split_top_level(text: str) -> List[str]:
+    """괄호 밖의 쉼표 기준으로 분리"""
+    items, depth, current = [], 0, []
+    for char in text:
+        if char == "," and depth == 0:
+            items.append("".join(current))
+            current = []
+            continue
+        depth += (char == "(") - (char == ")")
+        current.append(char)
+    items.append("".join(current))
+    return [item.strip() for item in items if item.strip()]
+
+
+def _normalize_expression(expression: str) -> str:
+    expression = re.sub(r"\b\w+\s*\.\s*(?=\w)", "", expression)  # 테이블 한정자 제거
+    return re.sub(r"\s+", " ", expression).strip().upper()
+
+
+def _is_grouped_aggregate(masked: str) -> bool:
+    """측정값을 SUM()으로 치환한 SQL이 집계 쿼리인지 (GROUP BY 또는 SUM이 있고, SUM 밖의 SELECT 항목은 모두 GROUP BY에 포함)
+
+    GROUP BY 항목은 표현식, SELECT 별칭, 위치 번호(GROUP BY 1)를 모두 인정
+    """
+    select = re.match(r"\s*SELECT\s+(.*?)\s+FROM\b", masked, re.IGNORECASE | re.DOTALL)
+    if not select:
+        return False
+    group = re.search(r"\bGROUP\s+BY\s+(.*?)(?=\bHAVING\b|\bORDER\s+BY\b|\bLIMIT\b|$)",
+                      masked, re.IGNORECASE | re.DOTALL)
+    items = _split_top_level(select.group(1))
+    if not group and not any("SUM(" in item.upper().replace(" ", "") for item in items):
+        return False
+
+    expressions, aliases = [], []
+    for item in items:
+        alias = re.search(r"\s+(?:AS\s+)?(\w+|\"\")\s*$", item, re.IGNORECASE)
+        # 마지막 토큰이 식의 일부(예: "a + b")인 경우는 별칭이 아님
+        if alias and not re.search(r"[-+*/%|=<>]\s*$", item[:alias.start()]):
+            expressions.append(_normalize_expression(item[:alias.start()]))
+            aliases.append(alias.group(1).upper())
+        else:
+            expressions.append(_normalize_expression(item))
+            aliases.append(None)
+
+    grouped = set()
+    for key in (_split_top_level(group.group(1)) if group else []):
+        key = _normalize_expression(key)
+        if key.isdigit() and 1 <= int(key) <= len(items):
+            grouped.add(int(key) - 1)
+        grouped.update(i for i, (expression, alias) in enumerate(zip(expressions, aliases))
+                       if key in (expression, alias))
+    for i, expression in enumerate(expressions):
+        if "SUM(" in expression.replace(" ", "") or i in grouped:
+            continue
+        # 상수(숫자/문자열 리터럴)는 그룹 키가 아니어도 됨
+        if not re.fullmatch(r"[\d.\s']*|NULL", expression):
+            return False
+    return True
+
+
+def _replace_outside_literals(query: str, old: str, new: str) -> str:
+    parts = re.split(r"('(?:[^']|'')*')", query)
+    for i in range(0, len(parts), 2):
+        parts[i] = re.sub(rf"\b{old}\b", new, parts[i], flags=re.IGNORECASE)
+    return "".join(parts)
@@ -0,0 +1,153 @@
+"""
+Table schemas, typed date key columns and secondary indexes for the three fact tables
+"""
+import sqlite3
+from typing import Dict, List, Optional
+
+from structured_logging import get_logger
+
+log = get_logger("db")
+
+# 테이블별 원본 컬럼 (CSV 컬럼과 동일, 적재 시 이 순서/타입을 사용)
+TABLE_COLUMNS: Dict[str, Dict[str, str]] = {
+    # 품질부적합통합실적
+    "TB_SUM_MQS_QMHT200": {
+        "DAY_CD": "TEXT",
+        "TR_F_PRODQUANTITY": "INTEGER",
+        "QLY_INC_HPW": "INTEGER",
+        "ITEM_TYPE_GROUP_NAME": "TEXT",
+        "EX_A_MAST_GD_CAU_NM": "TEXT",
+        "END_USER_NAME": "TEXT",
+        "QLY_INC_HPN_FAC_TP_NM": "TEXT",
+        "QLY_INC_RESP_FAC_TP_NM": "TEXT",
+        "SPECIFICATION_CD_N": "TEXT",
+    },
+    # 클레임제기보상
+    "TB_S95_SALS_CLAM030": {
+        "END_USER_NAME": "TEXT",
+        "RMA_QTY": "INTEGER",
+        "ITEM_TYPE_GROUP_NAME": "TEXT",
+        "EXPECTED_RESOLUTION_DATE": "TEXT",
+    },
+    # 매출실적분석제품
+    "TB_S95_A_GALA_SALESPROD": {
+        "END_USER_NAME": "TEXT",
+        "ITEM_TYPE_GROUP_NAME": "TEXT",
+        "SALE_QTY": "INTEGER",
+        "SALES_DATE": "TEXT",
+    },
+}
+
+# 테이블별 날짜 컬럼(YYYYMMDD 문자열)과 여기서 파생되는 정수형 년/월/년월 컬럼 접두어
+DATE_COLUMNS: Dict[str, str] = {
+    "TB_SUM_MQS_QMHT200": "DAY_CD",
+    "TB_S95_SALS_CLAM030": "EXPECTED_RESOLUTION_DATE",
+    "TB_S95_A_GALA_SALESPROD": "SALES_DATE",
+}
+DATE_KEY_PREFIXES: Dict[str, str] = {
+    "TB_SUM_MQS_QMHT200": "DAY",
+    "TB_S95_SALS_CLAM030": "RESOLUTION",
+    "TB_S95_A_GALA_SALESPROD": "SALES",
+}
+
+# 보조 인덱스: 년월 키 + 주요 분석 축(품종/고객사/공장) 조합
+TABLE_INDEXES: Dict[str, Dict[str, List[str]]] = {
+    "TB_SUM_MQS_QMHT200": {
+        "IX_QMHT200_DAY_CD": ["DAY_CD"],
+        "IX_QMHT200_YEAR_MONTH": ["DAY_YEAR", "DAY_MONTH", "QLY_INC_HPW", "TR_F_PRODQUANTITY"],
+        "IX_QMHT200_YYYYMM_ITEM": ["DAY_YYYYMM", "ITEM_TYPE_GROUP_NAME"],
+        "IX_QMHT200_YYYYMM_USER": ["DAY_YYYYMM", "END_USER_NAME"],
+        "IX_QMHT200_YYYYMM_HPN_FAC": ["DAY_YYYYMM", "QLY_INC_HPN_FAC_TP_NM"],
+        "IX_QMHT200_YYYYMM_RESP_FAC": ["DAY_YYYYMM", "QLY_INC_RESP_FAC_TP_NM"],
+    },
+    "TB_S95_SALS_CLAM030": {
+        "IX_CLAM030_YYYYMM_ITEM": ["RESOLUTION_YYYYMM", "ITEM_TYPE_GROUP_NAME"],
+        "IX_CLAM030_YYYYMM_USER": ["RESOLUTION_YYYYMM", "END_USER_NAME"],
+    },
+    "TB_S95_A_GALA_SALESPROD": {
+        "IX_SALESPROD_YYYYMM_ITEM": ["SALES_YYYYMM", "ITEM_TYPE_GROUP_NAME"],
+        "IX_SALESPROD_YYYYMM_USER": ["SALES_YYYYMM", "END_USER_NAME"],
+    },
+}
+
+# 적재 이력: 파일 내용 해시로 같은 파일의 중복 적재 방지
+INGEST_LOG_SQL = """CREATE TABLE IF NOT EXISTS INGEST_LOG (
+    FILE_HASH TEXT PRIMARY KEY,
+    TABLE_NAME TEXT NOT NULL,
+    FILE_NAME TEXT,
+    ROW_COUNT INTEGER,
+    INGESTED_AT TEXT
+)"""
+
+
+def date_key_columns(table_name: str) -> Dict[str, str]:
+    """날짜 컬럼에서 파생되는 정수형 생성 컬럼 {컬럼명: 생성식}"""
+    date_col = DATE_COLUMNS[table_name]
+    prefix = DATE_KEY_PREFIXES[table_name]
+    return {
+        f"{prefix}_YEAR": f"CAST(SUBSTR({date_col}, 1, 4) AS INTEGER)",
+        f"{prefix}_MONTH": f"CAST(SUBSTR({date_col}, 5, 2) AS INTEGER)",
+        f"{prefix}_YYYYMM": f"CAST(SUBSTR({date_col}, 1, 6) AS INTEGER)",
+    }
+
+
+def create_table_sql(table_name: str, name: Optional[str] = None) -> str:
+    """원본 컬럼 + 저장형 생성 컬럼(년/월/년월)을 포함한 CREATE TABLE 문"""
+    lines = [f"{col} {col_type}" for col, col_type in TABLE_COLUMNS[table_name].items()]
+    lines += [f"{col} INTEGER GENERATED ALWAYS AS ({expr}) STORED" for col, expr in date_key_columns(table_name).items()]
+    body = ",\n    ".join(lines)
+    return f"CREATE TABLE IF NOT EXISTS {name or table_name} (\n    {body}\n)"
+
+
+def _existing_columns(conn: sqlite3.Connection, table_name: str) -> List[str]:
+    # table_xinfo는 생성 컬럼까지 포함하여 반환
+    return [row[1] for row in conn.execute(f"PRAGMA table_xinfo({table_name})")]
+
+
+def ensure_schema(conn: sqlite3.Connection) -> None:
+    """테이블/생성 컬럼/인덱스를 보장
+
+    - 테이블이 없으면 생성
+    - 이전 버전(생성 컬럼 없음, to_sql로 만들어진 테이블)이면 데이터를 보존한 채 새 스키마로 재구성
+    - 인덱스가 없으면 생성
+    - 적재 이력 테이블(INGEST_LOG) 생성
+    """
+    conn.execute("BEGIN")
+    try:
+        for table_name, columns in TABLE_COLUMNS.items():
+            existing = _existing_columns(conn, table_name)
+            expected = list(columns) + list(date_key_columns(table_name))
+            if not existing:
+                conn.execute(create_table_sql(table_name))
+            elif any(col not in existing for col in expected):
+                _rebuild_table(conn, table_name, existing)
+
+            for index_name, index_columns in TABLE_INDEXES[table_name].items():
+                conn.execute(f"CREATE INDEX IF NOT EXISTS {index_name} ON {table_name} ({', '.join(index_columns)})")
+        conn.execute(INGEST_LOG_SQL)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    # 필요한 경우에만 인덱스 통계 갱신 (쿼리 플래너가 인덱스를 올바르게 선택하도록)
+    conn.execute("PRAGMA optimize")
+
+
+def _rebuild_table(conn: sqlite3.Connection, table_name: str, existing: List[str]) -> None:
+    """기존 데이터를 보존하면서 테이블을 새 스키마로 재구성 (날짜 컬럼은 TEXT로 변환)"""
+    log.info("db.schema_migrating", table=table_name)
+    new_name = f"{table_name}__new"
+    conn.execute(f"DROP TABLE IF EXISTS {new_name}")
+    conn.execute(create_table_sql(table_name, name=new_name))
+
+    copy_columns = [col for col in TABLE_COLUMNS[table_name] if col in existing]
+    select_exprs = [
+        f"CAST({col} AS TEXT)" if TABLE_COLUMNS[table_name][col] == "TEXT" else col
+        for col in copy_columns
+    ]
+    conn.execute(
+        f"INSERT INTO {new_name} ({', '.join(copy_columns)}) "
+        f"SELECT {', '.join(select_exprs)} FROM {table_name}"
+    )
+    conn.execute(f"DROP TABLE {table_name}")
+    conn.execute(f"ALTER TABLE {new_name} RENAME TO {table_name}")
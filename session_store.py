@@ -0,0 +1,392 @@
+"""
+Pluggable chat session store: bounded in-memory backend (LRU / idle TTL / byte budget) and a persistent SQLite backend
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from models import ChatSession
+from shared_state import SHARED_STATE_ENABLED, SHARED_STATE_PATH
+
+# 세션 저장소 설정 (환경변수로 조정 가능)
+# memory | sqlite (멀티 워커에서는 워커 간에 세션이 공유되도록 sqlite가 기본값)
+SESSION_BACKEND = os.getenv("SESSION_BACKEND", "sqlite" if SHARED_STATE_ENABLED else "memory")
+SESSION_MAX_COUNT = int(os.getenv("SESSION_MAX_COUNT", "1000"))                          # 메모리 보관 최대 세션 수
+SESSION_IDLE_TTL_SECONDS = float(os.getenv("SESSION_IDLE_TTL_SECONDS", str(24 * 3600)))  # 미사용 세션 만료 시간
+SESSION_MAX_BYTES = int(os.getenv("SESSION_MAX_BYTES", str(64 * 1024 * 1024)))           # 메모리 세션 전체 크기 상한
+SESSION_DB_PATH = os.getenv("SESSION_DB_PATH", SHARED_STATE_PATH)
+SESSION_HISTORY_WINDOW = int(os.getenv("SESSION_HISTORY_WINDOW", "50"))                  # 채팅 처리 시 불러오는 최근 메시지 수
+
+_TITLE_LENGTH = 30
+
+
+# 대화 기록에 저장하지 않는 SQL 결과 필드 (행 값, 차트용 축소 데이터, 요약 프롬프트용 프로파일; data는 이전 행 단위 형식)
+_RESULT_FIELDS_NOT_STORED = ("values", "chart_data", "data", "profile")
+
+
+def compact_metadata(metadata: Dict[str, Any]) -> Dict[str, Any]:
+    """대화 기록 저장용 메타데이터 - SQL 결과 행/프로파일은 버리고 행 수만 남김 (페이지 조회 핸들 result_id는 유지)"""
+    if not metadata or "sql_results" not in metadata:
+        return metadata or {}
+    compact = dict(metadata)
+    compact["sql_results"] = [
+        {**{k: v for k, v in result.items() if k not in _RESULT_FIELDS_NOT_STORED},
+         "row_count": result.get("row_count", len(result.get("data") or []))}
+        for result in metadata["sql_results"]
+    ]
+    return compact
+
+
+def session_title(content: str) -> str:
+    """첫 user 메시지 요약(30자 이내, 줄바꿈 제거)"""
+    summary = content.replace("\n", " ").strip()
+    return summary[:_TITLE_LENGTH] + "..." if len(summary) > _TITLE_LENGTH else summary
+
+
+def _message_nbytes(message: Dict[str, Any]) -> int:
+    return len(json.dumps(message, ensure_ascii=False, default=str).encode("utf-8"))
+
+
+class SessionStore(ABC):
+    """세션 저장소 인터페이스
+
+    - 대화 기록은 append_message로만 추가하며, 저장 시 SQL 결과 행은 제거(compact_metadata)
+    - list_sessions는 대화 기록 전체를 읽지 않고 제목/메시지 수만 반환
+    - get(history_limit=N)은 최근 N개 메시지만 불러옴 (None이면 전체)
+    - set_state는 반문 대기 중인 후보 의도(pending_intent)도 함께 저장 (반문이 아니면 None으로 비움)
+    """
+
+    @abstractmethod
+    def create(self) -> ChatSession:
+        ...
+
+    @abstractmethod
+    def get(self, session_id: str, history_limit: Optional[int] = None) -> Optional[ChatSession]:
+        ...
+
+    @abstractmethod
+    def exists(self, session_id: str) -> bool:
+        ...
+
+    @abstractmethod
+    def list_sessions(self) -> List[Dict[str, Any]]:
+        ...
+
+    @abstractmethod
+    def append_message(self, session_id: str, message: Dict[str, Any]) -> None:
+        ...
+
+    @abstractmethod
+    def set_state(self, session_id: str, current_state: str, pending_intent: Optional[List[str]] = None) -> None:
+        ...
+
+    @abstractmethod
+    def reset(self, session_id: str) -> bool:
+        ...
+
+    @abstractmethod
+    def delete(self, session_id: str) -> bool:
+        ...
+
+    @abstractmethod
+    def __len__(self) -> int:
+        ...
+
+    def stats(self) -> Dict[str, Any]:
+        return {"backend": type(self).__name__, "sessions": len(self)}
+
+    def close(self) -> None:
+        pass
+
+    @staticmethod
+    def _store_message(message: Dict[str, Any]) -> Dict[str, Any]:
+        if "metadata" not in message:
+            return dict(message)
+        return {**message, "metadata": compact_metadata(message["metadata"])}
+
+
+class MemorySessionStore(SessionStore):
+    """프로세스 메모리 세션 저장소
+
+    - max_sessions: 최대 세션 수 (초과 시 가장 오래 사용되지 않은 세션부터 제거)
+    - idle_ttl: 마지막 사용 후 이 시간(초)이 지난 세션 제거 (None이면 만료 없음)
+    - max_bytes: 전체 대화 기록 크기 상한 (방금 사용한 세션은 제거하지 않음)
+    """
+
+    def __init__(self, max_sessions: int = SESSION_MAX_COUNT, idle_ttl: Optional[float] = SESSION_IDLE_TTL_SECONDS,
+                 max_bytes: Optional[int] = SESSION_MAX_BYTES):
+        self.max_sessions = max_sessions
+        self.idle_ttl = idle_ttl
+        self.max_bytes = max_bytes
+        # {session_id: [ChatSession, 마지막 사용 시각, 크기(바이트)]}
+        self._sessions: "OrderedDict[str, list]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.current_bytes = 0
+        self.evictions = 0
+
+    def _touch(self, session_id: str) -> Optional[list]:
+        entry = self._sessions.get(session_id)
+        if entry is None:
+            return None
+        entry[1] = time.monotonic()
+        self._sessions.move_to_end(session_id)
+        return entry
+
+    def _evict(self, keep: Optional[str] = None) -> None:
+        if self.idle_ttl is not None:
+            cutoff = time.monotonic() - self.idle_ttl
+            for session_id in [sid for sid, entry in self._sessions.items() if entry[1] < cutoff and sid != keep]:
+                self._remove(session_id)
+                self.evictions += 1
+        while len(self._sessions) > 1 and (
+            len(self._sessions) > self.max_sessions
+            or (self.max_bytes is not None and self.current_bytes > self.max_bytes)
+        ):
+            oldest = next(iter(self._sessions))
+            if oldest == keep:
+                self._sessions.move_to_end(oldest)
+                oldest = next(iter(self._sessions))
+            self._remove(oldest)
+            self.evictions += 1
+
+    def _remove(self, session_id: str) -> None:
+        entry = self._sessions.pop(session_id)
+        self.current_bytes -= entry[2]
+
+    def create(self) -> ChatSession:
+        session = ChatSession(session_id=str(uuid.uuid4()), chat_history=[], current_state="idle",
+                              created_at=datetime.now())
+        with self._lock:
+            self._sessions[session.session_id] = [session, time.monotonic(), 0]
+            self._evict(keep=session.session_id)
+        return session
+
+    def get(self, session_id: str, history_limit: Optional[int] = None) -> Optional[ChatSession]:
+        with self._lock:
+            self._evict()
+            entry = self._touch(session_id)
+            if entry is None:
+                return None
+            session = entry[0]
+            history = session.chat_history if history_limit is None else session.chat_history[-history_limit:]
+            return session.model_copy(update={"chat_history": list(history)})
+
+    def exists(self, session_id: str) -> bool:
+        with self._lock:
+            self._evict()
+            return session_id in self._sessions
+
+    def list_sessions(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            self._evict()
+            sessions = [entry[0] for entry in self._sessions.values()]
+        return [
+            {
+                "session_id": session.session_id,
+                "title": session_title(next(
+                    (msg["content"] for msg in session.chat_history if msg["role"] == "user"), "새 대화"
+                )),
+                "created_at": session.created_at.isoformat(),
+                "message_count": len(session.chat_history),
+            }
+            for session in sessions
+        ]
+
+    def append_message(self, session_id: str, message: Dict[str, Any]) -> None:
+        stored = self._store_message(message)
+        with self._lock:
+            entry = self._touch(session_id)
+            if entry is None:
+                return
+            entry[0].chat_history.append(stored)
+            size = _message_nbytes(stored)
+            entry[2] += size
+            self.current_bytes += size
+            self._evict(keep=session_id)
+
+    def set_state(self, session_id: str, current_state: str, pending_intent: Optional[List[str]] = None) -> None:
+        with self._lock:
+            entry = self._touch(session_id)
+            if entry is not None:
+                entry[0].current_state = current_state
+                entry[0].pending_intent = pending_intent
+
+    def reset(self, session_id: str) -> bool:
+        with self._lock:
+            entry = self._touch(session_id)
+            if entry is None:
+                return False
+            entry[0].chat_history = []
+            entry[0].current_state = "idle"
+            entry[0].pending_intent = None
+            self.current_bytes -= entry[2]
+            entry[2] = 0
+            return True
+
+    def delete(self, session_id: str) -> bool:
+        with self._lock:
+            if session_id not in self._sessions:
+                return False
+            self._remove(session_id)
+            return True
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            **super().stats(),
+            "max_sessions": self.max_sessions,
+            "bytes": self.current_bytes,
+            "max_bytes": self.max_bytes,
+            "evictions": self.evictions,
+        }
+
+
+class SQLiteSessionStore(SessionStore):
+    """SQLite 파일에 세션을 영속화하는 저장소 (재시작 후에도 유지)
+
+    - SESSIONS: 세션 정보와 제목/메시지 수 (목록 조회는 이 테이블만 읽음)
+    - SESSION_MESSAGES: 메시지 단위 기록, 필요할 때만 최근 N개를 불러옴
+    """
+
+    def __init__(self, db_path: str = SESSION_DB_PATH):
+        self.db_path = db_path
+        # 여러 워커가 같은 파일을 쓰므로 잠금 대기 시간을 넉넉히 둠
+        self._conn = sqlite3.connect(db_path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode = WAL")
+        self._conn.execute("PRAGMA synchronous = NORMAL")
+        self._conn.execute("PRAGMA foreign_keys = ON")
+        self._lock = threading.Lock()
+        with self._lock, self._conn:
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS SESSIONS (
+                    SESSION_ID TEXT PRIMARY KEY,
+                    CURRENT_STATE TEXT NOT NULL DEFAULT 'idle',
+                    PENDING_INTENT TEXT,
+                    TITLE TEXT,
+                    MESSAGE_COUNT INTEGER NOT NULL DEFAULT 0,
+                    CREATED_AT TEXT NOT NULL
+                )""")
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS SESSION_MESSAGES (
+                    SESSION_ID TEXT NOT NULL REFERENCES SESSIONS (SESSION_ID) ON DELETE CASCADE,
+                    SEQ INTEGER NOT NULL,
+                    MESSAGE TEXT NOT NULL,
+                    PRIMARY KEY (SESSION_ID, SEQ)
+                ) WITHOUT ROWID""")
+
+    def create(self) -> ChatSession:
+        session = ChatSession(session_id=str(uuid.uuid4()), chat_history=[], current_state="idle",
+                              created_at=datetime.now())
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT INTO SESSIONS (SESSION_ID, CURRENT_STATE, CREATED_AT) VALUES (?, ?, ?)",
+                (session.session_id, session.current_state, session.created_at.isoformat())
+            )
+        return session
+
+    def get(self, session_id: str, history_limit: Optional[int] = None) -> Optional[ChatSession]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT CURRENT_STATE, PENDING_INTENT, CREATED_AT FROM SESSIONS WHERE SESSION_ID = ?", (session_id,)
+            ).fetchone()
+            if row is None:
+                return None
+            if history_limit is None:
+                messages = self._conn.execute(
+                    "SELECT MESSAGE FROM SESSION_MESSAGES WHERE SESSION_ID = ? ORDER BY SEQ", (session_id,)
+                ).fetchall()
+            else:
+                # 최근 N개만 역순으로 읽은 뒤 시간순으로 되돌림
+                messages = self._conn.execute(
+                    "SELECT MESSAGE FROM SESSION_MESSAGES WHERE SESSION_ID = ? ORDER BY SEQ DESC LIMIT ?",
+                    (session_id, history_limit)
+                ).fetchall()[::-1]
+        return ChatSession(
+            session_id=session_id,
+            chat_history=[json.loads(message[0]) for message in messages],
+            current_state=row[0],
+            pending_intent=json.loads(row[1]) if row[1] else None,
+            created_at=datetime.fromisoformat(row[2]),
+        )
+
+    def exists(self, session_id: str) -> bool:
+        with self._lock:
+            return self._conn.execute("SELECT 1 FROM SESSIONS WHERE SESSION_ID = ?", (session_id,)).fetchone() is not None
+
+    def list_sessions(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            rows = self._conn.execute("SELECT SESSION_ID, TITLE, CREATED_AT, MESSAGE_COUNT FROM SESSIONS").fetchall()
+        return [
+            {"session_id": row[0], "title": row[1] or "새 대화", "created_at": row[2], "message_count": row[3]}
+            for row in rows
+        ]
+
+    def append_message(self, session_id: str, message: Dict[str, Any]) -> None:
+        stored = json.dumps(self._store_message(message), ensure_ascii=False, default=str)
+        title = session_title(message["content"]) if message.get("role") == "user" else None
+        with self._lock:
+            # 다른 워커와 같은 순번(SEQ)을 쓰지 않도록 쓰기 잠금을 먼저 잡고 메시지 수를 읽음
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute("SELECT MESSAGE_COUNT FROM SESSIONS WHERE SESSION_ID = ?", (session_id,)).fetchone()
+                if row is not None:
+                    self._conn.execute(
+                        "INSERT INTO SESSION_MESSAGES (SESSION_ID, SEQ, MESSAGE) VALUES (?, ?, ?)", (session_id, row[0], stored)
+                    )
+                    self._conn.execute(
+                        "UPDATE SESSIONS SET MESSAGE_COUNT = MESSAGE_COUNT + 1, TITLE = COALESCE(TITLE, ?) WHERE SESSION_ID = ?",
+                        (title, session_id)
+                    )
+                self._conn.commit()
+            except Exception:
+                self._conn.rollback()
+                raise
+
+    def set_state(self, session_id: str, current_state: str, pending_intent: Optional[List[str]] = None) -> None:
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE SESSIONS SET CURRENT_STATE = ?, PENDING_INTENT = ? WHERE SESSION_ID = ?",
+                (current_state, json.dumps(pending_intent, ensure_ascii=False) if pending_intent else None, session_id)
+            )
+
+    def reset(self, session_id: str) -> bool:
+        with self._lock, self._conn:
+            updated = self._conn.execute(
+                "UPDATE SESSIONS SET CURRENT_STATE = 'idle', PENDING_INTENT = NULL, TITLE = NULL, MESSAGE_COUNT = 0 WHERE SESSION_ID = ?",
+                (session_id,)
+            ).rowcount
+            self._conn.execute("DELETE FROM SESSION_MESSAGES WHERE SESSION_ID = ?", (session_id,))
+        return updated > 0
+
+    def delete(self, session_id: str) -> bool:
+        with self._lock, self._conn:
+            return self._conn.execute("DELETE FROM SESSIONS WHERE SESSION_ID = ?", (session_id,)).rowcount > 0
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM SESSIONS").fetchone()[0]
+
+    def stats(self) -> Dict[str, Any]:
+        return {**super().stats(), "db_path": self.db_path}
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+def create_session_store(backend: str = SESSION_BACKEND) -> SessionStore:
+    """SESSION_BACKEND 설정에 맞는 세션 저장소 생성"""
+    if backend == "memory":
+        return MemorySessionStore()
+    if backend == "sqlite":
+        return SQLiteSessionStore()
+    raise ValueError(f"Unknown SESSION_BACKEND: {backend} (memory 또는 sqlite)")
@@ -0,0 +1,284 @@
+"""
+Cross-worker shared state on a local SQLite WAL file: key/value cache entries, counters and a startup lock
+"""
+import hashlib
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Hashable, Optional
+
+from cache import LRUCache
+
+# 멀티 워커 설정 (환경변수로 조정 가능)
+APP_WORKERS = int(os.getenv("APP_WORKERS", "1"))                                    # uvicorn 워커 프로세스 수
+SHARED_STATE_ENABLED = os.getenv("SHARED_STATE_ENABLED", "1" if APP_WORKERS > 1 else "0") == "1"
+SHARED_STATE_PATH = os.getenv("SHARED_STATE_PATH", "shared_state.db")
+SHARED_CACHE_LOCAL_MAXSIZE = int(os.getenv("SHARED_CACHE_LOCAL_MAXSIZE", "128"))    # 워커별 1차(메모리) 캐시 항목 수
+
+# set 호출 몇 번마다 공유 캐시 용량 정리를 수행할지
+_PRUNE_EVERY = 64
+# 적중한 키를 몇 개 모아서 2차 저장소의 마지막 사용 시각을 갱신할지 (적중마다 쓰지 않도록 묶어서 기록)
+_TOUCH_EVERY = 64
+
+
+class SharedState:
+    """여러 워커 프로세스가 같은 SQLite WAL 파일을 통해 공유하는 상태
+
+    - SHARED_KV: 네임스페이스별 키/값 (만료 시각, 마지막 사용 시각 포함), 캐시 백엔드로 사용
+    - SHARED_COUNTERS: 데이터 버전 등 단조 증가 카운터
+    - exclusive(): 워커 간 배타 구간 (기동 시 DB 초기화/기본 세션 생성을 한 워커만 수행)
+
+    저장 값은 pickle로 직렬화하므로 이 파일은 같은 서버의 워커끼리만 공유해야 함
+    """
+
+    def __init__(self, db_path: str = SHARED_STATE_PATH):
+        self.db_path = db_path
+        # 자동 커밋 모드: 각 문장이 곧바로 다른 워커에 보임
+        self._conn = sqlite3.connect(db_path, timeout=30, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode = WAL")
+        self._conn.execute("PRAGMA synchronous = NORMAL")
+        self._lock = threading.Lock()
+        with self._lock:
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS SHARED_KV (
+                    NAMESPACE TEXT NOT NULL,
+                    KEY TEXT NOT NULL,
+                    VALUE BLOB NOT NULL,
+                    SIZE INTEGER NOT NULL,
+                    EXPIRES_AT REAL,
+                    STORED_AT REAL NOT NULL,
+                    ACCESSED_AT REAL,
+                    PRIMARY KEY (NAMESPACE, KEY)
+                ) WITHOUT ROWID""")
+            columns = {row[1] for row in self._conn.execute("PRAGMA table_info(SHARED_KV)")}
+            if "ACCESSED_AT" not in columns:
+                # 이전 형식의 파일: 마지막 사용 시각을 저장 시각으로 채움
+                self._conn.execute("ALTER TABLE SHARED_KV ADD COLUMN ACCESSED_AT REAL")
+                self._conn.execute("UPDATE SHARED_KV SET ACCESSED_AT = STORED_AT")
+            self._conn.execute("DROP INDEX IF EXISTS IX_SHARED_KV_STORED_AT")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS IX_SHARED_KV_ACCESSED_AT ON SHARED_KV (NAMESPACE, ACCESSED_AT)")
+            self._conn.execute("CREATE TABLE IF NOT EXISTS SHARED_COUNTERS (NAME TEXT PRIMARY KEY, VALUE INTEGER NOT NULL)")
+
+    # ---------- 키/값 ----------
+
+    def get(self, namespace: str, key: str) -> Optional[bytes]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT VALUE, EXPIRES_AT FROM SHARED_KV WHERE NAMESPACE = ? AND KEY = ?", (namespace, key)
+            ).fetchone()
+        if row is None or (row[1] is not None and row[1] < time.time()):
+            return None
+        return row[0]
+
+    def set(self, namespace: str, key: str, value: bytes, ttl: Optional[float] = None) -> None:
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO SHARED_KV (NAMESPACE, KEY, VALUE, SIZE, EXPIRES_AT, STORED_AT, ACCESSED_AT) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (namespace, key, value, len(value), now + ttl if ttl is not None else None, now, now)
+            )
+
+    def touch(self, namespace: str, keys) -> None:
+        """키들의 마지막 사용 시각을 현재로 갱신 (prune은 오래 사용하지 않은 항목부터 제거)"""
+        now = time.time()
+        with self._lock:
+            self._conn.executemany(
+                "UPDATE SHARED_KV SET ACCESSED_AT = ? WHERE NAMESPACE = ? AND KEY = ?",
+                [(now, namespace, key) for key in keys]
+            )
+
+    def clear(self, namespace: str) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM SHARED_KV WHERE NAMESPACE = ?", (namespace,))
+
+    def count(self, namespace: str) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM SHARED_KV WHERE NAMESPACE = ?", (namespace,)).fetchone()[0]
+
+    def prune(self, namespace: str, max_items: Optional[int] = None, max_bytes: Optional[int] = None) -> int:
+        """만료 항목 제거 후 항목 수/전체 크기 상한을 넘으면 가장 오래 사용하지 않은 항목부터 제거 - 제거 건수 반환"""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                removed = self._conn.execute(
+                    "DELETE FROM SHARED_KV WHERE NAMESPACE = ? AND EXPIRES_AT < ?", (namespace, time.time())
+                ).rowcount
+                if max_items is not None:
+                    removed += self._conn.execute(
+                        "DELETE FROM SHARED_KV WHERE NAMESPACE = ? AND KEY IN ("
+                        "SELECT KEY FROM SHARED_KV WHERE NAMESPACE = ? ORDER BY ACCESSED_AT DESC LIMIT -1 OFFSET ?)",
+                        (namespace, namespace, max_items)
+                    ).rowcount
+                if max_bytes is not None:
+                    # 최근 사용한 항목부터 누적 크기를 더해 상한을 넘는 지점 이후(오래 사용하지 않은 항목)를 제거
+                    removed += self._conn.execute(
+                        "DELETE FROM SHARED_KV WHERE NAMESPACE = ? AND KEY IN ("
+                        "SELECT KEY FROM (SELECT KEY, SUM(SIZE) OVER (ORDER BY ACCESSED_AT DESC) AS CUMULATIVE "
+                        "FROM SHARED_KV WHERE NAMESPACE = ?) WHERE CUMULATIVE > ?)",
+                        (namespace, namespace, max_bytes)
+                    ).rowcount
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return removed
+
+    # ---------- 카운터 ----------
+
+    def counter(self, name: str) -> int:
+        with self._lock:
+            row = self._conn.execute("SELECT VALUE FROM SHARED_COUNTERS WHERE NAME = ?", (name,)).fetchone()
+        return row[0] if row else 0
+
+    def increment(self, name: str) -> int:
+        with self._lock:
+            return self._conn.execute(
+                "INSERT INTO SHARED_COUNTERS (NAME, VALUE) VALUES (?, 1) "
+                "ON CONFLICT (NAME) DO UPDATE SET VALUE = VALUE + 1 RETURNING VALUE",
+                (name,)
+            ).fetchone()[0]
+
+    # ---------- 워커 간 배타 구간 ----------
+
+    @contextmanager
+    def exclusive(self, name: str = "startup"):
+        """파일 잠금으로 워커 간 배타 실행 (fcntl을 쓸 수 없는 환경에서는 잠금 없이 실행)"""
+        try:
+            import fcntl
+        except ImportError:
+            yield
+            return
+        with open(f"{self.db_path}.{name}.lock", "w") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+_shared_state: Optional[SharedState] = None
+_shared_state_lock = threading.Lock()
+
+
+def get_shared_state() -> Optional[SharedState]:
+    """공유 상태 싱글턴 (SHARED_STATE_ENABLED가 꺼져 있으면 None)"""
+    global _shared_state
+    if not SHARED_STATE_ENABLED:
+        return None
+    with _shared_state_lock:
+        if _shared_state is None:
+            _shared_state = SharedState()
+        return _shared_state
+
+
+class SharedCache:
+    """워커 간 공유 캐시 (LRUCache와 같은 인터페이스)
+
+    - 1차: 워커별 메모리 LRUCache (직렬화 없이 바로 반환)
+    - 2차: SharedState의 SHARED_KV (다른 워커가 저장한 항목도 조회 가능)
+    - maxsize/max_bytes는 2차 저장소 기준 상한이며 주기적으로 정리 (가장 오래 사용하지 않은 항목부터 제거)
+    - 1·2차 적중 키는 모아 두었다가 _TOUCH_EVERY개마다, 그리고 정리 직전에 2차 저장소의 사용 시각으로 기록
+      (1차에서 계속 적중하는 항목이 2차에서 저장 순서대로 밀려나지 않도록)
+    """
+
+    def __init__(self, namespace: str, shared: SharedState, maxsize: int = 256, ttl: Optional[float] = None,
+                 max_bytes: Optional[int] = None, sizeof: Optional[Callable[[Any], int]] = None,
+                 local_maxsize: int = SHARED_CACHE_LOCAL_MAXSIZE):
+        self.namespace = namespace
+        self.shared = shared
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.local = LRUCache(maxsize=min(local_maxsize, maxsize), ttl=ttl, max_bytes=max_bytes, sizeof=sizeof)
+        self.hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+        self._sets = 0
+        self._touched: set = set()
+
+    @staticmethod
+    def _key(key: Hashable) -> str:
+        # 튜플/문자열 키의 repr은 프로세스가 달라도 동일
+        return hashlib.sha256(repr(key).encode("utf-8")).hexdigest()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        if self.maxsize <= 0:
+            return default
+        value = self.local.get(key)
+        if value is not None:
+            self.hits += 1
+            self._touch(self._key(key))
+            return value
+        shared_key = self._key(key)
+        data = self.shared.get(self.namespace, shared_key)
+        if data is None:
+            self.misses += 1
+            return default
+        value = pickle.loads(data)
+        self.local.set(key, value)
+        self.hits += 1
+        self.shared_hits += 1
+        self._touch(shared_key)
+        return value
+
+    def _touch(self, shared_key: str) -> None:
+        self._touched.add(shared_key)
+        if len(self._touched) >= _TOUCH_EVERY:
+            self._flush_touched()
+
+    def _flush_touched(self) -> None:
+        touched, self._touched = self._touched, set()
+        if touched:
+            self.shared.touch(self.namespace, touched)
+
+    def set(self, key: Hashable, value: Any) -> None:
+        if self.maxsize <= 0:
+            return
+        self.local.set(key, value)
+        data = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        if self.max_bytes is not None and len(data) > self.max_bytes:
+            return
+        self.shared.set(self.namespace, self._key(key), data, ttl=self.ttl)
+        self._sets += 1
+        if self._sets % _PRUNE_EVERY == 0:
+            self._flush_touched()
+            self.shared.prune(self.namespace, max_items=self.maxsize, max_bytes=self.max_bytes)
+
+    def clear(self) -> None:
+        self.local.clear()
+        self._touched.clear()
+        self.shared.clear(self.namespace)
+
+    def __len__(self) -> int:
+        return self.shared.count(self.namespace)
+
+    def stats(self) -> Dict[str, Any]:
+        """적중/실패 횟수 및 적중률 (shared_hits: 다른 워커가 저장한 항목 적중 포함 2차 저장소 적중 수)"""
+        total = self.hits + self.misses
+        return {
+            "size": len(self),
+            "maxsize": self.maxsize,
+            "local_size": len(self.local),
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "shared_hits": self.shared_hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+        }
+
+
+def create_cache(namespace: str, maxsize: int = 256, ttl: Optional[float] = None, max_bytes: Optional[int] = None,
+                 sizeof: Optional[Callable[[Any], int]] = None):
+    """공유 상태가 켜져 있으면 SharedCache, 아니면 프로세스 메모리 LRUCache"""
+    shared = get_shared_state()
+    if shared is None:
+        return LRUCache(maxsize=maxsize, ttl=ttl, max_bytes=max_bytes, sizeof=sizeof)
+    return SharedCache(namespace, shared, maxsize=maxsize, ttl=ttl, max_bytes=max_bytes, sizeof=sizeof)
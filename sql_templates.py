@@ -0,0 +1,300 @@
+"""
+Parameterized SQL templates for the canonical metric questions (quality-nonconformance rate / claim rate
+by period x analysis axis) with a rule-based slot extractor; free-form questions fall back to the LLM
+"""
+import os
+import re
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+from domain_knowledge import COLUMN_ALIASES, CUSTOMERS, DEFECT_CAUSES, ITEM_TYPES, SPECIFICATIONS
+from query_classifier import compact_text
+from rollup import CLAIM_RATE_DIMENSIONS, CLAIM_RATE_ROLLUP
+
+SQL_TEMPLATES_ENABLED = os.getenv("SQL_TEMPLATES_ENABLED", "1") == "1"  # 0이면 항상 LLM으로 SQL 생성
+
+# 지표별 원본 테이블/시간 컬럼/측정값 (claim_rate는 클레임·매출 월별 결합 요약 테이블 사용)
+TEMPLATE_METRICS: Dict[str, Dict[str, Any]] = {
+    "quality_rate": {
+        "name": "품질부적합률",
+        "table": "TB_SUM_MQS_QMHT200",
+        "year": "DAY_YEAR",
+        "yyyymm": "DAY_YYYYMM",
+        "measures": ["SUM(QLY_INC_HPW) AS 총품질부적합량", "SUM(TR_F_PRODQUANTITY) AS 총생산량"],
+        "rate": "(SUM(QLY_INC_HPW) * 1.0 / SUM(TR_F_PRODQUANTITY)) * 100",
+        "dimensions": {"ITEM_TYPE_GROUP_NAME", "SPECIFICATION_CD_N", "END_USER_NAME", "QLY_INC_HPN_FAC_TP_NM",
+                       "QLY_INC_RESP_FAC_TP_NM", "EX_A_MAST_GD_CAU_NM"},
+    },
+    "claim_rate": {
+        "name": "클레임률",
+        "table": CLAIM_RATE_ROLLUP,
+        "year": "YEAR",
+        "yyyymm": "YYYYMM",
+        "measures": ["SUM(RMA_QTY) AS 총클레임보상액", "SUM(SALE_QTY) AS 총매출액"],
+        "rate": "(SUM(RMA_QTY) * 1.0 / SUM(SALE_QTY)) * 100",
+        "dimensions": set(CLAIM_RATE_DIMENSIONS),
+    },
+}
+
+# 분석 축 컬럼의 한글 이름 (분석 의도 문구용)
+AXIS_LABELS = {
+    "ITEM_TYPE_GROUP_NAME": "품종그룹",
+    "SPECIFICATION_CD_N": "제품규격",
+    "END_USER_NAME": "고객사",
+    "QLY_INC_HPN_FAC_TP_NM": "발생공장",
+    "QLY_INC_RESP_FAC_TP_NM": "책임공장",
+    "EX_A_MAST_GD_CAU_NM": "외관불량원인",
+}
+# 여러 컬럼을 가리키는 표현의 기준 선택 단어 (발생/책임은 '공장'에 붙어 있을 때만: '부적합 발생'은 지표 표현)
+_AXIS_CHOICES = {
+    "QLY_INC_HPN_FAC_TP_NM": re.compile(r"발생(?:공장|공정)"),
+    "QLY_INC_RESP_FAC_TP_NM": re.compile(r"책임(?:공장|공정)"),
+    "ITEM_TYPE_GROUP_NAME": re.compile(r"품종"),
+    "SPECIFICATION_CD_N": re.compile(r"규격"),
+}
+# 반문에 대한 답변(지표 없이 기준만 답한 질문)에서는 '발생'/'책임'만으로도 선택 ('발생량'의 '발생'은 제외)
+_ANSWER_CHOICES = {
+    "QLY_INC_HPN_FAC_TP_NM": re.compile(r"발생(?!량)"),
+    "QLY_INC_RESP_FAC_TP_NM": re.compile(r"책임"),
+}
+
+
+def _alternation(terms) -> str:
+    return "|".join(re.escape(compact_text(term)) for term in sorted(terms, key=len, reverse=True))
+
+
+# 템플릿이 표현하지 못하는 요청 (상대 기간, 순위, 조건 비교, 원인 분석 등) → LLM
+_UNSUPPORTED = re.compile(
+    r"최근|작년|올해|금년|전년|전월|지난달|이번달|분기|상반기|하반기|상위|하위|top|가장|순위|랭킹|평균|분포|상관"
+    r"|대비|증감|증가율|감소율|누적|이상|이하|초과|미만|제외|빼고|왜|이유|예측|전망|생산량|매출액|보상액"
+)
+_CLAIM = re.compile(r"클레임")
+_QUALITY = re.compile(r"부적합|불량률")
+_YEAR_RANGE = re.compile(r"(?<!\d)(\d{4}|\d{2})년?(?:~|-|부터)(\d{4}|\d{2})년")
+_MONTH_RANGE = re.compile(r"(?<!\d)(\d{4}|\d{2})년(\d{1,2})월?(?:~|-|부터)(\d{1,2})월")
+_YEAR_MONTH = re.compile(r"(?<!\d)(\d{4}|\d{2})년(\d{1,2})월")
+_YYYYMM = re.compile(r"(?<!\d)(20\d{2})(0[1-9]|1[0-2])(?!\d)")
+_YEAR = re.compile(r"(?<!\d)(\d{4}|\d{2})(?:년|년도)|(?<!\d)(20\d{2})(?!\d)")
+_MONTH_ONLY = re.compile(r"(?<!\d)\d{1,2}월")
+_YEARLY = re.compile(r"연도별|년도별|연별|년별|연간|매년")
+_MONTHLY = re.compile(r"월별|월간|매월|추이|추세|트렌드")
+_CUSTOMER = re.compile(_alternation(CUSTOMERS))
+_SPEC = re.compile(_alternation(SPECIFICATIONS))
+_FACTORY = re.compile(rf"({_alternation(ITEM_TYPES)})(\d)")
+_ITEM = re.compile(rf"({_alternation(ITEM_TYPES)})(?!\d)")
+_CAUSE = re.compile(_alternation(DEFECT_CAUSES))
+_AXIS = re.compile(_alternation(COLUMN_ALIASES))
+_ORIGINAL_VALUES = {compact_text(value): value for value in CUSTOMERS + SPECIFICATIONS + DEFECT_CAUSES}
+
+
+class QuerySlots(NamedTuple):
+    metric: str                                     # quality_rate | claim_rate
+    grain: Optional[str]                            # year | month | None(기간 전체 합계)
+    years: List[int]                                # 연도 필터 (비어 있으면 전체 기간)
+    month_ranges: List[Tuple[int, int]]             # 년월(YYYYMM) 범위 필터
+    group_by: List[str]                             # 분석 축 컬럼
+    filters: Dict[str, List[str]]                   # {컬럼: [값, ...]}
+
+
+def _normalize(text: str) -> str:
+    """compact_text와 같지만 숫자 사이, 발생/책임과 공장 사이의 공백은 구분자로 남김
+
+    - '냉연2 2025년' → '냉연2/2025년'
+    - 'Crack 발생 공장별' → 'crack발생/공장별' (띄어 쓴 '발생 공장'은 발생공장 기준으로 보지 않음)
+    """
+    text = re.sub(r"(?<=\d)\s+(?=\d)", "/", text or "")
+    return compact_text(re.sub(r"(?<=발생|책임)\s+(?=공장|공정)", "/", text))
+
+
+def _full_year(text: str) -> int:
+    return 2000 + int(text) if len(text) == 2 else int(text)
+
+
+def _resolve_columns(alias: str, text: str, answer: str = "") -> Optional[List[str]]:
+    """표현이 가리키는 컬럼 (여러 개면 발생공장/책임공장, 품종/규격 선택 단어로 결정, 결정할 수 없으면 None)
+
+    - answer: 반문에 대한 답변 (있으면 '발생'/'책임'만으로도 선택)
+    """
+    columns = COLUMN_ALIASES[alias]
+    if len(columns) == 1:
+        return list(columns)
+    chosen = [col for col in columns
+              if (col in _AXIS_CHOICES and _AXIS_CHOICES[col].search(text))
+              or (answer and col in _ANSWER_CHOICES and _ANSWER_CHOICES[col].search(answer))]
+    return chosen if len(chosen) == 1 else None
+
+
+def _question_text(query: str, previous_query: str = "") -> Tuple[str, str]:
+    """(해석할 텍스트, 반문에 대한 답변) - 현재 질문에 지표가 없으면 직전 질문과 이어서 해석
+
+    - 후보 의도를 그대로 답한 경우('책임공장: 원인을 제공한 ...') 설명은 빼고 기준 이름만 해석
+    """
+    text = _normalize(query)
+    if (_CLAIM.search(text) or _QUALITY.search(text)) or not previous_query:
+        return text, ""
+    answer = _normalize(query.split(":", 1)[0])
+    return _normalize(previous_query) + " " + answer, answer
+
+
+def ambiguous_axes(query: str, previous_query: str = "") -> List[str]:
+    """기준 확인(반문)이 필요한 분석 축 표현 ('공장', '제품'처럼 여러 컬럼을 가리키는데 선택 단어가 없는 경우)"""
+    text, answer = _question_text(query, previous_query)
+    aliases = set(_AXIS.findall(text))
+    if _FACTORY.search(text):
+        aliases.add("공장")  # '냉연2' 같은 공장 값도 발생/책임 중 하나로 정해야 함
+    return sorted(alias for alias in aliases if _resolve_columns(alias, text, answer) is None)
+
+
+def extract_slots(query: str, previous_query: str = "") -> Optional[QuerySlots]:
+    """질문에서 지표/기간/분석 축/필터 추출 (템플릿으로 표현할 수 없거나 모호하면 None)
+
+    - previous_query: 현재 질문에 지표가 없을 때(반문에 대한 답변 등) 함께 해석할 직전 사용자 질문
+    - 해석하지 못한 숫자/날짜(예: 20250115)가 남으면 None (임의로 무시하고 다른 질문에 답하지 않도록)
+    """
+    text, answer = _question_text(query, previous_query)
+    if not text or _UNSUPPORTED.search(text):
+        return None
+
+    if _CLAIM.search(text) and _QUALITY.search(text):
+        return None
+    metric = "claim_rate" if _CLAIM.search(text) else "quality_rate" if _QUALITY.search(text) else None
+    if metric is None:
+        return None
+
+    # 기간: 년월 범위 → 년월 → 연도 범위 → 연도 순으로 해석하고, 해석한 부분은 지움
+    month_ranges: List[Tuple[int, int]] = []
+    for year, start, end in _MONTH_RANGE.findall(text):
+        month_ranges.append((_full_year(year) * 100 + int(start), _full_year(year) * 100 + int(end)))
+    text = _MONTH_RANGE.sub(" ", text)
+    for year, month in _YEAR_MONTH.findall(text) + _YYYYMM.findall(text):
+        yyyymm = _full_year(year) * 100 + int(month)
+        month_ranges.append((yyyymm, yyyymm))
+    text = _YYYYMM.sub(" ", _YEAR_MONTH.sub(" ", text))
+    if any(not 1 <= yyyymm % 100 <= 12 for bounds in month_ranges for yyyymm in bounds):
+        return None
+    if _MONTH_ONLY.search(text):
+        return None  # 연도 없는 월은 LLM이 맥락으로 해석
+
+    years: List[int] = []
+    for start, end in _YEAR_RANGE.findall(text):
+        years.extend(range(_full_year(start), _full_year(end) + 1))
+    text = _YEAR_RANGE.sub(" ", text)
+    for short, full in _YEAR.findall(text):
+        years.append(_full_year(short or full))
+    text = _YEAR.sub(" ", text)
+    years = sorted(set(years))
+    if len(years) > 50 or (month_ranges and years):
+        return None
+
+    # 필터 값 (값을 지운 뒤에 분석 축 표현을 찾음: 'A고객사'의 '고객사'를 축으로 오인하지 않도록)
+    filters: Dict[str, List[str]] = {}
+    for pattern, column in ((_CUSTOMER, "END_USER_NAME"), (_SPEC, "SPECIFICATION_CD_N"), (_CAUSE, "EX_A_MAST_GD_CAU_NM")):
+        values = pattern.findall(text)
+        if values:
+            filters[column] = sorted({_ORIGINAL_VALUES[value] for value in values})
+        text = pattern.sub(" ", text)
+    factories = ["".join(match) for match in _FACTORY.findall(text)]
+    text = _FACTORY.sub(" ", text)
+    if factories:
+        columns = _resolve_columns("공장", text, answer)
+        if columns is None:
+            return None
+        filters[columns[0]] = sorted(set(factories))
+    items = _ITEM.findall(text)
+    text = _ITEM.sub(" ", text)
+    if items:
+        filters["ITEM_TYPE_GROUP_NAME"] = sorted(set(items))
+    if re.search(r"\d", text):
+        return None  # 기간/필터 값으로 해석하지 못한 숫자 → LLM
+
+    group_by: List[str] = []
+    for alias in _AXIS.findall(text):
+        columns = _resolve_columns(alias, text, answer)
+        if columns is None:
+            return None
+        group_by.extend(col for col in columns if col not in group_by)
+    # 필터로 하나의 값만 지정한 컬럼은 축에서 제외 (예: 'A고객사 고객사별' → 필터만)
+    group_by = [col for col in group_by if len(filters.get(col, [])) != 1]
+
+    allowed = TEMPLATE_METRICS[metric]["dimensions"]
+    if any(col not in allowed for col in list(group_by) + list(filters)):
+        return None
+
+    if _YEARLY.search(text):
+        grain = "year"
+    elif _MONTHLY.search(text) or month_ranges:
+        grain = "month"
+    elif len(years) > 1 or not group_by:
+        grain = "year"
+    else:
+        grain = None
+    return QuerySlots(metric, grain, years, month_ranges, group_by, filters)
+
+
+def _quote(value: str) -> str:
+    return "'" + value.replace("'", "''") + "'"
+
+
+def build_sql(slots: QuerySlots) -> str:
+    """슬롯으로 SQL 생성 (정수형 년/년월 키로 필터/그룹화하므로 인덱스 및 요약 테이블 재작성 대상)"""
+    spec = TEMPLATE_METRICS[slots.metric]
+    select: List[str] = []
+    group: List[str] = []
+    if slots.grain:
+        # 결과 컬럼명은 지표와 관계없이 YEAR / YYYYMM
+        column, alias = (spec["year"], "YEAR") if slots.grain == "year" else (spec["yyyymm"], "YYYYMM")
+        select.append(alias if column == alias else f"{column} AS {alias}")
+        group.append(column)
+        order = [alias] + slots.group_by
+    else:
+        order = [f"{spec['name']} DESC"] if slots.group_by else []
+    select += slots.group_by + spec["measures"] + [f"{spec['rate']} AS {spec['name']}"]
+    group += slots.group_by
+
+    where: List[str] = []
+    if slots.years:
+        where.append(f"{spec['year']} IN ({', '.join(str(year) for year in slots.years)})")
+    if slots.month_ranges:
+        ranges = [f"{spec['yyyymm']} BETWEEN {start} AND {end}" for start, end in slots.month_ranges]
+        where.append(ranges[0] if len(ranges) == 1 else "(" + " OR ".join(ranges) + ")")
+    for column, values in slots.filters.items():
+        where.append(f"{column} IN ({', '.join(_quote(value) for value in values)})")
+
+    sql = f"SELECT {', '.join(select)} FROM {spec['table']}"
+    if where:
+        sql += f" WHERE {' AND '.join(where)}"
+    if group:
+        sql += f" GROUP BY {', '.join(group)}"
+    if order:
+        sql += f" ORDER BY {', '.join(order)}"
+    return sql
+
+
+def describe(slots: QuerySlots) -> str:
+    """분석 의도 문구 (예: 2024~2025년 연도별 품종그룹별 품질부적합률)"""
+    parts = []
+    if slots.years:
+        years = slots.years
+        contiguous = len(years) > 2 and years == list(range(years[0], years[-1] + 1))
+        parts.append(f"{years[0]}~{years[-1]}년" if contiguous else ", ".join(f"{year}년" for year in years))
+    for start, end in slots.month_ranges:
+        parts.append(f"{start // 100}년 {start % 100}월" + ("" if start == end else f"~{end % 100}월"))
+    for column, values in slots.filters.items():
+        parts.append(f"{AXIS_LABELS[column]} {', '.join(values)}")
+    if slots.grain:
+        parts.append("연도별" if slots.grain == "year" else "월별")
+    parts += [f"{AXIS_LABELS[col]}별" for col in slots.group_by]
+    parts.append(TEMPLATE_METRICS[slots.metric]["name"])
+    return " ".join(parts)
+
+
+def template_sql(query: str, previous_query: str = "", claim_rollup_ready: bool = True) -> Optional[Dict[str, Any]]:
+    """템플릿으로 만든 SQL 생성 결과 (_generate_sql 응답과 같은 구조, 해당하지 않으면 None)"""
+    slots = extract_slots(query, previous_query)
+    if slots is None or (slots.metric == "claim_rate" and not claim_rollup_ready):
+        return None
+    return {
+        "confirmedIntent": describe(slots),
+        "sqlQueries": [{"query": build_sql(slots)}],
+        "source": "template",
+        "slots": slots._asdict(),
+    }
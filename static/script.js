@@ -133,8 +133,11 @@ class QualityAnalysisApp {
         this.addMessageToChat('user', message);
         this.showTypingIndicator();
 
+        // 단계별 결과를 Server-Sent Events로 받아 도착하는 대로 표시
+        const state = { summaryDiv: null, summaryText: '', chartDrawn: false, sqlResults: [], done: false };
+
         try {
-            const response = await fetch('/api/chat', {
+            const response = await fetch('/api/chat/stream', {
                 method: 'POST',
                 headers: {
                     'Content-Type': 'application/json'
@@ -145,17 +148,50 @@ class QualityAnalysisApp {
                 })
             });
 
-            if (!response.ok) {
+            if (!response.ok || !response.body) {
                 throw new Error('Failed to send message');
             }
 
-            const data = await response.json();
-            this.hideTypingIndicator();
-            this.handleChatResponse(data);
+            const reader = response.body.getReader();
+            const decoder = new TextDecoder();
+            let buffer = '';
+
+            while (true) {
+                const { value, done } = await reader.read();
+                if (done) break;
+                buffer += decoder.decode(value, { stream: true });
+
+                // 이벤트는 빈 줄(\n\n)로 구분
+                let boundary;
+                while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+                    const rawEvent = buffer.slice(0, boundary);
+                    buffer = buffer.slice(boundary + 2);
+
+                    let event = 'message';
+                    let data = '';
+                    rawEvent.split('\n').forEach(line => {
+                        if (line.startsWith('event:')) {
+                            event = line.slice(6).trim();
+                        } else if (line.startsWith('data:')) {
+                            data += line.slice(5).trim();
+                        }
+                    });
+                    if (data) {
+                        this.handleStreamEvent(event, JSON.parse(data), state);
+                    }
+                }
+            }
+
+            if (!state.done) {
+                throw new Error('Stream ended before completion');
+            }
 
         } catch (error) {
             console.error('Error sending message:', error);
             this.hideTypingIndicator();
+            if (state.summaryDiv) {
+                state.summaryDiv.remove();
+            }
             this.addMessageToChat('assistant', '죄송합니다. 오류가 발생했습니다. 다시 시도해주세요.');
         } finally {
             this.isLoading = false;
@@ -163,6 +199,61 @@ class QualityAnalysisApp {
         }
     }
 
+    handleStreamEvent(event, data, state) {
+        switch (event) {
+            case 'classification':
+                this.updateTypingIndicator('SQL 쿼리를 생성 중입니다');
+                break;
+            case 'sql':
+                this.updateTypingIndicator('SQL 쿼리를 실행 중입니다');
+                break;
+            case 'rows':
+                state.sqlResults[data.index] = data.result;
+                this.updateTypingIndicator('결과를 분석 중입니다');
+                break;
+            case 'chart_data':
+                if (state.sqlResults[data.index]) {
+                    state.sqlResults[data.index].chart_data = data.chart_data;
+                }
+                break;
+            case 'visualization':
+                if (state.sqlResults.length && !data.type) {
+                    this.createChart({ sql_results: state.sqlResults, visualization: data });
+                    state.chartDrawn = true;
+                }
+                break;
+            case 'summary_token': {
+                // 요약은 토큰이 도착하는 대로 말풍선에 이어 붙임
+                if (!state.summaryDiv) {
+                    this.hideTypingIndicator();
+                    state.summaryDiv = this.addMessageToChat('assistant', '');
+                }
+                state.summaryText += data.text;
+                state.summaryDiv.querySelector('.message-content').innerHTML = this.formatMessage(state.summaryText);
+                const messagesContainer = document.getElementById('chat-messages');
+                messagesContainer.scrollTop = messagesContainer.scrollHeight;
+                break;
+            }
+            case 'done':
+                state.done = true;
+                this.hideTypingIndicator();
+                if (state.summaryDiv) {
+                    // 최종 메시지(요약 + 인사이트 정리본)로 교체
+                    state.summaryDiv.querySelector('.message-content').innerHTML = this.formatMessage(data.message);
+                    if (data.type === 'analysis' && !state.chartDrawn && data.metadata.sql_results && data.metadata.visualization) {
+                        this.createChart(data.metadata);
+                    }
+                    this.loadSessions();
+                } else if (state.chartDrawn) {
+                    this.addMessageToChat('assistant', data.message);
+                    this.loadSessions();
+                } else {
+                    this.handleChatResponse(data);
+                }
+                break;
+        }
+    }
+
     handleChatResponse(data) {
         // Add assistant message
         this.addMessageToChat('assistant', data.message);
@@ -204,6 +295,7 @@ class QualityAnalysisApp {
 
         messagesContainer.appendChild(messageDiv);
         messagesContainer.scrollTop = messagesContainer.scrollHeight;
+        return messageDiv;
     }
 
     formatMessage(content) {
@@ -231,6 +323,13 @@ class QualityAnalysisApp {
         messagesContainer.scrollTop = messagesContainer.scrollHeight;
     }
 
+    updateTypingIndicator(text) {
+        const label = document.querySelector('#typing-indicator span');
+        if (label) {
+            label.textContent = text;
+        }
+    }
+
     hideTypingIndicator() {
         const typingIndicator = document.getElementById('typing-indicator');
         if (typingIndicator) {
@@ -281,10 +380,11 @@ class QualityAnalysisApp {
             <div class="chart-header">
                 <h3 class="chart-title">${metadata.visualization.title || '분석 결과'}</h3>
                 <div class="chart-actions">
-                    <button class="chart-btn" data-action="sql" data-sql='${JSON.stringify(metadata.sql_results)}' disabled>SQL</button>
+                    <button class="chart-btn" data-action="sql" data-sql='${this.sqlAttribute(metadata.sql_results)}' disabled>SQL</button>
                     <button class="chart-btn" data-action="data" disabled>Data</button>
                     <button class="chart-btn" data-action="feedback" disabled>Feedback</button>
                     <button class="chart-btn" data-action="copy">Copy</button>
+                    ${metadata.sql_results?.[0]?.chart_data ? '<button class="chart-btn" data-action="full" title="축소하지 않은 전체 데이터로 다시 그리기">원본</button>' : ''}
                 </div>
             </div>
             <div class="chart-content" id="${chartId}"></div>
@@ -295,17 +395,76 @@ class QualityAnalysisApp {
         
         // Scroll to new chart
         chartDiv.scrollIntoView({ behavior: 'smooth', block: 'start' });
+
+        // 서버에서 줄인 차트 데이터(chart_data)가 있으면 그대로 두고, 원본 버튼을 누를 때만 전체 해상도로 다시 그림
+        // 그 외 첫 페이지만 받은 결과는 나머지 페이지를 불러와 다시 그림
+        const first = metadata.sql_results && metadata.sql_results[0];
+        if (first && first.chart_data) {
+            chartDiv.querySelector('[data-action="full"]').addEventListener('click', (e) => {
+                e.target.disabled = true;
+                this.renderFullResolution(chartId, metadata);
+            });
+        } else if (first && first.result_id && first.next_offset != null) {
+            this.renderFullResolution(chartId, metadata);
+        }
+    }
+
+    // chart_data 없이 sql_results 원본(남은 페이지 포함)으로 차트 다시 그리기
+    renderFullResolution(chartId, metadata) {
+        const { chart_data, ...first } = metadata.sql_results[0];
+        const pages = first.result_id && first.next_offset != null ? this.fetchRemainingPages(first) : Promise.resolve(first);
+        pages.then(full => {
+            this.renderChart(chartId, { ...metadata, sql_results: [full, ...metadata.sql_results.slice(1)] });
+        }).catch(error => console.error('[ERROR] 결과 페이지 조회 오류:', error));
+    }
+
+    // SQL 모달용 속성 값 (결과 행은 제외하고 쿼리 정보만, 작은따옴표 이스케이프)
+    sqlAttribute(sqlResults) {
+        const queries = (sqlResults || []).map(({ query, description, error }) => ({ query, description, error }));
+        return JSON.stringify(queries).replace(/'/g, '&#39;');
+    }
+
+    // 컬럼 단위 결과({columns, values: [컬럼별 값 배열]})를 행 객체 배열로 변환
+    decodeRows(result) {
+        const columns = result.columns || [];
+        const values = result.values || [];
+        const rowCount = values.length ? values[0].length : 0;
+        const rows = new Array(rowCount);
+        for (let i = 0; i < rowCount; i++) {
+            const row = {};
+            for (let j = 0; j < columns.length; j++) {
+                row[columns[j]] = values[j][i];
+            }
+            rows[i] = row;
+        }
+        return rows;
+    }
+
+    // result_id로 다음 페이지들을 이어 받아 컬럼별 값 배열에 붙임 (차트용 최대 행 수까지)
+    async fetchRemainingPages(result, maxRows = 20000) {
+        const values = result.values.map(column => column.slice());
+        let offset = result.next_offset;
+        while (offset != null && values[0].length < maxRows) {
+            const response = await fetch(`/api/result/${encodeURIComponent(result.result_id)}?offset=${offset}`);
+            if (!response.ok) break;
+            const page = await response.json();
+            page.values.forEach((column, j) => values[j].push(...column));
+            offset = page.next_offset;
+        }
+        return { ...result, values, next_offset: offset };
     }
 
     renderChart(chartId, metadata) {
         const { sql_results, visualization } = metadata;
         
-        if (!sql_results || sql_results.length === 0 || !sql_results[0].data) {
+        // 서버에서 차트용으로 줄인 데이터(chart_data)가 있으면 우선 사용
+        const source = sql_results && sql_results.length ? (sql_results[0].chart_data || sql_results[0]) : null;
+        if (!source || !source.values || !source.values.length) {
             document.getElementById(chartId).innerHTML = '<p>데이터가 없습니다.</p>';
             return;
         }
 
-        const data = sql_results[0].data;
+        const data = this.decodeRows(source);
         const viz = visualization;
         
         // LLM 추천 설정을 로그로 확인
@@ -389,6 +548,11 @@ class QualityAnalysisApp {
                     plotlyData = this.createBarChart(data, xColumn, yColumn, seriesColumn);
             }
 
+            // 연도/년월 같은 숫자 값도 범주 축으로 표시 (연속 축이면 2024.5 같은 눈금이 생김)
+            if (!['pie', 'scatter', 'heatmap'].includes(viz.chartType?.toLowerCase())) {
+                layout.xaxis.type = 'category';
+            }
+
             // 축 레이블 업데이트
             layout.xaxis.title = viz.xAxis || xColumn || 'X축';
             layout.yaxis.title = viz.yAxis || yColumn || 'Y축';
@@ -407,17 +571,32 @@ class QualityAnalysisApp {
         }
     }
 
+    // (x, 시리즈) 값 조합 → 행 (같은 조합이 여러 번이면 첫 행, 시리즈마다 전체 행을 다시 찾지 않도록)
+    indexRows(data, xColumn, seriesColumn) {
+        const lookup = new Map();
+        for (const d of data) {
+            const key = this.rowKey(d[xColumn], d[seriesColumn]);
+            if (!lookup.has(key)) lookup.set(key, d);
+        }
+        return lookup;
+    }
+
+    rowKey(x, series) {
+        return `${x}\u0000${series}`;
+    }
+
     // 막대 차트 생성
     createBarChart(data, xColumn, yColumn, seriesColumn) {
         if (seriesColumn) {
             // 시리즈별 그룹화
             const seriesGroups = [...new Set(data.map(d => d[seriesColumn]))];
             const xValues = [...new Set(data.map(d => d[xColumn]))];
+            const lookup = this.indexRows(data, xColumn, seriesColumn);
             
             return seriesGroups.map(series => ({
                 x: xValues,
                 y: xValues.map(x => {
-                    const found = data.find(d => d[xColumn] == x && d[seriesColumn] == series);
+                    const found = lookup.get(this.rowKey(x, series));
                     return found ? parseFloat(found[yColumn]) || 0 : 0;
                 }),
                 name: series,
@@ -441,16 +620,19 @@ class QualityAnalysisApp {
             // 시리즈별 그룹화
             const seriesGroups = [...new Set(data.map(d => d[seriesColumn]))];
             const xValues = [...new Set(data.map(d => d[xColumn]))].sort();
+            const lookup = this.indexRows(data, xColumn, seriesColumn);
             
+            // 다운샘플링된 시리즈는 시리즈마다 남은 x 값이 다르므로 빈 점은 0이 아닌 null로 두고 이어 그림
             return seriesGroups.map(series => ({
                 x: xValues,
                 y: xValues.map(x => {
-                    const found = data.find(d => d[xColumn] == x && d[seriesColumn] == series);
-                    return found ? parseFloat(found[yColumn]) || 0 : 0;
+                    const found = lookup.get(this.rowKey(x, series));
+                    return found ? parseFloat(found[yColumn]) || 0 : null;
                 }),
                 name: series,
                 type: 'scatter',
                 mode: 'lines+markers',
+                connectgaps: true,
                 line: { width: 3 },
                 marker: { size: 8 }
             }));
@@ -513,10 +695,11 @@ class QualityAnalysisApp {
         const xValues = [...new Set(data.map(d => d[xColumn]))];
         const yValues = [...new Set(data.map(d => d[yColumn]))];
         const zColumn = valueColumn || Object.keys(data[0]).find(k => k !== xColumn && k !== yColumn);
+        const lookup = this.indexRows(data, xColumn, yColumn);
         
         const z = yValues.map(y => 
             xValues.map(x => {
-                const found = data.find(d => d[xColumn] == x && d[yColumn] == y);
+                const found = lookup.get(this.rowKey(x, y));
                 return found ? parseFloat(found[zColumn]) || 0 : 0;
             })
         );
@@ -798,16 +981,8 @@ class QualityAnalysisApp {
 
     async createTopAreaChart() {
         try {
-            // 연도별 품질부적합률 데이터 요청
-            const response = await fetch('/api/yearly_quality_data', {
-                method: 'POST',
-                headers: {
-                    'Content-Type': 'application/json'
-                },
-                body: JSON.stringify({
-                    session_id: this.currentSessionId
-                })
-            });
+            // 연도별 품질부적합률 데이터 요청 (GET + ETag: 데이터가 바뀌지 않았으면 브라우저 캐시 재사용)
+            const response = await fetch('/api/yearly_quality_data');
 
             if (!response.ok) {
                 throw new Error('Failed to fetch yearly quality data');
@@ -885,16 +1060,8 @@ class QualityAnalysisApp {
 
     async createTopArea2Chart() {
         try {
-            // 2025년 1월~3월 월별 품질부적합률 추세 데이터 요청
-            const response = await fetch('/api/monthly_quality_trend', {
-                method: 'POST',
-                headers: {
-                    'Content-Type': 'application/json'
-                },
-                body: JSON.stringify({
-                    session_id: this.currentSessionId
-                })
-            });
+            // 데이터가 있는 마지막 연도의 월별 품질부적합률 추세 데이터 요청
+            const response = await fetch('/api/monthly_quality_trend');
 
             if (!response.ok) {
                 throw new Error('Failed to fetch monthly quality trend data');
@@ -913,7 +1080,7 @@ class QualityAnalysisApp {
                 type: 'scatter',
                 mode: 'lines+markers',
                 line: {
-                    color: '#3b82f6', // 2025년 막대그래프와 동일한 파란색
+                    color: '#3b82f6', // 최근 연도 막대그래프와 동일한 파란색
                     width: 3
                 },
                 marker: {
@@ -924,12 +1091,12 @@ class QualityAnalysisApp {
                         width: 2
                     }
                 },
-                hovertemplate: '<b>2025년 %{x}</b><br>품질부적합률: %{y:.2f}%<extra></extra>'
+                hovertemplate: `<b>${data.year}년 %{x}</b><br>품질부적합률: %{y:.2f}%<extra></extra>`
             }];
 
             const layout = {
                 title: {
-                    text: '2025년 품질부적합률 추이',
+                    text: `${data.year}년 품질부적합률 추이`,
                     font: { color: '#f8fafc', size: 16 },
                     x: 0.5
                 },
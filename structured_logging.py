@@ -0,0 +1,125 @@
+"""
+Leveled JSON-lines logging with lazy field evaluation, per-event sampling and secret redaction
+"""
+import json
+import logging
+import os
+import random
+import re
+import sys
+from typing import Any, Callable, Optional
+
+# 로깅 설정 (환경변수로 조정 가능)
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()                    # DEBUG로 두면 SQL/LLM 응답 상세까지 기록
+LOG_SAMPLE_RATE = float(os.getenv("LOG_SAMPLE_RATE", "0.1"))          # 고빈도 이벤트(sample=True)의 기록 비율
+LOG_MAX_FIELD_CHARS = int(os.getenv("LOG_MAX_FIELD_CHARS", "2000"))   # 문자열 필드 1개당 최대 길이
+
+# 로그에 남기면 안 되는 값 (OpenAI API 키 등)
+_SECRET_PATTERN = re.compile(r"sk-[A-Za-z0-9_\-]{8,}")
+_ROOT_LOGGER = "qa"
+
+
+class lazy:
+    """로그 레벨이 켜져 있고 샘플링을 통과한 경우에만 계산되는 필드 값
+
+    예: log.debug("sql.result", head=lazy(lambda: df.head().to_dict("records")))
+    """
+
+    __slots__ = ("func",)
+
+    def __init__(self, func: Callable[[], Any]):
+        self.func = func
+
+
+def redact(text: str) -> str:
+    return _SECRET_PATTERN.sub("sk-***", text)
+
+
+def _clip(value: Any) -> Any:
+    if isinstance(value, str):
+        value = redact(value)
+        if len(value) > LOG_MAX_FIELD_CHARS:
+            return value[:LOG_MAX_FIELD_CHARS] + f"...(+{len(value) - LOG_MAX_FIELD_CHARS} chars)"
+    return value
+
+
+class JSONLinesFormatter(logging.Formatter):
+    """한 줄에 JSON 객체 하나: ts, level, logger, event + 구조화 필드 (+ exc)"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": round(record.created, 3),
+            "level": record.levelname.lower(),
+            "logger": record.name,
+            "event": redact(record.getMessage()),
+        }
+        for key, value in getattr(record, "fields", {}).items():
+            entry[key] = _clip(value)
+        if record.exc_info:
+            entry["exc"] = redact(self.formatException(record.exc_info))
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class StructuredLogger:
+    """이벤트 이름 + 키워드 필드로 기록하는 로거
+
+    - 레벨이 꺼져 있으면 필드(lazy 포함)를 전혀 계산하지 않음
+    - sample=True이면 LOG_SAMPLE_RATE 비율만 기록 (0~1 사이 숫자를 주면 그 비율)
+    """
+
+    def __init__(self, name: str):
+        self._logger = logging.getLogger(f"{_ROOT_LOGGER}.{name}")
+
+    def is_enabled(self, level: int) -> bool:
+        return self._logger.isEnabledFor(level)
+
+    def _log(self, level: int, event: str, sample: Any, exc_info: Any, fields: dict) -> None:
+        if not self._logger.isEnabledFor(level):
+            return
+        if sample:
+            rate = LOG_SAMPLE_RATE if sample is True else float(sample)
+            if rate < 1 and random.random() >= rate:
+                return
+            fields["sample_rate"] = rate
+        for key, value in fields.items():
+            if isinstance(value, lazy):
+                fields[key] = value.func()
+        self._logger.log(level, event, exc_info=exc_info, extra={"fields": fields}, stacklevel=3)
+
+    def debug(self, event: str, sample: Any = None, **fields: Any) -> None:
+        self._log(logging.DEBUG, event, sample, None, fields)
+
+    def info(self, event: str, sample: Any = None, **fields: Any) -> None:
+        self._log(logging.INFO, event, sample, None, fields)
+
+    def warning(self, event: str, sample: Any = None, **fields: Any) -> None:
+        self._log(logging.WARNING, event, sample, None, fields)
+
+    def error(self, event: str, exc_info: Any = None, **fields: Any) -> None:
+        self._log(logging.ERROR, event, None, exc_info, fields)
+
+    def exception(self, event: str, **fields: Any) -> None:
+        """except 블록 안에서 호출 - 스택 트레이스 포함"""
+        self._log(logging.ERROR, event, None, True, fields)
+
+
+def get_logger(name: str) -> StructuredLogger:
+    """qa.<name> 로거 (아직 설정되지 않았으면 기본 설정 적용)"""
+    if not logging.getLogger(_ROOT_LOGGER).handlers:
+        configure_logging()
+    return StructuredLogger(name)
+
+
+def configure_logging(level: Optional[str] = None, stream=None) -> None:
+    """애플리케이션 로거(qa.*)에 JSON lines 핸들러 설정 (여러 번 호출해도 핸들러는 하나)
+
+    uvicorn 등 다른 로거 설정과 섞이지 않도록 상위 로거로 전파하지 않음
+    """
+    root = logging.getLogger(_ROOT_LOGGER)
+    root.setLevel(level or LOG_LEVEL)
+    root.propagate = False
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    handler = logging.StreamHandler(stream or sys.stdout)
+    handler.setFormatter(JSONLinesFormatter())
+    root.addHandler(handler)